@@ -1,22 +1,28 @@
 # -*- coding: utf-8 -*-
 """This module contains initialization code for the api package."""
 import os
-import sys
 
-from flasgger import LazyJSONEncoder
 from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
 
+from .blueprints.apidocs import init_docs
+from .blueprints.auth.revocation import token_store
 from .blueprints.auth.views import auth
 from .blueprints.default.views import default
-from .blueprints.extensions import app_logger, db, jwt, swagger
+from .blueprints.extensions import (
+    admin_cache,
+    app_logger,
+    db,
+    events,
+    jwt,
+    login_limiter,
+    passwords,
+    user_cache,
+)
+from .blueprints.pool import pool_metrics
 from .error_handlers import handle_bad_request
 from .extensions import migrate
-from .helpers import are_environment_variables_set, create_db_tables, set_flask_environment
-
-if not are_environment_variables_set():
-    msg = 'Unable to set Environment variables. Application existing...'
-    app_logger.critical(msg)
-    sys.exit(1)
+from .helpers import create_db_tables, set_flask_environment
 
 
 def create_app(script_info=None):   # pylint: disable=W0613
@@ -28,21 +34,41 @@ def create_app(script_info=None):   # pylint: disable=W0613
     app.register_blueprint(auth)
     app_logger.info('Successfully registered the auth blueprint.')
 
-    app.json_encoder = LazyJSONEncoder
-    swagger.init_app(app)
+    init_docs(app)
 
     set_flask_environment(app)
     app_logger.info('Successfully set the environment variables.')
 
+    if app.config['PROXY_COUNT']:
+        # Take the client address from X-Forwarded-For, so the login rate limits apply to clients
+        # rather than to the load balancer.
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_COUNT'])
+
     app_logger.info(f"The configuration used is for {os.environ['FLASK_ENV']} environment.")
     app_logger.info(f"The database connection string is {app.config['SQLALCHEMY_DATABASE_URI']}.")
 
     db.init_app(app=app)
+    with app.app_context():
+        pool_metrics.watch(db.engine)
+        for bind in db.router.bind_keys:
+            pool_metrics.watch(db.get_engine(bind=bind), bind)
     app_logger.info('Successfully initialized the database instance.')
     migrate.init_app(app, db)
     app_logger.info('Successfully initialized the migrate instance.')
     jwt.init_app(app)
     app_logger.info('Successfully initialized the JWT instance.')
+    token_store.init_app(app)
+    app_logger.info('Successfully initialized the token store.')
+    admin_cache.init_app(app)
+    app_logger.info('Successfully initialized the admin cache.')
+    user_cache.init_app(app)
+    app_logger.info('Successfully initialized the user cache.')
+    events.init_app(app)
+    app_logger.info('Successfully initialized the event logger.')
+    passwords.init_app(app)
+    app_logger.info('Successfully initialized the password hasher.')
+    login_limiter.init_app(app)
+    app_logger.info('Successfully initialized the login rate limiter.')
 
     app.register_error_handler(400, handle_bad_request)
     app_logger.info('Successfully registered te 400 error handler.')
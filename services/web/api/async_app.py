@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""This module contains the async app factory that serves the read routes under an ASGI server.
+
+The sync Flask app served by gunicorn handles one request per worker while it
+waits on Postgres. The async app serves the I/O bound read routes from a
+single event loop with an asyncpg backed SQLAlchemy engine, so one worker can
+have hundreds of requests in flight. It reuses the configuration, models,
+exceptions and pagination helpers of the blueprints, and checks tokens
+against the same tokens table, through its own TokenStore, so tokens revoked
+by the Flask app are refused here too.
+
+Run it with an ASGI server, for example ``hypercorn asgi:app``.
+"""
+import jwt as pyjwt
+from quart import Quart, jsonify, request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from .blueprints.auth.models import Admin, Token
+from .blueprints.auth.revocation import TokenStore
+from .blueprints.default.helpers import USER_COLUMNS
+from .blueprints.default.models import User
+from .blueprints.exceptions import (
+    AdminDoesNotExists,
+    EmptyUserData,
+    InvalidCursor,
+    InvalidPageLimit,
+    UserDoesNotExists,
+)
+from .blueprints.extensions import app_logger, events
+from .blueprints.pagination import decode_cursor, encode_cursor, parse_page_limit
+from .blueprints.tokens import TokenVerifier
+from .helpers import set_flask_environment
+
+
+class InvalidToken(Exception):
+    """Raised when the bearer token is missing, invalid or expired."""
+
+
+def create_async_database_url(database_url: str) -> str:
+    """Get the asyncpg URL for the given postgresql URL."""
+    if database_url.startswith('postgresql://'):
+        return 'postgresql+asyncpg://' + database_url[len('postgresql://'):]
+    return database_url
+
+
+def create_async_engine_options(engine_options: dict) -> dict:
+    """Get the options of the async engine from the SQLAlchemy engine options of the Flask app.
+
+    The async engine brings its own queue pool, so only a NullPool is kept.
+    A NullPool means a transaction pooler such as PgBouncer sits in front of
+    the database, which hands every transaction a different server
+    connection, so asyncpg's prepared statement caches are turned off.
+    """
+    options = dict(engine_options)
+    if options.get('poolclass') is not NullPool:
+        options.pop('poolclass', None)
+    else:
+        options['connect_args'] = {'statement_cache_size': 0, 'prepared_statement_cache_size': 0}
+    return options
+
+
+async def is_revoked(engine, store: TokenStore, claims: dict) -> bool:
+    """Check whether the token was revoked, reading the revoked tokens into the store's Bloom filter."""
+    if store.refresh_due():
+        async with engine.connect() as conn:
+            store.load((await conn.execute(store.refresh_query())).all())
+
+    if not store.may_be_revoked(claims.get('jti')):
+        return False
+
+    async with engine.connect() as conn:
+        result = await conn.execute(select(Token.revoked_at).where(Token.jti == claims['jti']))
+        return result.scalar() is not None
+
+
+async def get_jwt_identity(verifier: TokenVerifier, engine, store: TokenStore) -> int:
+    """Get the identity of the access token in the Authorization header, if it was not revoked."""
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        raise InvalidToken('Missing Authorization Header')
+
+    try:
+        claims = verifier.decode(header[len('Bearer '):])
+    except pyjwt.PyJWTError as e:
+        raise InvalidToken(str(e)) from e
+
+    if claims.get('type') != 'access':
+        raise InvalidToken('Only access tokens are allowed')
+
+    if await is_revoked(engine, store, claims):
+        raise InvalidToken('Token has been revoked')
+
+    return claims['sub']
+
+
+async def fetch_user(engine, user_id: int) -> dict:
+    """Get the user with the given id."""
+    async with engine.connect() as conn:
+        result = await conn.execute(select(User.id, User.email).where(User.id == user_id))
+        user = result.mappings().first()
+
+    if not user:
+        raise UserDoesNotExists(f'The user with id {user_id} does not exist.')
+
+    return dict(user)
+
+
+async def fetch_admin(engine, admin_id: int) -> dict:
+    """Get the admin with the given id."""
+    async with engine.connect() as conn:
+        result = await conn.execute(select(Admin.id, Admin.email, Admin.name).where(Admin.id == admin_id))
+        admin = result.mappings().first()
+
+    if not admin:
+        raise AdminDoesNotExists(f'The admin with id {admin_id} does not exist.')
+
+    return dict(admin)
+
+
+async def fetch_users_page(engine, limit, after: str = None) -> dict:
+    """Get one page of users ordered by id."""
+    page_limit = parse_page_limit(limit)
+    query = select(*USER_COLUMNS).order_by(User.id).limit(page_limit + 1)
+    if after:
+        query = query.where(User.id > decode_cursor(after))
+
+    async with engine.connect() as conn:
+        result = await conn.execute(query)
+        users = [dict(user) for user in result.mappings()]
+
+    next_cursor = None
+    if len(users) > page_limit:
+        users = users[:page_limit]
+        next_cursor = encode_cursor(users[-1]['id'])
+
+    return {'users': users, 'next_cursor': next_cursor}
+
+
+def create_async_app():
+    """Create the Quart app that serves the read routes asynchronously."""
+    app = Quart(__name__)
+    set_flask_environment(app)
+    events.init_app(app)
+    verifier = TokenVerifier.from_config(app.config)
+    token_store = TokenStore()
+    token_store.configure(app.config)
+    app_logger.info('Successfully created the async application instance.')
+
+    engine = None
+
+    @app.before_serving
+    async def create_engine():
+        """Create the async engine once the event loop is running."""
+        nonlocal engine
+        options = create_async_engine_options(app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+        engine = create_async_engine(create_async_database_url(app.config['SQLALCHEMY_DATABASE_URI']), **options)
+        app_logger.info('Successfully created the async database engine.')
+
+    @app.after_serving
+    async def dispose_engine():
+        """Close the pooled connections."""
+        await engine.dispose()
+
+    @app.route('/', methods=['GET'])
+    async def home():
+        """Confirm that the application is working."""
+        return jsonify({'hello': 'from template api'}), 200
+
+    @app.route('/user', methods=['GET'])
+    async def get_user():
+        """Get a user with the given id."""
+        try:
+            admin_id = await get_jwt_identity(verifier, engine, token_store)
+        except InvalidToken as e:
+            return jsonify({'msg': str(e)}), 401
+
+        try:
+            user_id = int(request.args.get('id'))
+        except (TypeError, ValueError):
+            return 'The user id was not provided or the id is invalid.', 400
+
+        try:
+            if not user_id:
+                raise EmptyUserData('The user_id has to be provided.')
+            user = await fetch_user(engine, user_id)
+        except EmptyUserData as e:
+            return jsonify({'error': str(e)}), 400
+        except UserDoesNotExists as e:
+            return jsonify({'error': str(e)}), 404
+
+        events.info('user.get', 'The admin with id %s retrieved a user.', admin_id, admin_id=admin_id, user_id=user_id)
+        return jsonify(user), 200
+
+    @app.route('/users', methods=['GET'])
+    async def all_users():
+        """Get the users one page at a time."""
+        try:
+            users = await fetch_users_page(engine, request.args.get('limit'), request.args.get('after'))
+        except (InvalidCursor, InvalidPageLimit) as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(users), 200
+
+    @app.route('/auth/me', methods=['GET'])
+    async def get_admin():
+        """Get admin details."""
+        try:
+            admin_id = await get_jwt_identity(verifier, engine, token_store)
+        except InvalidToken as e:
+            return jsonify({'msg': str(e)}), 401
+
+        try:
+            admin = await fetch_admin(engine, admin_id)
+        except AdminDoesNotExists as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(admin), 200
+
+    return app
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""This module serves the Swagger docs of the API.
+
+flasgger is only imported when the docs are enabled with API_DOCS_ENABLED,
+so production containers can leave it off the import path. /apispec.json is
+built from the @swag_from YAML files once, on its first request, and then
+served as the same serialized JSON with an ETag, so a client that already
+has it gets a 304 Not Modified.
+"""
+import hashlib
+import json
+import os
+import threading
+
+from flask import Response, request
+
+
+def docs_enabled() -> bool:
+    """Check whether the Swagger docs are enabled by API_DOCS_ENABLED, which defaults to true."""
+    return os.getenv('API_DOCS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+
+def swag_from(specs, **kwargs):
+    """Attach the Swagger specs to a view with flasgger, or leave it as it is when the docs are disabled."""
+    if not docs_enabled():
+        return lambda view: view
+
+    from flasgger import swag_from as flasgger_swag_from  # pylint: disable=C0415
+    return flasgger_swag_from(specs, **kwargs)
+
+
+swagger_template = {
+    "swagger": "2.0",
+    "info": {
+        "title": "Template API V4",
+        "description": "Template for creating Flask APIs.",
+        "contact": {
+            "responsibleOrganization": "",
+            "responsibleDeveloper": "",
+            "email": "lyceokoth@gmail.com",
+            "url": "www.twitter.com/lylethedesigner",
+        },
+        "termsOfService": "www.twitter.com/deve",
+        "version": "1.0"
+    },
+    # The host is left out, so the docs use the host that served them.
+    "basePath": "/",  # base bash for blueprint registration
+    "schemes": [
+        "http",
+        "https"
+    ],
+    "securityDefinitions": {
+        "APIKeyHeader": {
+            "type": "apiKey",
+            "name": "Authorization",
+            "in": "header",
+            "description": "JWT Authorization header using the Bearer scheme. Example:\"Authorization: Bearer {token}\""
+        }
+    },
+}
+
+
+swagger_config = {
+    "headers": [
+    ],
+    "specs": [
+        {
+            "endpoint": 'apispec',
+            "route": '/apispec.json',
+            "rule_filter": lambda rule: True,  # all in
+            "model_filter": lambda tag: True,  # all in
+        }
+    ],
+    "static_url_path": "/flasgger_static",
+    "swagger_ui": True,
+    "specs_route": "/apidocs/"
+}
+
+
+class CachedSpec():
+    """The serialized API spec and its ETag, built once."""
+
+    def __init__(self, swagger, endpoint: str) -> None:
+        """Create the cache for the spec that flasgger serves at the given endpoint."""
+        self.swagger = swagger
+        self.endpoint = endpoint
+        self.body = None
+        self.etag = None
+        self._lock = threading.Lock()
+
+    def build(self) -> None:
+        """Build, serialize and hash the spec."""
+        spec = self.swagger.get_apispecs(self.endpoint)
+        body = json.dumps(spec, sort_keys=True, separators=(',', ':')).encode()
+        self.etag = hashlib.sha256(body).hexdigest()
+        self.body = body
+
+    def view(self):
+        """Serve the spec, or 304 Not Modified when the client has the current version."""
+        if self.body is None:
+            with self._lock:
+                if self.body is None:
+                    self.build()
+
+        response = Response(self.body, mimetype='application/json')
+        response.set_etag(self.etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = 300
+        return response.make_conditional(request)
+
+
+def init_docs(app) -> None:
+    """Serve the Swagger UI at /apidocs/ and the cached spec at /apispec.json, if the docs are enabled."""
+    if not docs_enabled():
+        return
+
+    from flasgger import Swagger  # pylint: disable=C0415
+    swagger = Swagger(template=swagger_template, config=swagger_config)
+    swagger.init_app(app)
+
+    spec = CachedSpec(swagger, 'apispec')
+    app.view_functions['flasgger.apispec'] = spec.view
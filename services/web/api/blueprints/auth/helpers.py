@@ -1,12 +1,10 @@
 # -*- coding: utf-8 -*-
 """This module has methods that are used in the other modules in this package."""
-import re
-
-from flask import jsonify
-from flask_jwt_extended import create_access_token, create_refresh_token
+from flask import Response, jsonify, stream_with_context
+from sqlalchemy.exc import IntegrityError
 
 from ..constants import (
-    EMAIL_MAX_LENGTH,
+    ADMIN_PROJECTION_FIELDS,
     NAME_MAX_LENGTH,
     NAME_MIN_LENGTH,
     PASSWORD_MAX_LENGTH,
@@ -23,7 +21,10 @@ from ..exceptions import (
     EmailAddressTooLong,
     EmptyAdminData,
     InvalidAdminPassword,
+    InvalidCursor,
     InvalidEmailAddressFormat,
+    InvalidPageLimit,
+    InvalidProjectionField,
     MissingEmailData,
     MissingEmailKey,
     MissingNameData,
@@ -32,21 +33,28 @@ from ..exceptions import (
     MissingPasswordKey,
     NonDictionaryAdminData,
     NonStringData,
+    PasswordHasherBusy,
+    RevokedToken,
+    TooManyLoginAttempts,
 )
-from ..extensions import app_logger, db
+from ..extensions import admin_cache, db, events, login_limiter, passwords
+from ..pagination import decode_cursor, fetch_page, parse_page_limit, stream_rows
+from ..queries import conflicting_column, delete_returning, insert_returning, update_returning
+from ..schemas import ADMIN_SCHEMA, ADMIN_UPDATE_SCHEMA, EMAIL_PATTERN, LOGIN_SCHEMA
 from .models import Admin
+from .revocation import token_store
 
 
 def check_if_admin_exists_with_id(admin_id: int) -> bool:
     """Check if the admin with the given admin_id exists."""
     if not admin_id:
         msg = 'When checking if admin exists using their id, the admin_id was null.'
-        app_logger.exception(msg)
+        events.rejected('admin.lookup', msg)
         raise ValueError('The admin_id has to be provided.')
 
     if not isinstance(admin_id, int):
         msg = 'When checking if admin exists using their id, the admin_id was not an integer.'
-        app_logger.exception(msg)
+        events.rejected('admin.lookup', msg)
         raise ValueError('The admin_id has to be an integer')
 
     admin = Admin.query.filter_by(id=admin_id).first()
@@ -61,12 +69,12 @@ def check_if_admin_exists(admin_email: str) -> bool:
     """Check if the admin with the given admin_email exists."""
     if not admin_email:
         msg = 'When checking if admin exists using their email, the admin_email was null.'
-        app_logger.exception(msg)
+        events.rejected('admin.lookup', msg)
         raise ValueError('The admin_email has to be provided.')
 
     if not isinstance(admin_email, str):
         msg = 'When checking if admin exists using their email, the admin_email was not a string.'
-        app_logger.exception(msg)
+        events.rejected('admin.lookup', msg)
         raise ValueError('The admin_email has to be an integer')
 
     admin = Admin.query.filter_by(email=admin_email).first()
@@ -81,12 +89,12 @@ def check_if_admin_with_name_exists(admin_name: str) -> bool:
     """Check if the admin with the given admin_name exists."""
     if not admin_name:
         msg = 'When checking if admin exists using their name, the admin_name was null.'
-        app_logger.exception(msg)
+        events.rejected('admin.lookup', msg)
         raise ValueError('The admin_name has to be provided.')
 
     if not isinstance(admin_name, str):
         msg = 'When checking if admin exists using their name, the admin_name was not a string.'
-        app_logger.exception(msg)
+        events.rejected('admin.lookup', msg)
         raise ValueError('The admin_name has to be string')
 
     admin = Admin.query.filter_by(name=admin_name).first()
@@ -101,18 +109,15 @@ def is_email_address_format_valid(email_address: str) -> bool:
     """Check that the email address format is valid."""
     if not email_address:
         msg = 'When checking if an email address format is valid, the admin_email was null.'
-        app_logger.exception(msg)
+        events.rejected('email.validate', msg)
         raise ValueError('The email_address cannot be an empty value')
 
     if not isinstance(email_address, str):
         msg = 'When checking if an email address format is valid, the admin_email was not a string.'
-        app_logger.exception(msg)
+        events.rejected('email.validate', msg)
         raise ValueError('The email_address must be a string')
 
-    #  Regular expression for validating an Email
-    regex = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-
-    if re.fullmatch(regex, email_address):
+    if EMAIL_PATTERN.fullmatch(email_address):
         return True
 
     return False
@@ -122,27 +127,27 @@ def is_admin_name_valid(admin_name: str) -> bool:
     """Check if the admin name is valid."""
     if not admin_name:
         msg = 'When checking if admin_name is valid, the admin_name was null.'
-        app_logger.exception(msg)
+        events.rejected('admin.validate', msg)
         raise ValueError('The admin_name has to be provided.')
 
     if not isinstance(admin_name, str):
         msg = 'When checking if admin_name is valid, the admin_name was not a string.'
-        app_logger.exception(msg)
+        events.rejected('admin.validate', msg)
         raise ValueError('The admin_name has to be string')
 
     if len(admin_name) >= NAME_MAX_LENGTH:
         msg = 'When checking if admin_name is valid, the admin_name was too long.'
-        app_logger.exception(msg)
+        events.rejected('admin.validate', msg)
         raise AdminNameTooLong(f'The admin_name has to be less than {NAME_MAX_LENGTH}')
 
     if len(admin_name) <= NAME_MIN_LENGTH:
         msg = 'When checking if admin_name is valid, the admin_name was too short.'
-        app_logger.exception(msg)
+        events.rejected('admin.validate', msg)
         raise AdminNameTooShort(f'The admin_name has to be more than {NAME_MIN_LENGTH}')
 
     if not admin_name.isalnum():
         msg = 'When checking if admin_name is valid, he admin_name was not alphanumeric.'
-        app_logger.exception(msg)
+        events.rejected('admin.validate', msg)
         raise ValueError('The admin_name has to be alphanumeric.')
 
     return True
@@ -152,90 +157,90 @@ def is_admin_password_valid(admin_password: str):
     """Check if the admin_password is valid."""
     if not admin_password:
         msg = 'When checking if admin_password is valid, the admin_password was null.'
-        app_logger.exception(msg)
+        events.rejected('admin.validate', msg)
         raise MissingPasswordData('The admin_password has to be provided.')
 
     if not isinstance(admin_password, str):
         msg = 'When checking if admin_password is valid, the admin_password was not a string.'
-        app_logger.exception(msg)
+        events.rejected('admin.validate', msg)
         raise NonStringData('The admin_password has to be string')
 
     if len(admin_password) >= PASSWORD_MAX_LENGTH:
         msg = 'When checking if admin_password is valid, the admin_password was too long.'
-        app_logger.exception(msg)
+        events.rejected('admin.validate', msg)
         raise AdminPasswordTooLong(f'The admin_password has to be less than {PASSWORD_MAX_LENGTH}')
 
     if len(admin_password) <= PASSWORD_MIN_LENGTH:
         msg = 'When checking if admin_password is valid, the admin_password was too short.'
-        app_logger.exception(msg)
+        events.rejected('admin.validate', msg)
         raise AdminPaswordTooShort(f'The admin_password has to be more than {PASSWORD_MIN_LENGTH}')
 
     if admin_password.isalnum():
         msg = 'When checking if admin_password is valid, he admin_password was not alphanumeric.'
-        app_logger.exception(msg)
+        events.rejected('admin.validate', msg)
         raise AdminPasswordNotAlphaNumeric('The admin_password has to be alphanumeric.')
 
     return True
 
 
 def log_in_admin(admin_data):
-    """Log in an admin."""
-    if not admin_data:
-        app_logger.exception('When creating a new admin, the admin_data was empty.')
-        raise EmptyAdminData('The admin data cannot be empty.')
+    """Log in an admin.
 
-    if not isinstance(admin_data, dict):
-        app_logger.exception('When creating a new admin, the admin_data was nota dictionary.')
-        raise NonDictionaryAdminData('admin_data must be a dict')
+    A password that is stored in plaintext or was hashed with an older cost
+    is hashed again with the current one once it has been verified.
+    """
+    LOGIN_SCHEMA.validate(admin_data)
 
-    if 'email' not in admin_data.keys():
-        app_logger.exception('When creating a new admin, the email key was missing from the admin_data.')
-        raise MissingEmailKey('The email is missing from the admin data')
+    admin = Admin.query.filter_by(email=admin_data['email']).first()
+    if not admin:
+        raise AdminDoesNotExists('That Admin does not exist!')
 
-    if not admin_data['email']:
-        app_logger.exception('When creating a new admin, the email data was missing from the admin_data.')
-        raise MissingEmailData('The email data is missing')
+    valid, new_hash = passwords.verify_and_update(admin.password, admin_data['password'])
+    if not valid:
+        raise InvalidAdminPassword('The admin password is invalid!')
 
-    if len(admin_data['email']) >= EMAIL_MAX_LENGTH:
-        app_logger.exception(f'When creating a new admin, the email key was longer than {EMAIL_MAX_LENGTH}.')
-        raise EmailAddressTooLong(f'The email address should be less than {EMAIL_MAX_LENGTH} characters!')
+    if new_hash:
+        admin.password = new_hash
+        db.session.commit()
+        events.info('admin.rehash', 'The password of the admin with id %s was hashed again.', admin.id,
+                    admin_id=admin.id)
 
-    if not is_email_address_format_valid(admin_data['email']):
-        app_logger.exception('When creating a new admin, the email address format was invalid.')
-        raise InvalidEmailAddressFormat('The email address is invalid')
+    access_token, refresh_token = token_store.issue(admin.id)
+    admin_data = admin.get_admin()
+    admin_data['access token'] = access_token
+    admin_data['refresh token'] = refresh_token
 
-    if 'password' not in admin_data.keys():
-        app_logger.exception('When creating a new admin, the password key was missing from the admin_data.')
-        raise MissingPasswordKey('The password is missing from the admin data')
+    return admin_data
 
-    if not admin_data['password']:
-        app_logger.exception('When creating a new admin, the password data was missing from the admin_data.')
-        raise MissingPasswordData('The password data is missing')
 
-    try:
-        is_admin_password_valid(admin_data['password'])
-    except ValueError as e:
-        raise e
-
-    if check_if_admin_exists(admin_data['email']):
-        admin = Admin.query.filter_by(email=admin_data['email']).first()
-        if admin:
-            if admin_data['password'] == admin.password:
-                access_token = create_access_token(admin.id)
-                refresh_token = create_refresh_token(admin.id)
-                admin_data = admin.get_admin()
-                admin_data['access token'] = access_token
-                admin_data['refresh token'] = refresh_token
-
-                return admin_data
-            raise InvalidAdminPassword('The admin password is invalid!')
-    raise AdminDoesNotExists('That Admin does not exist!')
-
-
-def handle_log_in_admin(admin_data: dict) -> dict:
+def login_email(admin_data) -> str:
+    """Get the normalized email of a login attempt, or None if it has none."""
+    email = admin_data.get('email') if isinstance(admin_data, dict) else None
+    return email.strip().lower() if isinstance(email, str) else None
+
+
+def throttle_log_in(admin_data, client_ip: str = None) -> None:
+    """Count a login attempt against the limit of its client address, and check the failed attempts of its email.
+
+    This is checked before the payload is validated or the database is
+    queried, so a burst of guesses is refused without reaching Postgres.
+    Only failed attempts count against the email, so an admin who logs in
+    often is not locked out by their own successful logins.
+    """
+    refused = login_limiter.check(ip=client_ip, email=login_email(admin_data))
+    if refused:
+        rule, retry_after = refused
+        raise TooManyLoginAttempts(f'Too many login attempts for this {rule}. Try again later.', retry_after)
+
+
+def handle_log_in_admin(admin_data: dict, client_ip: str = None) -> dict:
     """Handle a POST request to log in an admin."""
     try:
+        throttle_log_in(admin_data, client_ip)
         data = log_in_admin(admin_data)
+    except TooManyLoginAttempts as e:
+        events.rejected('admin.login', e, client_ip=client_ip)
+        return jsonify({'error': str(e)}), 429, {'Retry-After': str(e.retry_after)}
     except (
         EmptyAdminData,
         NonDictionaryAdminData,
@@ -250,80 +255,60 @@ def handle_log_in_admin(admin_data: dict) -> dict:
         ValueError,
         AdminPaswordTooShort,
         AdminPasswordTooLong,
-        AdminPasswordNotAlphaNumeric,
+        AdminPasswordNotAlphaNumeric
+    ) as e:
+        events.rejected('admin.login', e)
+        return jsonify({'error': str(e)}), 400
+    except (
         InvalidAdminPassword,
         AdminDoesNotExists
     ) as e:
-        app_logger.exception(e)
+        login_limiter.fail(email=login_email(admin_data))
+        events.rejected('admin.login', e)
         return jsonify({'error': str(e)}), 400
+    except PasswordHasherBusy as e:
+        events.rejected('admin.login', e)
+        return jsonify({'error': str(e)}), 503
     else:
         return data, 200
 
 
-def create_new_admin(admin_data: dict) -> dict:  # pylint: disable=R0912
-    """Create a new admin."""
-    if not admin_data:
-        app_logger.exception('When creating a new admin, the admin_data was empty.')
-        raise EmptyAdminData('The admin data cannot be empty.')
-
-    if not isinstance(admin_data, dict):
-        app_logger.exception('When creating a new admin, the admin_data was nota dictionary.')
-        raise NonDictionaryAdminData('admin_data must be a dict')
-
-    if 'email' not in admin_data.keys():
-        app_logger.exception('When creating a new admin, the email key was missing from the admin_data.')
-        raise MissingEmailKey('The email is missing from the admin data')
-
-    if not admin_data['email']:
-        app_logger.exception('When creating a new admin, the email data was missing from the admin_data.')
-        raise MissingEmailData('The email data is missing')
-
-    if len(admin_data['email']) >= EMAIL_MAX_LENGTH:
-        app_logger.exception(f'When creating a new admin, the email key was longer than {EMAIL_MAX_LENGTH}.')
-        raise EmailAddressTooLong(f'The email address should be less than {EMAIL_MAX_LENGTH} characters!')
-
-    if not is_email_address_format_valid(admin_data['email']):
-        app_logger.exception('When creating a new admin, the email address format was invalid.')
-        raise InvalidEmailAddressFormat('The email address is invalid')
-
-    if 'name' not in admin_data.keys():
-        app_logger.exception('When creating a new admin, the name key was missing from the admin_data.')
-        raise MissingNameKey('The name is missing from the admin data')
-
-    if not admin_data['name']:
-        app_logger.exception('When creating a new admin, the name data was missing from the admin_data.')
-        raise MissingNameData('The name data is missing')
+def handle_refresh_token(claims: dict):
+    """Handle a GET request to rotate a refresh token into a new access and refresh token."""
+    try:
+        access_token, refresh_token = token_store.rotate(claims)
+    except RevokedToken as e:
+        events.rejected('token.refresh', e, admin_id=claims.get('sub'))
+        return jsonify({'error': str(e)}), 401
+    else:
+        return jsonify(access_token=access_token, refresh_token=refresh_token), 200
 
-    if 'password' not in admin_data.keys():
-        app_logger.exception('When creating a new admin, the password key was missing from the admin_data.')
-        raise MissingPasswordKey('The password is missing from the admin data')
 
-    if not admin_data['password']:
-        app_logger.exception('When creating a new admin, the password data was missing from the admin_data.')
-        raise MissingPasswordData('The password data is missing')
+def handle_log_out(claims: dict):
+    """Handle a POST request to revoke the token and the others issued with it."""
+    revoked = token_store.revoke(claims)
+    events.info('admin.logout', 'The admin with id %s logged out.', claims['sub'], admin_id=claims['sub'],
+                revoked=len(revoked))
+    return jsonify({'msg': 'Successfully logged out.'}), 200
 
-    is_admin_name_valid(admin_data['name'])
 
-    try:
-        is_admin_password_valid(admin_data['password'])
-    except ValueError as e:
-        raise e
+def create_new_admin(admin_data: dict) -> dict:
+    """Create a new admin."""
+    ADMIN_SCHEMA.validate(admin_data)
 
-    if check_if_admin_exists(admin_data['email']):
-        app_logger.exception('When creating a new admin, the admin was found to already exist.')
-        raise AdminExists(f'The email adress {admin_data["email"]} is already in use.')
+    admin = insert_returning(
+        Admin,
+        {'email': admin_data['email'], 'name': admin_data['name'], 'password': passwords.hash(admin_data['password'])},
+        (Admin.id, Admin.email, Admin.name)
+    )
 
-    if check_if_admin_with_name_exists(admin_data['name']):
-        app_logger.exception('When creating a new admin, the admin was found to already exist.')
+    if not admin:
+        # The insert only tells us that a unique column clashed, so find out which one.
+        if check_if_admin_exists(admin_data['email']):
+            raise AdminExists(f'The email adress {admin_data["email"]} is already in use.')
         raise AdminExists(f'The name {admin_data["name"]} is already in use.')
 
-    admin = Admin(email=admin_data['email'], name=admin_data['name'],
-                  password=admin_data['password'])
-
-    db.session.add(admin)
-    db.session.commit()
-
-    return admin.get_admin()
+    return admin
 
 
 def handle_create_admin(request_data: dict):
@@ -347,26 +332,41 @@ def handle_create_admin(request_data: dict):
         AdminNameTooLong,
         MissingPasswordData
     ) as e:
-        app_logger.exception(e)
+        events.rejected('admin.create', e)
         return jsonify({'error': str(e)}), 400
+    except PasswordHasherBusy as e:
+        events.rejected('admin.create', e)
+        return jsonify({'error': str(e)}), 503
     else:
         return new_admin, 201
 
 
+@db.replica_reads
 def get_admin(admin_id: int) -> dict:
-    """Get the admin with the given id."""
+    """Get the admin with the given id.
+
+    The admin is read through admin_cache, so the JWT protected routes that
+    look up the admin on every call only query the database on a miss. The
+    entry is invalidated when the admin is updated or deleted.
+    """
     if not admin_id:
         raise EmptyAdminData('The admin_id has to be provided.')
 
     if not isinstance(admin_id, int):
         raise ValueError('The admin_id has to be an integer.')
 
-    if not check_if_admin_exists_with_id(admin_id):
-        raise AdminDoesNotExists(f'The admin with id {admin_id} does not exist.')
+    admin = admin_cache.get(admin_id)
+    if admin is not None:
+        return dict(admin)
 
     admin = Admin.query.filter_by(id=admin_id).first()
+    if not admin:
+        raise AdminDoesNotExists(f'The admin with id {admin_id} does not exist.')
 
-    return admin.get_admin()
+    admin = admin.get_admin()
+    admin_cache.set(admin_id, admin, ttl=db.cache_ttl())
+
+    return dict(admin)
 
 
 def handle_get_admin(admin_id: int):
@@ -378,7 +378,7 @@ def handle_get_admin(admin_id: int):
         EmptyAdminData,
         AdminDoesNotExists
     ) as e:
-        app_logger.exception(e)
+        events.rejected('admin.get', e)
         return jsonify({'error': str(e)}), 400
     else:
         return admin, 200
@@ -392,14 +392,17 @@ def delete_admin(admin_id: int) -> dict:
     if not isinstance(admin_id, int):
         raise ValueError('The admin_id has to be an integer.')
 
-    if not check_if_admin_exists_with_id(admin_id):
-        raise AdminDoesNotExists(f'The admin with id {admin_id} does not exist.')
+    # The admin's tokens stay valid until they expire unless they are revoked,
+    # and the delete cascades to those that are not detached from the admin.
+    token_store.detach_admin(admin_id)
 
-    admin = Admin.query.filter_by(id=admin_id).first()
-    db.session.delete(admin)
-    db.session.commit()
+    admin = delete_returning(Admin, admin_id, (Admin.id, Admin.email, Admin.name))
+    admin_cache.delete(admin_id)
+
+    if not admin:
+        raise AdminDoesNotExists(f'The admin with id {admin_id} does not exist.')
 
-    return admin.get_admin()
+    return admin
 
 
 def handle_delete_admin(admin_id: int):
@@ -411,13 +414,13 @@ def handle_delete_admin(admin_id: int):
         EmptyAdminData,
         AdminDoesNotExists
     ) as e:
-        app_logger.exception(e)
+        events.rejected('admin.delete', e)
         return jsonify({'error': str(e)}), 400
     else:
         return admin, 200
 
 
-def update_admin(admin_id: int, admin_data: dict) -> dict:  # pylint: disable=R0912
+def update_admin(admin_id: int, admin_data: dict) -> dict:
     """Update the admin with the given id."""
     if not admin_id:
         raise EmptyAdminData('The admin_id has to be provided.')
@@ -425,47 +428,22 @@ def update_admin(admin_id: int, admin_data: dict) -> dict:  # pylint: disable=R0
     if not isinstance(admin_id, int):
         raise ValueError('The admin_id has to be an integer.')
 
-    if not check_if_admin_exists_with_id(admin_id):
-        raise AdminDoesNotExists(f'The admin with id {admin_id} does not exist.')
-
-    if not admin_data:
-        raise EmptyAdminData('The admin data cannot be empty.')
-
-    if not isinstance(admin_data, dict):
-        raise NonDictionaryAdminData('admin_data must be a dict')
-
-    for key in admin_data.keys():
-        valid_keys = ['name', 'email', 'password']
-        if key not in valid_keys:
-            raise KeyError(f'Invalid key {key}. The valid keys are {valid_keys}.')
-
-    if 'email' in admin_data.keys():
-        is_email_address_format_valid(admin_data['email'])
-
-        if len(admin_data['email']) >= EMAIL_MAX_LENGTH:
-            raise EmailAddressTooLong('The email address is too long')
-
-        if check_if_admin_exists(admin_data['email']):
-            raise AdminExists(f'The email adress {admin_data["email"]} is already in use.')
-
-    if 'password' in admin_data.keys():
-        is_admin_password_valid(admin_data['password'])
-
-    if 'name' in admin_data.keys():
-        is_admin_name_valid(admin_data['name'])
-        if check_if_admin_with_name_exists(admin_data['name']):
-            raise AdminExists(f'The name {admin_data["name"]} is already in use.')
+    ADMIN_UPDATE_SCHEMA.validate(admin_data)
+    if 'password' in admin_data:
+        admin_data = {**admin_data, 'password': passwords.hash(admin_data['password'])}
 
-    admin = Admin.query.filter_by(id=admin_id).first()
-    if 'email' in admin_data.keys():
-        admin.email = admin_data['email']
-    if 'password' in admin_data.keys():
-        admin.password = admin_data['password']
-    if 'name' in admin_data.keys():
-        admin.name = admin_data['name']
-    db.session.commit()
+    try:
+        admin = update_returning(Admin, admin_id, admin_data, (Admin.id, Admin.email, Admin.name))
+    except IntegrityError as e:
+        if conflicting_column(e) == 'name':
+            raise AdminExists(f'The name {admin_data["name"]} is already in use.') from e
+        raise AdminExists(f'The email adress {admin_data.get("email")} is already in use.') from e
+    admin_cache.delete(admin_id)
+
+    if not admin:
+        raise AdminDoesNotExists(f'The admin with id {admin_id} does not exist.')
 
-    return admin.get_admin()
+    return admin
 
 
 def handle_update_admin(admin_id: int, admin_data: dict):
@@ -486,10 +464,72 @@ def handle_update_admin(admin_id: int, admin_data: dict):
         MissingEmailKey,
         NonDictionaryAdminData,
         ValueError,
-        EmptyAdminData,
-        AdminDoesNotExists
+        EmptyAdminData
     ) as e:
-        app_logger.exception(e)
+        events.rejected('admin.update', e)
         return jsonify({'error': str(e)}), 400
+    except AdminDoesNotExists as e:
+        events.rejected('admin.update', e)
+        return jsonify({'error': str(e)}), 404
+    except PasswordHasherBusy as e:
+        events.rejected('admin.update', e)
+        return jsonify({'error': str(e)}), 503
     else:
         return admin, 200
+
+
+def get_admin_columns(fields: str = None) -> tuple:
+    """Get the admin columns to select for the fields query parameter.
+
+    The fields are given as a comma separated list of ADMIN_PROJECTION_FIELDS.
+    The id is always selected since it is the pagination key.
+    """
+    if not fields:
+        names = ADMIN_PROJECTION_FIELDS
+    else:
+        names = [name.strip() for name in fields.split(',') if name.strip()]
+        for name in names:
+            if name not in ADMIN_PROJECTION_FIELDS:
+                raise InvalidProjectionField(
+                    f'Invalid field {name}. The valid fields are {list(ADMIN_PROJECTION_FIELDS)}.'
+                )
+
+    return tuple(getattr(Admin, name) for name in ADMIN_PROJECTION_FIELDS if name == 'id' or name in names)
+
+
+@db.replica_reads
+def get_all_admins(fields: str = None, limit=None, after: str = None) -> dict:
+    """Get one page of admins ordered by id with only the requested fields."""
+    columns = get_admin_columns(fields)
+    page_limit = parse_page_limit(limit)
+    last_id = decode_cursor(after) if after else None
+
+    admins, next_cursor = fetch_page(columns, Admin.id, page_limit, last_id)
+
+    return {'admins': admins, 'next_cursor': next_cursor}
+
+
+@db.replica_reads
+def stream_all_admins(fields: str = None, after: str = None):
+    """Stream all the admins ordered by id with only the requested fields as NDJSON."""
+    columns = get_admin_columns(fields)
+    last_id = decode_cursor(after) if after else None
+    return stream_rows(columns, Admin.id, last_id)
+
+
+def handle_get_all_admins(request_args: dict):
+    """Handle the GET request to the /admins route."""
+    try:
+        if request_args.get('stream', '').lower() in ('1', 'true', 'yes'):
+            admins = stream_all_admins(request_args.get('fields'), request_args.get('after'))
+            return Response(stream_with_context(admins), mimetype='application/x-ndjson'), 200
+        admins = get_all_admins(request_args.get('fields'), request_args.get('limit'), request_args.get('after'))
+    except (
+        InvalidProjectionField,
+        InvalidCursor,
+        InvalidPageLimit
+    ) as e:
+        events.rejected('admins.list', e)
+        return jsonify({'error': str(e)}), 400
+    else:
+        return admins, 200
@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 """This module contains the database models used by the auth blueprint."""
 from dataclasses import dataclass
+from datetime import datetime
 
-from ..constants import EMAIL_MAX_LENGTH, NAME_MAX_LENGTH, PASSWORD_MAX_LENGTH
+from ..constants import EMAIL_MAX_LENGTH, NAME_MAX_LENGTH, PASSWORD_HASH_MAX_LENGTH
 from ..extensions import db
 
 
@@ -19,7 +20,7 @@ class Admin(db.Model):
     name: str
         The admin user's name.
     password: str
-        The Admin user's password.
+        The hash of the admin user's password, see blueprints.passwords.
 
     """
 
@@ -28,7 +29,7 @@ class Admin(db.Model):
     id: int = db.Column(db.Integer, primary_key=True)
     email: str = db.Column(db.String(EMAIL_MAX_LENGTH), unique=True, nullable=False)
     name: str = db.Column(db.String(NAME_MAX_LENGTH), unique=True, nullable=False)
-    password: str = db.Column(db.String(PASSWORD_MAX_LENGTH), nullable=False)
+    password: str = db.Column(db.String(PASSWORD_HASH_MAX_LENGTH), nullable=False)
 
     def __init__(self, email: str, name: str, password: str) -> None:
         """Create a new admin.
@@ -49,3 +50,47 @@ class Admin(db.Model):
         """Get user data."""
         user = dict(id=self.id, email=self.email, name=self.name)
         return user
+
+
+@dataclass
+class Token(db.Model):
+    """A class that represents a JWT issued to an admin.
+
+    Attributes
+    ----------
+    jti: str
+        The unique id of the token.
+    family: str
+        The jti of the refresh token issued at login. Every token issued by
+        rotating that refresh token belongs to the same family.
+    admin_id: int
+        The id of the admin the token was issued to, or None once the admin
+        was deleted and the token is only kept as a revocation until it expires.
+    type: str
+        Either access or refresh.
+    expires_at: datetime
+        When the token expires.
+    revoked_at: datetime
+        When the token was revoked, or None.
+    replaced_by: str
+        The jti of the refresh token this one was rotated into, or None.
+    """
+
+    __tablename__ = 'tokens'
+
+    jti: str = db.Column(db.String(36), primary_key=True)
+    family: str = db.Column(db.String(36), nullable=False, index=True)
+    admin_id: int = db.Column(db.Integer, db.ForeignKey('admins.id', ondelete='CASCADE'), index=True)
+    type: str = db.Column(db.String(10), nullable=False)
+    expires_at: datetime = db.Column(db.DateTime(timezone=True), nullable=False)
+    revoked_at: datetime = db.Column(db.DateTime(timezone=True), index=True)
+    replaced_by: str = db.Column(db.String(36))
+
+    def __init__(self, jti: str, family: str, admin_id: int, type: str,  # pylint: disable=W0622
+                 expires_at: datetime) -> None:
+        """Record a token that was issued."""
+        self.jti = jti
+        self.family = family
+        self.admin_id = admin_id
+        self.type = type
+        self.expires_at = expires_at
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""This module records the tokens issued to the admins and revokes them.
+
+Every access and refresh token is recorded in the tokens table with its
+family, the refresh token issued at login. A refresh token can be used once:
+it is revoked and replaced by a new access and refresh token of the same
+family, which expires when the family's first refresh token would have, so
+a session cannot be extended forever. When a refresh token that was already
+replaced is used again, it has leaked, so its whole family is revoked.
+
+Checking the table on every request would add a query to each of them, so
+flask-jwt-extended asks the TokenStore, which keeps the jtis of the revoked
+tokens that have not expired in a BloomFilter. A token that is not in the
+filter was never revoked, which answers almost every request without a
+query. A token that may be in it is confirmed against the table. Tokens
+revoked by this worker are added at once, and those revoked by the other
+workers are read from the table every TOKEN_BLOCKLIST_REFRESH seconds.
+
+Deleting an admin cascades to their tokens, so the tokens that have not
+expired are revoked and detached from the admin first, and kept as
+revocations. Expired tokens are removed by purge_expired, which the
+purge_tokens command of manage.py runs.
+"""
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from flask_jwt_extended import create_access_token, create_refresh_token
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from ..bloom import BloomFilter
+from ..exceptions import RevokedToken
+from ..extensions import db, events, jwt
+from ..metrics import register_metrics
+from .models import Admin, Token
+
+# Revocations committed up to this long before the newest one that was read
+# are read again, in case their transactions committed out of order.
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+
+class TokenStore():
+    """An extension that records, rotates and revokes the admins' tokens.
+
+    Attributes
+    ----------
+    checks: int
+        The number of tokens checked for revocation.
+    lookups: int
+        The number of checks the Bloom filter could not answer alone.
+    revoked: int
+        The number of tokens revoked by this worker.
+    reused: int
+        The number of replaced refresh tokens that were used again.
+    """
+
+    def __init__(self, app=None) -> None:
+        """Create the store."""
+        self.refresh_interval = 5.0
+        self.capacity = 100000
+        self.error_rate = 0.001
+        self.checks = 0
+        self.lookups = 0
+        self.revoked = 0
+        self.reused = 0
+        self._bloom = None
+        self._watermark = None
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        """Configure the store from the TOKEN_* settings and check tokens against it."""
+        self.configure(app.config)
+        jwt.token_in_blocklist_loader(self.is_revoked)
+
+    def configure(self, config) -> None:
+        """Read the TOKEN_* settings, for a store that checks tokens outside flask-jwt-extended."""
+        self.refresh_interval = float(config.get('TOKEN_BLOCKLIST_REFRESH', self.refresh_interval))
+        self.capacity = int(config.get('TOKEN_BLOOM_CAPACITY', self.capacity))
+        self.error_rate = float(config.get('TOKEN_BLOOM_ERROR_RATE', self.error_rate))
+
+    @staticmethod
+    def _expiry(delta: timedelta) -> datetime:
+        """Get when a token that lasts for the delta expires."""
+        return datetime.now(timezone.utc) + delta
+
+    def _issue(self, admin_id: int, refresh_jti: str, family: str = None, refresh_expires: timedelta = None):
+        """Create an access and a refresh token and add them to the session, without committing."""
+        access_jti = str(uuid.uuid4())
+        family = family or refresh_jti
+        access_expires = current_app.config['JWT_ACCESS_TOKEN_EXPIRES']
+        refresh_expires = refresh_expires or current_app.config['JWT_REFRESH_TOKEN_EXPIRES']
+
+        access_token = create_access_token(admin_id, additional_claims={'jti': access_jti})
+        refresh_token = create_refresh_token(admin_id, additional_claims={'jti': refresh_jti},
+                                             expires_delta=refresh_expires)
+        db.session.add_all([
+            Token(access_jti, family, admin_id, 'access', self._expiry(access_expires)),
+            Token(refresh_jti, family, admin_id, 'refresh', self._expiry(refresh_expires)),
+        ])
+        return access_token, refresh_token
+
+    def issue(self, admin_id: int) -> tuple:
+        """Create and record the access and refresh tokens of a new login."""
+        access_token, refresh_token = self._issue(admin_id, str(uuid.uuid4()))
+        db.session.commit()
+        return access_token, refresh_token
+
+    def rotate(self, claims: dict) -> tuple:
+        """Replace the refresh token with the given claims by a new access and refresh token.
+
+        Raises
+        ------
+        RevokedToken
+            If the refresh token is unknown, was revoked, or was already
+            replaced, in which case its whole family is revoked.
+        """
+        refresh_expires = datetime.fromtimestamp(claims['exp'], timezone.utc) - datetime.now(timezone.utc)
+        new_jti = str(uuid.uuid4())
+        query = (update(Token.__table__)
+                 .where(Token.jti == claims['jti'], Token.type == 'refresh', Token.revoked_at.is_(None))
+                 .values(revoked_at=func.now(), replaced_by=new_jti)
+                 .returning(Token.family))
+        family = db.session.execute(query).scalar()
+        if family is None:
+            db.session.rollback()
+            self._revoke_reused(claims['jti'])
+            raise RevokedToken('The refresh token has been revoked.')
+
+        access_token, refresh_token = self._issue(claims['sub'], new_jti, family, refresh_expires)
+        db.session.commit()
+        self._add(claims['jti'])
+        return access_token, refresh_token
+
+    def _revoke_reused(self, jti: str) -> None:
+        """Revoke the family of a refresh token that was used after it was replaced."""
+        token = db.session.get(Token, jti)
+        if token is not None and token.replaced_by is not None:
+            with self._lock:
+                self.reused += 1
+            events.warning('token.reuse', 'A replaced refresh token of the admin with id %s was used again.',
+                           token.admin_id, admin_id=token.admin_id)
+            self._revoke(Token.family == token.family)
+
+    def _revoke(self, condition) -> list:
+        """Revoke the tokens that match the condition and have not expired."""
+        query = (update(Token.__table__)
+                 .where(condition, Token.revoked_at.is_(None), Token.expires_at > func.now())
+                 .values(revoked_at=func.now())
+                 .returning(Token.jti))
+        jtis = db.session.execute(query).scalars().all()
+        db.session.commit()
+        for jti in jtis:
+            self._add(jti)
+        with self._lock:
+            self.revoked += len(jtis)
+        return jtis
+
+    def revoke(self, claims: dict) -> list:
+        """Revoke the token with the given claims and every token of its family, as on logout.
+
+        A token that was not recorded, such as one issued before the store
+        existed, is recorded as revoked, without an admin if it was deleted.
+        """
+        admin_id = select(Admin.id).where(Admin.id == claims['sub']).scalar_subquery()
+        record = insert(Token.__table__).values(
+            jti=claims['jti'], family=claims['jti'], admin_id=admin_id, type=claims['type'],
+            expires_at=datetime.fromtimestamp(claims['exp'], timezone.utc),
+        ).on_conflict_do_nothing()
+        db.session.execute(record)
+        family = select(Token.family).where(Token.jti == claims['jti']).scalar_subquery()
+        return self._revoke(Token.family == family)
+
+    def revoke_admin(self, admin_id: int) -> list:
+        """Revoke every token of the admin, so a deleted or locked out admin cannot use them."""
+        return self._revoke(Token.admin_id == admin_id)
+
+    def detach_admin(self, admin_id: int) -> list:
+        """Revoke every token of an admin about to be deleted, and keep those that have not expired.
+
+        The tokens that have not expired are detached from the admin, so the
+        delete does not cascade to them and the other workers still read their
+        revocation. purge_expired removes them once they expire.
+        """
+        jtis = self.revoke_admin(admin_id)
+        query = (update(Token.__table__)
+                 .where(Token.admin_id == admin_id, Token.expires_at > func.now())
+                 .values(admin_id=None))
+        db.session.execute(query)
+        db.session.commit()
+        return jtis
+
+    def purge_expired(self) -> int:
+        """Remove the tokens that have expired, which flask-jwt-extended refuses without checking them."""
+        result = db.session.execute(delete(Token.__table__).where(Token.expires_at < func.now()))
+        db.session.commit()
+        return result.rowcount
+
+    def _add(self, jti: str) -> None:
+        """Add a revoked jti to the Bloom filter, if it has been loaded."""
+        bloom = self._bloom
+        if bloom is not None:
+            bloom.add(jti)
+
+    def refresh_due(self) -> bool:
+        """Check whether the revoked tokens have to be read again, claiming the refresh for the caller if so."""
+        if time.monotonic() < self._next_refresh or not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            if time.monotonic() < self._next_refresh:
+                return False
+            self._next_refresh = time.monotonic() + self.refresh_interval
+            return True
+        finally:
+            self._refresh_lock.release()
+
+    def refresh_query(self):
+        """Get the query for the tokens revoked since the last refresh, or all of them for a missing or full filter."""
+        query = select(Token.jti, Token.revoked_at).where(Token.revoked_at.isnot(None), Token.expires_at > func.now())
+        if self._bloom is not None and not self._bloom.full():
+            query = query.where(Token.revoked_at >= self._watermark - REFRESH_OVERLAP)
+        return query
+
+    def load(self, rows) -> None:
+        """Add the jti and revoked_at rows read with refresh_query to the Bloom filter."""
+        rebuild = self._bloom is None or self._bloom.full()
+        bloom = BloomFilter(max(self.capacity, len(rows) * 2), self.error_rate) if rebuild else self._bloom
+        for jti, _ in rows:
+            bloom.add(jti)
+
+        newest = max((revoked_at for _, revoked_at in rows), default=None)
+        if newest is not None and (self._watermark is None or newest > self._watermark):
+            self._watermark = newest
+        elif self._watermark is None:
+            self._watermark = datetime.now(timezone.utc)
+        self._bloom = bloom
+
+    def may_be_revoked(self, jti: str) -> bool:
+        """Check the Bloom filter, which answers False for every token that was never revoked."""
+        self.checks += 1
+        bloom = self._bloom
+        if jti is None or bloom is None or jti not in bloom:
+            return False
+        self.lookups += 1
+        return True
+
+    def is_revoked(self, jwt_header: dict, jwt_payload: dict) -> bool:  # pylint: disable=W0613
+        """Check whether the token was revoked, for flask-jwt-extended's token_in_blocklist_loader."""
+        if self.refresh_due():
+            self.load(db.session.execute(self.refresh_query()).all())
+
+        jti = jwt_payload.get('jti')
+        if not self.may_be_revoked(jti):
+            return False
+
+        token = db.session.get(Token, jti)
+        if token is None or token.revoked_at is None:
+            return False
+        if token.type == 'refresh' and token.replaced_by is not None:
+            self._revoke_reused(jti)
+        return True
+
+    def stats(self) -> dict:
+        """Get the revocation counters and the size of the Bloom filter."""
+        bloom = self._bloom
+        return {
+            'checks': self.checks,
+            'lookups': self.lookups,
+            'revoked': self.revoked,
+            'reused': self.reused,
+            'blocklist_size': bloom.count if bloom is not None else 0,
+        }
+
+
+token_store = TokenStore()
+register_metrics('revocation', token_store.stats)
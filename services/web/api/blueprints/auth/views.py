@@ -2,13 +2,21 @@
 """This module contains the routes associated with the auth Blueprint."""
 from json import JSONDecodeError
 
-from api.blueprints.auth.models import Admin
-from flasgger import swag_from
-from flask import Blueprint, jsonify, request
-from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required
-
-from ..extensions import app_logger
-from .helpers import handle_create_admin, handle_get_admin, handle_log_in_admin, handle_update_admin
+from flask import Blueprint, request
+from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
+
+from ..apidocs import swag_from
+from ..extensions import events
+from .helpers import (
+    handle_create_admin,
+    handle_delete_admin,
+    handle_get_admin,
+    handle_get_all_admins,
+    handle_log_in_admin,
+    handle_log_out,
+    handle_refresh_token,
+    handle_update_admin,
+)
 
 auth = Blueprint('auth', __name__, template_folder='templates',
                  static_folder='static', url_prefix='/auth')
@@ -37,17 +45,23 @@ def login():
         print(e)
         return str(e), 400
     else:
-        return handle_log_in_admin(data)
+        return handle_log_in_admin(data, request.remote_addr)
 
 
 @auth.route("/refresh", methods=["GET"])
 @jwt_required(refresh=True)
 @swag_from("./docs/refresh_token.yml", endpoint='auth.refresh', methods=['GET'])
 def refresh():
-    """Generate a refresh token."""
-    identity = get_jwt_identity()
-    access_token = create_access_token(identity=identity)
-    return jsonify(access_token=access_token), 200
+    """Rotate the refresh token into a new access and refresh token."""
+    return handle_refresh_token(get_jwt())
+
+
+@auth.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+@swag_from("./docs/logout_admin.yml", endpoint='auth.logout', methods=['POST'])
+def logout():
+    """Revoke the admin's access and refresh tokens."""
+    return handle_log_out(get_jwt())
 
 
 @auth.route('/me', methods=['GET'])
@@ -55,9 +69,8 @@ def refresh():
 @swag_from("./docs/get_admin.yml", endpoint='auth.get_admin', methods=['GET'])
 def get_admin():
     """Get admin details."""
-    app_logger.info("Handling a GET request to '/auth/me' route.")
     admin_id = get_jwt_identity()
-    app_logger.info(f"GET request succeessful. Returning user with id {admin_id}.")
+    events.info('admin.get', "Handling a GET request to '/auth/me' route.", admin_id=admin_id)
     return handle_get_admin(admin_id)
 
 
@@ -81,14 +94,14 @@ def update_admin():
 @swag_from("./docs/delete_admin.yml", endpoint='auth.delete_admin', methods=['DELETE'])
 def delete_admin():
     """Delete admin details."""
-    app_logger.info("Successfully deleted the admin data.")
-    return jsonify({'hello': 'from template api'}), 200
+    admin_id = get_jwt_identity()
+    events.info('admin.delete', "Handling a DELETE request to '/auth/me' route.", admin_id=admin_id)
+    return handle_delete_admin(admin_id)
 
 
 @auth.route('/admins', methods=['GET'])
 @swag_from("./docs/get_all_admins.yml", endpoint='auth.get_all_admins', methods=['GET'])
 def get_all_admins():
-    """Get all admins."""
-    admins = Admin.query.all(), 200
-    app_logger.info("Successfully handled a GET request to the '/admins' route. Returning all the admins.")
-    return jsonify(admins), 200
+    """Get the admins one page at a time, or stream all of them as NDJSON."""
+    events.info('admins.list', "Handling a GET request to '/auth/admins' route.")
+    return handle_get_all_admins(request.args)
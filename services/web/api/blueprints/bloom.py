@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""This module has the Bloom filter used to check for revoked tokens."""
+import math
+import threading
+
+
+class BloomFilter():
+    """A Bloom filter of strings.
+
+    A lookup answers either that a string was definitely never added, or
+    that it may have been, with a false positive rate close to error_rate as
+    long as no more than capacity strings are added. The bit positions come
+    from the hash the interpreter caches on every str, split into two halves
+    for double hashing, so the filter only works within one process and is
+    rebuilt by every worker. Lookups take no lock, and adds take one so
+    concurrent adds do not lose each other's bits.
+
+    Attributes
+    ----------
+    capacity: int
+        The number of strings the filter is sized for.
+    count: int
+        The number of strings added.
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001) -> None:
+        """Create an empty filter sized for the capacity and error rate."""
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+        self._lock = threading.Lock()
+
+    def _positions(self, item: str):
+        """Get the bit positions of the string."""
+        value = hash(item)
+        first, second = value & 0xFFFFFFFF, (value >> 32) | 1
+        for i in range(self.hashes):
+            yield (first + i * second) % self.size
+
+    def add(self, item: str) -> None:
+        """Add the string to the filter."""
+        with self._lock:
+            for position in self._positions(item):
+                self._bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        """Check whether the string may have been added."""
+        # The positions are computed inline, as a lookup is on the path of every request.
+        value = hash(item)
+        first, second = value & 0xFFFFFFFF, (value >> 32) | 1
+        bits, size = self._bits, self.size
+        for i in range(self.hashes):
+            position = (first + i * second) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def full(self) -> bool:
+        """Check whether more strings were added than the filter was sized for."""
+        return self.count > self.capacity
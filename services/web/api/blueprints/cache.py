@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""This module has the caches that are used by the blueprints.
+
+A Cache is backed either by an in-process LRUCache or, when CACHE_BACKEND is
+set to redis, by a RedisCache that is shared by every worker and container.
+Invalidating a key only reaches the worker that wrote when the cache is in
+process, so the other workers keep serving the old value until it expires.
+Entries of the in-process cache therefore only live for CACHE_LOCAL_TTL
+seconds, a few seconds by default, and CACHE_BACKEND=redis is the one to use
+with several workers.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_MAX_SIZE = 10000
+DEFAULT_CACHE_TTL = 300
+DEFAULT_LOCAL_CACHE_TTL = 5
+
+
+class LRUCache():
+    """A thread safe least recently used cache whose entries expire.
+
+    Attributes
+    ----------
+    max_size: int
+        The number of entries kept before the least recently used is evicted.
+    ttl: float
+        The number of seconds an entry is served for after it is set.
+    hits: int
+        The number of lookups that found a live entry.
+    misses: int
+        The number of lookups that found no entry or an expired one.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_MAX_SIZE, ttl: float = DEFAULT_CACHE_TTL) -> None:
+        """Create an empty cache."""
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Get the value for the key, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl: float = None) -> None:
+        """Set the value for the key for ttl seconds, or the cache's ttl, evicting the least recently used entry."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key) -> None:
+        """Remove the key from the cache."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Get the size and the hit and miss counters of the cache."""
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class RedisCache():
+    """A cache that stores JSON encoded values in Redis.
+
+    Any client that speaks the Redis protocol can be used, such as a
+    redis.Redis instance or a fakeredis.FakeRedis in tests. When Redis cannot
+    be reached a lookup counts as a miss and a write is skipped, so the
+    helpers fall back to the database.
+
+    Attributes
+    ----------
+    client: redis.Redis
+        The Redis client.
+    namespace: str
+        The prefix of every key written by this cache.
+    ttl: int
+        The number of seconds an entry is served for after it is set.
+    hits: int
+        The number of lookups that found an entry.
+    misses: int
+        The number of lookups that found no entry.
+    errors: int
+        The number of commands that failed.
+    """
+
+    def __init__(self, client, namespace: str, ttl: int = DEFAULT_CACHE_TTL) -> None:
+        """Create a cache that uses the given client."""
+        self.client = client
+        self.namespace = namespace
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, key) -> str:
+        """Get the Redis key for the cache key."""
+        return f'{self.namespace}:{key}'
+
+    def get(self, key):
+        """Get the value for the key, or None if it is missing."""
+        try:
+            value = self.client.get(self._key(key))
+        except Exception:  # pylint: disable=W0703
+            self.errors += 1
+            value = None
+
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return json.loads(value)
+
+    def set(self, key, value, ttl: float = None) -> None:
+        """Set the value for the key for ttl seconds, or the cache's ttl."""
+        try:
+            self.client.set(self._key(key), json.dumps(value), ex=self.ttl if ttl is None else max(1, round(ttl)))
+        except Exception:  # pylint: disable=W0703
+            self.errors += 1
+
+    def delete(self, key) -> None:
+        """Remove the key from the cache."""
+        try:
+            self.client.delete(self._key(key))
+        except Exception:  # pylint: disable=W0703
+            self.errors += 1
+
+    def clear(self) -> None:
+        """Remove every key in the namespace from the cache."""
+        try:
+            keys = list(self.client.scan_iter(match=f'{self.namespace}:*'))
+            if keys:
+                self.client.delete(*keys)
+        except Exception:  # pylint: disable=W0703
+            self.errors += 1
+
+    def stats(self) -> dict:
+        """Get the hit, miss and error counters of the cache."""
+        return {'hits': self.hits, 'misses': self.misses, 'errors': self.errors}
+
+
+class Cache():
+    """A cache extension that is configured from the Flask app config.
+
+    The cache works before init_app is called, with the default size and the
+    local ttl, so helpers can use it outside an application.
+    """
+
+    def __init__(self, namespace: str, app=None) -> None:
+        """Create the cache for the given namespace."""
+        self.namespace = namespace
+        self.backend = LRUCache(ttl=DEFAULT_LOCAL_CACHE_TTL)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        """Configure the cache from the CACHE_BACKEND, CACHE_MAX_SIZE, CACHE_TTL and CACHE_LOCAL_TTL settings.
+
+        CACHE_BACKEND is either memory, the default, or redis. The redis
+        backend connects to CACHE_REDIS_URL and keeps entries for CACHE_TTL
+        seconds. The memory backend keeps them for CACHE_LOCAL_TTL seconds at
+        most, since the other workers do not see its invalidations.
+        """
+        ttl = app.config.get('CACHE_TTL', DEFAULT_CACHE_TTL)
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+
+        if backend == 'memory':
+            local_ttl = min(ttl, app.config.get('CACHE_LOCAL_TTL', DEFAULT_LOCAL_CACHE_TTL))
+            self.backend = LRUCache(max_size=app.config.get('CACHE_MAX_SIZE', DEFAULT_CACHE_MAX_SIZE), ttl=local_ttl)
+        elif backend == 'redis':
+            import redis  # pylint: disable=C0415
+            client = redis.Redis.from_url(app.config['CACHE_REDIS_URL'])
+            self.backend = RedisCache(client, self.namespace, ttl=ttl)
+        else:
+            raise ValueError(f'The cache backend {backend} is not supported. Use memory or redis.')
+
+    def get(self, key):
+        """Get the cached value for the key, or None."""
+        return self.backend.get(key)
+
+    def set(self, key, value, ttl: float = None) -> None:
+        """Cache the value for the key for ttl seconds, or the backend's ttl."""
+        self.backend.set(key, value, ttl=ttl)
+
+    def delete(self, key) -> None:
+        """Invalidate the key."""
+        self.backend.delete(key)
+
+    def clear(self) -> None:
+        """Invalidate every key."""
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        """Get the hit and miss counters of the cache."""
+        return self.backend.stats()
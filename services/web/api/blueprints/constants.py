@@ -8,3 +8,12 @@ NAME_MIN_LENGTH = 2
 
 PASSWORD_MAX_LENGTH = 20
 PASSWORD_MIN_LENGTH = 3
+PASSWORD_HASH_MAX_LENGTH = 255
+
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+STREAM_CHUNK_SIZE = 1000
+
+ADMIN_PROJECTION_FIELDS = ('id', 'email', 'name')
+
+USER_BATCH_MAX_SIZE = 1000
@@ -1,34 +1,45 @@
 # -*- coding: utf-8 -*-
 """This module has methods that are used in the other modules in this package."""
-import re
+from flask import Response, jsonify, stream_with_context
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 
-from flask import jsonify
-
-from ..constants import EMAIL_MAX_LENGTH
+from ..constants import USER_BATCH_MAX_SIZE
 from ..exceptions import (
     EmailAddressTooLong,
     EmptyUserData,
+    InvalidCursor,
     InvalidEmailAddressFormat,
+    InvalidIdList,
+    InvalidPageLimit,
     MissingEmailData,
     MissingEmailKey,
     NonDictionaryUserData,
+    NonListUserData,
+    UserBatchTooLarge,
     UserDoesNotExists,
     UserExists,
 )
-from ..extensions import app_logger, db
+from ..extensions import db, events, user_cache
+from ..pagination import decode_cursor, fetch_page, parse_page_limit, stream_rows
+from ..queries import delete_many_returning, delete_returning, insert_returning, update_returning
+from ..schemas import EMAIL_PATTERN, USER_SCHEMA
 from .models import User
 
+USER_COLUMNS = (User.id, User.email, User.active)
+
 
 def check_if_user_exists_with_id(user_id: int) -> bool:
     """Check if the user with the given user_id exists."""
     if not user_id:
         msg = 'When checking if user exists using their id, the user_id was null.'
-        app_logger.exception(msg)
+        events.rejected('user.lookup', msg)
         raise ValueError('The user_id has to be provided.')
 
     if not isinstance(user_id, int):
         msg = 'When checking if user exists using their id, the user_id was not an integer.'
-        app_logger.exception(msg)
+        events.rejected('user.lookup', msg)
         raise ValueError('The user_id has to be an integer')
 
     user = User.query.filter_by(id=user_id).first()
@@ -43,12 +54,12 @@ def check_if_user_exists(user_email: str) -> bool:
     """Check if the user with the given user_email exists."""
     if not user_email:
         msg = 'When checking if user exists using their email, the user_email was null.'
-        app_logger.exception(msg)
+        events.rejected('user.lookup', msg)
         raise ValueError('The user_email has to be provided.')
 
     if not isinstance(user_email, str):
         msg = 'When checking if user exists using their email, the user_email was not a string.'
-        app_logger.exception(msg)
+        events.rejected('user.lookup', msg)
         raise ValueError('The user_email has to be an integer')
 
     user = User.query.filter_by(email=user_email).first()
@@ -63,58 +74,38 @@ def is_email_address_format_valid(email_address: str) -> bool:
     """Check that the email address format is valid."""
     if not email_address:
         msg = 'When checking if an email address format is valid, the user_email was null.'
-        app_logger.exception(msg)
+        events.rejected('email.validate', msg)
         raise ValueError('The email_address cannot be an empty value')
 
     if not isinstance(email_address, str):
         msg = 'When checking if an email address format is valid, the user_email was not a string.'
-        app_logger.exception(msg)
+        events.rejected('email.validate', msg)
         raise ValueError('The email_address must be a string')
 
-    #  Regular expression for validating an Email
-    regex = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-
-    if re.fullmatch(regex, email_address):
+    if EMAIL_PATTERN.fullmatch(email_address):
         return True
 
     return False
 
 
-def create_new_user(user_data: dict) -> dict:
-    """Create a new user."""
-    if not user_data:
-        app_logger.exception('When creating a new user, the user_data was empty.')
-        raise EmptyUserData('The user data cannot be empty.')
+def validate_user_data(user_data: dict) -> str:
+    """Validate the data for a new user and return the email."""
+    USER_SCHEMA.validate(user_data)
 
-    if not isinstance(user_data, dict):
-        app_logger.exception('When creating a new user, the user_data was nota dictionary.')
-        raise NonDictionaryUserData('user_data must be a dict')
+    return user_data['email']
 
-    if 'email' not in user_data.keys():
-        app_logger.exception('When creating a new user, the email key was missing from the user_data.')
-        raise MissingEmailKey('The email is missing from the user data')
 
-    if not user_data['email']:
-        app_logger.exception('When creating a new user, the email data was missing from the user_data.')
-        raise MissingEmailData('The email data is missing')
-
-    if len(user_data['email']) > EMAIL_MAX_LENGTH:
-        app_logger.exception(f'When creating a new user, the email key was longer than {EMAIL_MAX_LENGTH}.')
-        raise EmailAddressTooLong(f'The email address should be less than {EMAIL_MAX_LENGTH} characters!')
+def create_new_user(user_data: dict) -> dict:
+    """Create a new user."""
+    validate_user_data(user_data)
 
-    if not is_email_address_format_valid(user_data['email']):
-        app_logger.exception('When creating a new user, the email address format was invalid.')
-        raise InvalidEmailAddressFormat('The email address is invalid')
+    user = insert_returning(User, {'email': user_data['email']}, (User.id, User.email))
 
-    if check_if_user_exists(user_data['email']):
-        app_logger.exception('When creating a new user, the user was found to already exist.')
+    if not user:
         raise UserExists(f'The email adress {user_data["email"]} is already in use.')
+    user_cache.delete(user['id'])
 
-    user = User(email=user_data['email'])
-    db.session.add(user)
-    db.session.commit()
-
-    return user.get_user()
+    return user
 
 
 def handle_create_user(request_data: dict):  # pylint: disable=R0911
@@ -130,26 +121,37 @@ def handle_create_user(request_data: dict):  # pylint: disable=R0911
         NonDictionaryUserData,
         EmptyUserData,
     ) as e:
-        app_logger.exception(e)
+        events.rejected('user.create', e)
         return jsonify({'error': str(e)}), 400
     else:
         return new_user, 201
 
 
+@db.replica_reads
 def get_user(user_id: int) -> dict:
-    """Get the user with the given id."""
+    """Get the user with the given id.
+
+    The user is read through user_cache and is only selected from the
+    database on a miss. Creating, updating and deleting users invalidates it.
+    """
     if not user_id:
         raise EmptyUserData('The user_id has to be provided.')
 
     if not isinstance(user_id, int):
         raise ValueError('The user_id has to be an integer.')
 
-    if not check_if_user_exists_with_id(user_id):
+    user = user_cache.get(user_id)
+    if user is not None:
+        return dict(user)
+
+    user = db.session.execute(select(User.id, User.email).where(User.id == user_id)).mappings().first()
+    if not user:
         raise UserDoesNotExists(f'The user with id {user_id} does not exist.')
 
-    user = User.query.filter_by(id=user_id).first()
+    user = dict(user)
+    user_cache.set(user_id, user, ttl=db.cache_ttl())
 
-    return user.get_user()
+    return dict(user)
 
 
 def handle_get_user(user_id: int):
@@ -158,11 +160,13 @@ def handle_get_user(user_id: int):
         user = get_user(user_id)
     except (
         ValueError,
-        EmptyUserData,
-        UserDoesNotExists
+        EmptyUserData
     ) as e:
-        app_logger.exception(e)
+        events.rejected('user.get', e)
         return jsonify({'error': str(e)}), 400
+    except UserDoesNotExists as e:
+        events.rejected('user.get', e)
+        return jsonify({'error': str(e)}), 404
     else:
         return user, 200
 
@@ -175,14 +179,13 @@ def delete_user(user_id: int) -> dict:
     if not isinstance(user_id, int):
         raise ValueError('The user_id has to be an integer.')
 
-    if not check_if_user_exists_with_id(user_id):
-        raise UserDoesNotExists(f'The user with id {user_id} does not exist.')
+    user = delete_returning(User, user_id, (User.id, User.email))
+    user_cache.delete(user_id)
 
-    user = User.query.filter_by(id=user_id).first()
-    db.session.delete(user)
-    db.session.commit()
+    if not user:
+        raise UserDoesNotExists(f'The user with id {user_id} does not exist.')
 
-    return user.get_user()
+    return user
 
 
 def handle_delete_user(user_id: int):
@@ -191,11 +194,13 @@ def handle_delete_user(user_id: int):
         user = delete_user(user_id)
     except (
         ValueError,
-        EmptyUserData,
-        UserDoesNotExists
+        EmptyUserData
     ) as e:
-        app_logger.exception(e)
+        events.rejected('user.delete', e)
         return jsonify({'error': str(e)}), 400
+    except UserDoesNotExists as e:
+        events.rejected('user.delete', e)
+        return jsonify({'error': str(e)}), 404
     else:
         return user, 200
 
@@ -208,35 +213,18 @@ def update_user(user_id: int, user_data: dict) -> dict:
     if not isinstance(user_id, int):
         raise ValueError('The user_id has to be an integer.')
 
-    if not check_if_user_exists_with_id(user_id):
-        raise UserDoesNotExists(f'The user with id {user_id} does not exist.')
-
-    if not user_data:
-        raise EmptyUserData('The user data cannot be empty.')
-
-    if not isinstance(user_data, dict):
-        raise NonDictionaryUserData('user_data must be a dict')
-
-    if 'email' not in user_data.keys():
-        raise MissingEmailKey('The email is missing from the user data')
+    USER_SCHEMA.validate(user_data)
 
-    if not user_data['email']:
-        raise MissingEmailData('The email data is missing')
-
-    if len(user_data['email']) > 120:
-        raise EmailAddressTooLong('The email address is too long')
-
-    if not is_email_address_format_valid(user_data['email']):
-        raise InvalidEmailAddressFormat('The email address is invalid')
-
-    if check_if_user_exists(user_data['email']):
-        raise UserExists(f'The email adress {user_data["email"]} is already in use.')
+    try:
+        user = update_returning(User, user_id, {'email': user_data['email']}, (User.id, User.email))
+    except IntegrityError as e:
+        raise UserExists(f'The email adress {user_data["email"]} is already in use.') from e
+    user_cache.delete(user_id)
 
-    user = User.query.filter_by(id=user_id).first()
-    user.email = user_data['email']
-    db.session.commit()
+    if not user:
+        raise UserDoesNotExists(f'The user with id {user_id} does not exist.')
 
-    return user.get_user()
+    return user
 
 
 def handle_update_user(user_id: int, user_data: dict):  # pylint: disable=R0911
@@ -251,10 +239,197 @@ def handle_update_user(user_id: int, user_data: dict):  # pylint: disable=R0911
         MissingEmailKey,
         NonDictionaryUserData,
         ValueError,
-        EmptyUserData,
-        UserDoesNotExists
+        EmptyUserData
     ) as e:
-        app_logger.exception(e)
+        events.rejected('user.update', e)
         return jsonify({'error': str(e)}), 400
+    except UserDoesNotExists as e:
+        events.rejected('user.update', e)
+        return jsonify({'error': str(e)}), 404
     else:
         return user, 200
+
+
+@db.replica_reads
+def get_all_users(limit=None, after: str = None) -> dict:
+    """Get one page of users ordered by id."""
+    page_limit = parse_page_limit(limit)
+    last_id = decode_cursor(after) if after else None
+
+    users, next_cursor = fetch_page(USER_COLUMNS, User.id, page_limit, last_id)
+
+    return {'users': users, 'next_cursor': next_cursor}
+
+
+@db.replica_reads
+def stream_all_users(after: str = None):
+    """Stream all the users ordered by id as NDJSON."""
+    last_id = decode_cursor(after) if after else None
+    return stream_rows(USER_COLUMNS, User.id, last_id)
+
+
+def handle_get_all_users(request_args: dict):
+    """Handle the GET request to the /users route."""
+    try:
+        if request_args.get('stream', '').lower() in ('1', 'true', 'yes'):
+            users = stream_all_users(request_args.get('after'))
+            return Response(stream_with_context(users), mimetype='application/x-ndjson'), 200
+        users = get_all_users(request_args.get('limit'), request_args.get('after'))
+    except (
+        InvalidCursor,
+        InvalidPageLimit
+    ) as e:
+        events.rejected('users.list', e)
+        return jsonify({'error': str(e)}), 400
+    else:
+        return users, 200
+
+
+def _validate_batch(users_data: list) -> tuple:
+    """Validate every user of a batch, keeping the first of the items that share an email.
+
+    Returns
+    -------
+    tuple:
+        A result for every item, None for the items left to insert, and a
+        dict of the emails left to insert to the index of their item.
+    """
+    results = [None] * len(users_data)
+    pending = {}
+    for index, user_data in enumerate(users_data):
+        try:
+            email = validate_user_data(user_data)
+        except (
+            MissingEmailData,
+            InvalidEmailAddressFormat,
+            EmailAddressTooLong,
+            MissingEmailKey,
+            NonDictionaryUserData,
+            EmptyUserData,
+            TypeError,
+            ValueError,
+        ) as e:
+            results[index] = {'index': index, 'status': 'invalid', 'error': str(e)}
+            continue
+
+        if email in pending:
+            results[index] = {'index': index, 'status': 'exists',
+                              'error': f'The email adress {email} is already in use.'}
+            continue
+        pending[email] = index
+
+    return results, pending
+
+
+def create_new_users(users_data: list) -> dict:
+    """Create many users with one SELECT and one multi-row INSERT.
+
+    Every user is validated first. The emails that are already in use are
+    found with a single IN query, and the rest are inserted in one statement
+    with ON CONFLICT DO NOTHING, so users created concurrently are reported
+    as existing instead of failing the whole batch. The batch is committed
+    once.
+
+    Returns
+    -------
+    dict:
+        The number of users created and a result for every item, in the
+        order they were given.
+    """
+    if not users_data:
+        raise EmptyUserData('The users data cannot be empty.')
+
+    if not isinstance(users_data, list):
+        raise NonListUserData('users_data must be a list')
+
+    if len(users_data) > USER_BATCH_MAX_SIZE:
+        raise UserBatchTooLarge(f'At most {USER_BATCH_MAX_SIZE} users can be created at once.')
+
+    results, pending = _validate_batch(users_data)
+
+    if pending:
+        existing = db.session.execute(
+            select(User.email).where(User.email.in_(list(pending)))
+        ).scalars().all()
+        for email in existing:
+            index = pending.pop(email)
+            results[index] = {'index': index, 'status': 'exists',
+                              'error': f'The email adress {email} is already in use.'}
+
+    created = {}
+    if pending:
+        query = insert(User.__table__).values([{'email': email} for email in pending])
+        query = query.on_conflict_do_nothing(index_elements=[User.email]).returning(User.id, User.email)
+        created = {row.email: dict(row._mapping) for row in db.session.execute(query)}
+        db.session.commit()
+        for user in created.values():
+            user_cache.delete(user['id'])
+
+    for email, index in pending.items():
+        if email in created:
+            results[index] = {'index': index, 'status': 'created', 'user': created[email]}
+        else:
+            results[index] = {'index': index, 'status': 'exists',
+                              'error': f'The email adress {email} is already in use.'}
+
+    return {'created': len(created), 'results': results}
+
+
+def handle_create_users(request_data: list):
+    """Handle the POST request to the /users/batch route."""
+    try:
+        new_users = create_new_users(request_data)
+    except (
+        NonListUserData,
+        UserBatchTooLarge,
+        EmptyUserData,
+    ) as e:
+        events.rejected('users.create', e)
+        return jsonify({'error': str(e)}), 400
+    else:
+        return jsonify(new_users), 201 if new_users['created'] else 200
+
+
+def parse_user_ids(user_ids: str) -> list:
+    """Get the list of user ids from a comma separated string."""
+    if not user_ids:
+        raise InvalidIdList('The ids have to be provided.')
+
+    try:
+        ids = [int(user_id) for user_id in user_ids.split(',') if user_id.strip()]
+    except ValueError as e:
+        raise InvalidIdList('The ids have to be a comma separated list of integers.') from e
+
+    if not ids:
+        raise InvalidIdList('The ids have to be provided.')
+
+    if len(ids) > USER_BATCH_MAX_SIZE:
+        raise UserBatchTooLarge(f'At most {USER_BATCH_MAX_SIZE} users can be deleted at once.')
+
+    return ids
+
+
+def delete_users(user_ids: str) -> dict:
+    """Delete all the users with the given ids in one statement."""
+    ids = parse_user_ids(user_ids)
+
+    deleted = delete_many_returning(User, ids, (User.id, User.email))
+    deleted_ids = {user['id'] for user in deleted}
+    for user_id in deleted_ids:
+        user_cache.delete(user_id)
+
+    return {'deleted': deleted, 'not_found': [user_id for user_id in ids if user_id not in deleted_ids]}
+
+
+def handle_delete_users(user_ids: str):
+    """Handle the DELETE request to the /users route."""
+    try:
+        users = delete_users(user_ids)
+    except (
+        InvalidIdList,
+        UserBatchTooLarge
+    ) as e:
+        events.rejected('users.delete', e)
+        return jsonify({'error': str(e)}), 400
+    else:
+        return users, 200
@@ -2,14 +2,22 @@
 """This module contains the routes associated with the default Blueprint."""
 from json import JSONDecodeError
 
-from flasgger import swag_from
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import get_jwt_identity, jwt_required
 
+from ..apidocs import swag_from
 from ..auth.helpers import get_admin
-from ..extensions import app_logger
-from .helpers import handle_create_user, handle_delete_user, handle_get_user, handle_update_user
-from .models import User
+from ..extensions import events
+from ..metrics import collect_metrics
+from .helpers import (
+    handle_create_user,
+    handle_create_users,
+    handle_delete_user,
+    handle_delete_users,
+    handle_get_all_users,
+    handle_get_user,
+    handle_update_user,
+)
 
 default = Blueprint('default', __name__, template_folder='templates', static_folder='static')
 
@@ -18,10 +26,17 @@ default = Blueprint('default', __name__, template_folder='templates', static_fol
 @swag_from("./docs/home.yml", endpoint='default.home', methods=['GET'])
 def home():
     """Confirm that the application is working."""
-    app_logger.info("Successfully handled a GET request to the '/' route. Returning the default message.")
+    events.info('home', "Handled a GET request to the '/' route.")
     return jsonify({'hello': 'from template api'}), 200
 
 
+@default.route('/metrics', methods=['GET'])
+@swag_from("./docs/metrics.yml", endpoint='default.metrics', methods=['GET'])
+def metrics():
+    """Get the application counters, such as the cache hits and misses."""
+    return jsonify(collect_metrics()), 200
+
+
 @default.route('/user', methods=['POST'])
 @jwt_required()
 @swag_from("./docs/create_user.yml", endpoint='default.create_user', methods=['POST'])
@@ -35,30 +50,46 @@ def create_user():
         print(e)
         return str(e), 400
     else:
-        app_logger.info(f'The admin {admin["name"]} created a new user with email {data["email"]}.')
+        events.info('user.create', 'The admin %s created a new user.', admin['name'], admin_id=admin_id)
         return handle_create_user(data)
 
 
+@default.route('/users/batch', methods=['POST'])
+@jwt_required()
+@swag_from("./docs/create_users_batch.yml", endpoint='default.create_users_batch', methods=['POST'])
+def create_users_batch():
+    """Create many users at once."""
+    try:
+        data = request.json
+        admin_id = get_jwt_identity()
+        admin = get_admin(admin_id)
+    except JSONDecodeError as e:
+        events.rejected('users.create', e)
+        return str(e), 400
+    else:
+        count = len(data) if isinstance(data, list) else 0
+        events.info('users.create', 'The admin %s sent a batch of %s new users.', admin['name'], count,
+                    admin_id=admin_id, count=count)
+        return handle_create_users(data)
+
+
 @default.route('/user', methods=['GET'])
 @jwt_required()
 @swag_from("./docs/get_user.yml", endpoint='default.get_user', methods=['GET'])
 def get_user():
     """Get a user with the given id."""
-    app_logger.info("Handling a GET request to '/user' route.")
     try:
         user_id = int(request.args.get('id'))
         admin_id = get_jwt_identity()
         admin = get_admin(admin_id)
     except TypeError as e:
-        app_logger.exception(e)
-        app_logger.error('GET request unsuccessful. This error is cause by not supplying the user id')
+        events.rejected('user.get', e)
         return 'The user id was not provided or the id is invalid type.', 400
     except ValueError as e:
-        app_logger.exception(e)
-        app_logger.error('GET request unsuccessful. This error is cause by not supplying the user id')
+        events.rejected('user.get', e)
         return 'The user id was not provided or the id is invalid.', 400
     else:
-        app_logger.info(f"The admin {admin['name']} retrieved a user with id {user_id}.")
+        events.info('user.get', 'The admin %s retrieved a user.', admin['name'], admin_id=admin_id, user_id=user_id)
         return handle_get_user(user_id)
 
 
@@ -80,7 +111,7 @@ def update_user():
         print('This error is cause by not supplying the user id')
         return 'The user id was not provided', 400
     else:
-        app_logger.info(f"The admin {admin['name']} updated a user with id {user_id} with data: {data}.")
+        events.info('user.update', 'The admin %s updated a user.', admin['name'], admin_id=admin_id, user_id=user_id)
         return handle_update_user(user_id, data)
 
 
@@ -98,15 +129,24 @@ def delete_user():
         print('This error is cause by not supplying the user id')
         return 'The user id was not provided', 400
     else:
-        app_logger.info(f"The admin {admin['name']} deleted a user with id {user_id}.")
+        events.info('user.delete', 'The admin %s deleted a user.', admin['name'], admin_id=admin_id, user_id=user_id)
         return handle_delete_user(user_id)
 
 
 @default.route('/users', methods=['GET'])
 @swag_from("./docs/get_all_users.yml", endpoint='default.all_users', methods=['GET'])
 def all_users():
-    """Get all the users."""
-    app_logger.info("Handling a GET request to '/users' route.")
-    users = User.query.all()
-    app_logger.info("Successfully handled a GET request to the '/users' route. Returning all the users.")
-    return jsonify(users), 200
+    """Get the users one page at a time, or stream all of them as NDJSON."""
+    events.info('users.list', "Handling a GET request to '/users' route.")
+    return handle_get_all_users(request.args)
+
+
+@default.route('/users', methods=['DELETE'])
+@jwt_required()
+@swag_from("./docs/delete_users.yml", endpoint='default.delete_users', methods=['DELETE'])
+def delete_users():
+    """Delete many users at once."""
+    admin_id = get_jwt_identity()
+    admin = get_admin(admin_id)
+    events.info('users.delete', 'The admin %s deleted users.', admin['name'], admin_id=admin_id)
+    return handle_delete_users(request.args.get('ids'))
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""This module has the structured logging facade used by the blueprints."""
+import logging
+import random
+import threading
+
+
+def parse_sample_rates(sample_rates: str) -> dict:
+    """Get the sample rates from a comma separated list of event=rate pairs, such as user.get=0.01."""
+    rates = {}
+    for pair in (sample_rates or '').split(','):
+        if not pair.strip():
+            continue
+        event, _, rate = pair.partition('=')
+        try:
+            rates[event.strip()] = float(rate)
+        except ValueError as e:
+            raise ValueError(f'The sample rate for {event.strip()} has to be a number.') from e
+    return rates
+
+
+class EventLogger():
+    """Log named events with deferred formatting, sampling and structured fields.
+
+    Every event has a name, such as user.get, that is added to the record
+    with the other keyword fields through extra, so they become JSON fields
+    instead of being interpolated into the message. The message takes
+    %-style arguments that are only merged once the record is handled.
+
+    Nothing is built for events below the logger's level. Events below
+    WARNING are also sampled: an event with a rate of 0.01 is logged for one
+    call in a hundred. Warnings and errors are never sampled out.
+    """
+
+    def __init__(self, logger: logging.Logger, app=None) -> None:
+        """Create the facade over the given logger."""
+        self.logger = logger
+        self.default_rate = 1.0
+        self.sample_rates = {}
+        self.logged = 0
+        self.sampled_out = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        """Configure the facade from the LOG_LEVEL, LOG_SAMPLE_RATE and LOG_SAMPLE_RATES settings."""
+        logging.getLogger().setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+        self.default_rate = float(app.config.get('LOG_SAMPLE_RATE', 1.0))
+        self.sample_rates = parse_sample_rates(app.config.get('LOG_SAMPLE_RATES', ''))
+
+    def log(self, level: int, event: str, msg: str, *args, **fields) -> None:
+        """Log the event at the given level."""
+        if not self.logger.isEnabledFor(level):
+            return
+
+        if level < logging.WARNING:
+            rate = self.sample_rates.get(event, self.default_rate)
+            if rate < 1.0 and random.random() >= rate:
+                with self._lock:
+                    self.sampled_out += 1
+                return
+
+        fields['event'] = event
+        self.logger.log(level, msg, *args, extra=fields)
+        with self._lock:
+            self.logged += 1
+
+    def info(self, event: str, msg: str, *args, **fields) -> None:
+        """Log the event at the INFO level."""
+        self.log(logging.INFO, event, msg, *args, **fields)
+
+    def warning(self, event: str, msg: str, *args, **fields) -> None:
+        """Log the event at the WARNING level."""
+        self.log(logging.WARNING, event, msg, *args, **fields)
+
+    def error(self, event: str, msg: str, *args, **fields) -> None:
+        """Log the event at the ERROR level."""
+        self.log(logging.ERROR, event, msg, *args, **fields)
+
+    def rejected(self, event: str, error, **fields) -> None:
+        """Log a request that was rejected by validation, as a warning without a traceback."""
+        if isinstance(error, Exception):
+            fields['error_type'] = type(error).__name__
+        self.log(logging.WARNING, event, '%s', error, **fields)
+
+    def stats(self) -> dict:
+        """Get the number of events logged and sampled out."""
+        with self._lock:
+            return {'logged': self.logged, 'sampled_out': self.sampled_out}
@@ -92,3 +92,44 @@ class AdminPasswordNotAlphaNumeric(Exception):
 
 class InvalidAdminPassword(Exception):
     """Raised when an invalid admin password is given."""
+
+
+class InvalidCursor(Exception):
+    """Raised when the given pagination cursor cannot be decoded."""
+
+
+class InvalidPageLimit(Exception):
+    """Raised when the given page limit is not a positive integer within the allowed range."""
+
+
+class InvalidProjectionField(Exception):
+    """Raised when a field that cannot be projected is requested."""
+
+
+class NonListUserData(Exception):
+    """Raised when the batch user data is not provided in a list."""
+
+
+class UserBatchTooLarge(Exception):
+    """Raised when the batch user data has more users than allowed."""
+
+
+class InvalidIdList(Exception):
+    """Raised when the list of ids is empty or has values that are not integers."""
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many passwords are waiting to be hashed or verified."""
+
+
+class TooManyLoginAttempts(Exception):
+    """Raised when a client or an email has made more login attempts than allowed."""
+
+    def __init__(self, message: str, retry_after: int) -> None:
+        """Create the exception with the seconds to wait before trying again."""
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RevokedToken(Exception):
+    """Raised when a revoked, reused or unknown refresh token is used."""
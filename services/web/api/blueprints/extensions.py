@@ -1,18 +1,47 @@
 # -*- coding: utf-8 -*-
 """This module creates the flask extensions that we will use."""
+import atexit
 import logging.config
+import logging.handlers
+import os
+import queue
 
-from flasgger import LazyString, Swagger
-from flask import request
-from flask_jwt_extended import JWTManager
-from flask_sqlalchemy import SQLAlchemy
+from ..config.logging_config import LogQueueHandler
+from .cache import Cache
+from .events import EventLogger
+from .metrics import register_metrics
+from .passwords import PasswordHasher
+from .pool import pool_metrics
+from .ratelimit import DEFAULT_LOGIN_LIMITS, RateLimiter
+from .replicas import RoutingSQLAlchemy
+from .tokens import CachingJWTManager
 
-db = SQLAlchemy()
-jwt = JWTManager()
+db = RoutingSQLAlchemy()
+jwt = CachingJWTManager()
+admin_cache = Cache('admin')
+user_cache = Cache('user')
+passwords = PasswordHasher()
+login_limiter = RateLimiter('login', DEFAULT_LOGIN_LIMITS, failure_rules=('email',))
+
+register_metrics('cache', lambda: {'admin': admin_cache.stats(), 'user': user_cache.stats()})
+register_metrics('pool', pool_metrics.stats)
+register_metrics('passwords', passwords.stats)
+register_metrics('jwt', lambda: {'claims_cache': jwt.claims_cache.stats()})
+register_metrics('ratelimit', lambda: {'login': login_limiter.stats()})
+register_metrics('replicas', lambda: db.router.stats())
 
 
 def create_logger():
-    """Create the application logger."""
+    """Create the application logger.
+
+    Only the handlers named in LOG_HANDLERS, a comma separated list of
+    standard, kinesis and mail that defaults to standard, are created, so
+    boto3 and smtplib are only imported when their handler is used. The
+    handlers are moved behind a QueueListener. Request threads only put
+    records on its queue and the listener thread formats them and sends them
+    to every handler. A forked worker starts its own listener thread.
+    """
+    enabled = [name.strip() for name in os.getenv('LOG_HANDLERS', 'standard').split(',') if name.strip()]
     config = {
         "version": 1,
         "disable_existing_loggers": False,
@@ -36,75 +65,46 @@ def create_logger():
                 "class": "api.config.logging_config.KinesisFirehoseDeliveryStreamHandler",
                 "formatter": "json"
             },
-            "critical mail handler": {
+            "mail": {
                 "class": "api.config.logging_config.CustomEmailLogger",
                 "formatter": "json"
             }
         },
         "loggers": {
             "": {
-                # "handlers": ["standard", "kinesis", "critical mail handler"],
-                "handlers": ["standard"],
+                "handlers": enabled,
                 "level": logging.INFO
             }
         }
     }
+    config['handlers'] = {name: handler for name, handler in config['handlers'].items() if name in enabled}
 
     logging.config.dictConfig(config)
 
-    logger = logging.getLogger(__name__)
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    queue_handler = LogQueueHandler(queue.Queue(maxsize=10000))
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
 
-    return logger
+    listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
 
+    def restart_listener():
+        """Start a listener thread with an empty queue in a forked worker."""
+        queue_handler.queue = listener.queue = queue.Queue(maxsize=10000)
+        listener.start()
 
-app_logger = create_logger()
+    os.register_at_fork(after_in_child=restart_listener)
+    register_metrics('logging', queue_handler.stats)
 
-swagger_template = {
-    "swagger": "2.0",
-    "info": {
-        "title": "Template API V4",
-        "description": "Template for creating Flask APIs.",
-        "contact": {
-            "responsibleOrganization": "",
-            "responsibleDeveloper": "",
-            "email": "lyceokoth@gmail.com",
-            "url": "www.twitter.com/lylethedesigner",
-        },
-        "termsOfService": "www.twitter.com/deve",
-        "version": "1.0"
-    },
-    "host": LazyString(lambda: request.host),
-    "basePath": "/",  # base bash for blueprint registration
-    "schemes": [
-        "http",
-        "https"
-    ],
-    "securityDefinitions": {
-        "APIKeyHeader": {
-            "type": "apiKey",
-            "name": "Authorization",
-            "in": "header",
-            "description": "JWT Authorization header using the Bearer scheme. Example:\"Authorization: Bearer {token}\""
-        }
-    },
-}
+    logger = logging.getLogger(__name__)
 
+    return logger
 
-swagger_config = {
-    "headers": [
-    ],
-    "specs": [
-        {
-            "endpoint": 'apispec',
-            "route": '/apispec.json',
-            "rule_filter": lambda rule: True,  # all in
-            "model_filter": lambda tag: True,  # all in
-        }
-    ],
-    "static_url_path": "/flasgger_static",
-    "swagger_ui": True,
-    "specs_route": "/apidocs/"
-}
 
-swagger = Swagger(template=swagger_template,
-                  config=swagger_config)
+app_logger = create_logger()
+events = EventLogger(app_logger)
+register_metrics('events', events.stats)
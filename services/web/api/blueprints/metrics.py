@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""This module collects the counters that are served on the /metrics route."""
+
+_collectors = {}
+
+
+def register_metrics(name: str, collector) -> None:
+    """Register a function that returns the counters for the given name."""
+    _collectors[name] = collector
+
+
+def collect_metrics() -> dict:
+    """Get the counters from every registered collector."""
+    return {name: collector() for name, collector in _collectors.items()}
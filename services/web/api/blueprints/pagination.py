@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""This module has the keyset pagination helpers that are shared by the blueprints."""
+import base64
+import binascii
+import json
+
+from sqlalchemy import select
+
+from .constants import DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT, STREAM_CHUNK_SIZE
+from .exceptions import InvalidCursor, InvalidPageLimit
+from .extensions import db
+
+
+def encode_cursor(last_id: int) -> str:
+    """Create an opaque cursor that points just after the row with the given id."""
+    payload = json.dumps({'after': last_id}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> int:
+    """Get the id of the last row seen from an opaque cursor.
+
+    Raises
+    ------
+    InvalidCursor
+        If the cursor was not created by encode_cursor.
+    """
+    if not cursor or not isinstance(cursor, str):
+        raise InvalidCursor('The cursor has to be a non empty string.')
+
+    padding = '=' * (-len(cursor) % 4)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        last_id = payload['after']
+    except (binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor(f'The cursor {cursor} is invalid.') from e
+
+    if not isinstance(last_id, int) or isinstance(last_id, bool) or last_id < 0:
+        raise InvalidCursor(f'The cursor {cursor} is invalid.')
+
+    return last_id
+
+
+def parse_page_limit(limit) -> int:
+    """Get the page size from the limit query parameter.
+
+    Raises
+    ------
+    InvalidPageLimit
+        If the limit is not an integer between 1 and MAX_PAGE_LIMIT.
+    """
+    if limit is None or limit == '':
+        return DEFAULT_PAGE_LIMIT
+
+    try:
+        page_limit = int(limit)
+    except (TypeError, ValueError) as e:
+        raise InvalidPageLimit('The limit has to be an integer.') from e
+
+    if page_limit < 1 or page_limit > MAX_PAGE_LIMIT:
+        raise InvalidPageLimit(f'The limit has to be between 1 and {MAX_PAGE_LIMIT}.')
+
+    return page_limit
+
+
+def _keyset_query(columns, key_column, after: int = None):
+    """Build the SELECT that returns the given columns in key order after the given key."""
+    query = select(*columns).order_by(key_column)
+    if after is not None:
+        query = query.where(key_column > after)
+    return query
+
+
+def fetch_page(columns, key_column, limit: int, after: int = None) -> tuple:
+    """Get one page of rows using keyset pagination.
+
+    Only the given columns are selected and no ORM objects are created. One
+    extra row is fetched to find out if there is a next page without running
+    a COUNT query.
+
+    Returns
+    -------
+    tuple:
+        The rows as a list of dicts and the cursor for the next page, which is
+        None on the last page.
+    """
+    query = _keyset_query(columns, key_column, after).limit(limit + 1)
+    rows = [dict(row) for row in db.session.execute(query).mappings()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][key_column.key])
+
+    return rows, next_cursor
+
+
+def stream_rows(columns, key_column, after: int = None):
+    """Yield NDJSON chunks for every row after the given key.
+
+    The rows are read through a server side cursor, STREAM_CHUNK_SIZE rows at
+    a time, so memory use does not grow with the size of the table.
+    """
+    query = _keyset_query(columns, key_column, after)
+    result = db.session.execute(query, execution_options={'stream_results': True})
+
+    for partition in result.mappings().partitions(STREAM_CHUNK_SIZE):
+        yield ''.join(json.dumps(dict(row)) + '\n' for row in partition)
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""This module hashes and verifies the admin passwords.
+
+Passwords are stored in a versioned, self describing format that carries the
+scheme and its cost parameters, such as::
+
+    $scrypt$v=1$ln=14,r=8,p=1$<salt>$<hash>
+
+so the cost can be raised at any time: a password hashed with other
+parameters, or stored in plaintext by an older release, still verifies and
+is hashed again by verify_and_update, and log_in_admin stores the new hash
+after the admin logs in. scrypt comes from hashlib. argon2id is used when
+PASSWORD_HASH_SCHEME is argon2, which needs the argon2-cffi package.
+
+Hashing is slow on purpose, so it runs on a bounded pool of threads, which
+both hashlib.scrypt and argon2 release the GIL for. At most
+PASSWORD_HASH_WORKERS passwords are hashed at once, so a burst of logins
+cannot take every CPU from the other requests, and a login that would wait
+behind more than PASSWORD_HASH_QUEUE_SIZE others is refused with
+PasswordHasherBusy instead of piling up request threads.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .exceptions import PasswordHasherBusy
+
+SCRYPT_VERSION = 1
+DEFAULT_SCRYPT_LOG_N = 14
+DEFAULT_SCRYPT_R = 8
+DEFAULT_SCRYPT_P = 1
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+def _encode(data: bytes) -> str:
+    """Encode the bytes as unpadded base64."""
+    return base64.b64encode(data).decode().rstrip('=')
+
+
+def _decode(data: str) -> bytes:
+    """Decode unpadded base64."""
+    return base64.b64decode(data + '=' * (-len(data) % 4))
+
+
+class ScryptScheme():
+    """Hash passwords with hashlib.scrypt.
+
+    Attributes
+    ----------
+    log_n: int
+        The base 2 logarithm of the CPU and memory cost N.
+    r: int
+        The block size.
+    p: int
+        The parallelization factor.
+    """
+
+    name = 'scrypt'
+
+    def __init__(self, log_n: int = DEFAULT_SCRYPT_LOG_N, r: int = DEFAULT_SCRYPT_R,
+                 p: int = DEFAULT_SCRYPT_P) -> None:
+        """Create the scheme with the given cost parameters."""
+        self.log_n = log_n
+        self.r = r
+        self.p = p
+
+    @staticmethod
+    def _derive(password: str, salt: bytes, log_n: int, r: int, p: int) -> bytes:
+        """Derive the hash of the password."""
+        n = 2 ** log_n
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=2 * 128 * r * n * p + 1024 * 1024, dklen=HASH_BYTES)
+
+    @staticmethod
+    def _parse(stored: str) -> tuple:
+        """Get the version, cost parameters, salt and hash of a stored password."""
+        _, _, version, params, salt, digest = stored.split('$')
+        params = dict(param.split('=') for param in params.split(','))
+        return (int(version[2:]), int(params['ln']), int(params['r']), int(params['p']),
+                _decode(salt), _decode(digest))
+
+    def hash(self, password: str) -> str:
+        """Hash the password with a new salt."""
+        salt = os.urandom(SALT_BYTES)
+        digest = self._derive(password, salt, self.log_n, self.r, self.p)
+        params = f'ln={self.log_n},r={self.r},p={self.p}'
+        return f'$scrypt$v={SCRYPT_VERSION}${params}${_encode(salt)}${_encode(digest)}'
+
+    def verify(self, stored: str, password: str) -> bool:
+        """Check the password against the stored hash in constant time."""
+        _, log_n, r, p, salt, digest = self._parse(stored)
+        return hmac.compare_digest(self._derive(password, salt, log_n, r, p), digest)
+
+    def needs_rehash(self, stored: str) -> bool:
+        """Check whether the stored hash was made with other parameters."""
+        return self._parse(stored)[:4] != (SCRYPT_VERSION, self.log_n, self.r, self.p)
+
+
+class Argon2Scheme():
+    """Hash passwords with argon2id from the argon2-cffi package."""
+
+    name = 'argon2'
+
+    def __init__(self, time_cost: int = 3, memory_cost: int = 65536, parallelism: int = 1) -> None:
+        """Create the scheme with the given cost parameters."""
+        from argon2 import PasswordHasher as Argon2Hasher  # pylint: disable=C0415
+        self.hasher = Argon2Hasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+
+    def hash(self, password: str) -> str:
+        """Hash the password with a new salt."""
+        return self.hasher.hash(password)
+
+    def verify(self, stored: str, password: str) -> bool:
+        """Check the password against the stored hash."""
+        from argon2.exceptions import VerificationError  # pylint: disable=C0415
+        try:
+            return self.hasher.verify(stored, password)
+        except VerificationError:
+            return False
+
+    def needs_rehash(self, stored: str) -> bool:
+        """Check whether the stored hash was made with other parameters."""
+        return self.hasher.check_needs_rehash(stored)
+
+
+class PasswordHasher():
+    """A password hashing extension that is configured from the Flask app config.
+
+    The hasher works before init_app is called, with the default scrypt
+    parameters, so helpers can use it outside an application.
+
+    Attributes
+    ----------
+    hashed: int
+        The number of passwords hashed.
+    verified: int
+        The number of passwords that matched their hash.
+    rejected: int
+        The number of passwords that did not match their hash.
+    rehashed: int
+        The number of stored passwords that were hashed again after a login.
+    busy: int
+        The number of calls refused because the queue was full.
+    """
+
+    def __init__(self, app=None, scheme=None, workers: int = None, queue_size: int = 64) -> None:
+        """Create the hasher."""
+        self.scheme = scheme or ScryptScheme()
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.hashed = 0
+        self.verified = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.busy = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        os.register_at_fork(after_in_child=self._reset)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        """Configure the hasher from the PASSWORD_HASH_* settings.
+
+        PASSWORD_HASH_SCHEME is either scrypt, the default, or argon2. The
+        scrypt cost is PASSWORD_SCRYPT_LOG_N, the argon2 cost is
+        PASSWORD_ARGON2_TIME_COST and PASSWORD_ARGON2_MEMORY_COST in KiB.
+        """
+        scheme = app.config.get('PASSWORD_HASH_SCHEME', 'scrypt')
+        if scheme == 'scrypt':
+            self.scheme = ScryptScheme(log_n=int(app.config.get('PASSWORD_SCRYPT_LOG_N', DEFAULT_SCRYPT_LOG_N)))
+        elif scheme == 'argon2':
+            self.scheme = Argon2Scheme(time_cost=int(app.config.get('PASSWORD_ARGON2_TIME_COST', 3)),
+                                       memory_cost=int(app.config.get('PASSWORD_ARGON2_MEMORY_COST', 65536)))
+        else:
+            raise ValueError(f'The password hash scheme {scheme} is not supported. Use scrypt or argon2.')
+
+        self.workers = int(app.config.get('PASSWORD_HASH_WORKERS') or self.workers)
+        self.queue_size = int(app.config.get('PASSWORD_HASH_QUEUE_SIZE', self.queue_size))
+        self._reset()
+
+    def _reset(self) -> None:
+        """Drop the pool, so a forked worker starts its own threads."""
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+
+    def close(self) -> None:
+        """Shut the pool down once the calls it is running finish, as a worker exits."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _run(self, function, *args):
+        """Run the function on the pool and wait for its result."""
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            with self._lock:
+                self.busy += 1
+            raise PasswordHasherBusy('Too many passwords are being checked. Try again later.')
+
+        try:
+            if self._executor is None:
+                with self._lock:
+                    if self._executor is None:
+                        # The pool outlives the call, and is shut down by close.
+                        self._executor = ThreadPoolExecutor(  # pylint: disable=R1732
+                            max_workers=self.workers, thread_name_prefix='password-hasher')
+            return self._executor.submit(function, *args).result()
+        finally:
+            slots.release()
+
+    def _scheme_for(self, stored: str):
+        """Get the scheme that made the stored hash, or None for a plaintext password."""
+        if stored.startswith('$scrypt$'):
+            return self.scheme if isinstance(self.scheme, ScryptScheme) else ScryptScheme()
+        if stored.startswith('$argon2'):
+            return self.scheme if isinstance(self.scheme, Argon2Scheme) else Argon2Scheme()
+        return None
+
+    def hash(self, password: str) -> str:
+        """Hash the password."""
+        stored = self._run(self.scheme.hash, password)
+        with self._lock:
+            self.hashed += 1
+        return stored
+
+    def verify(self, stored: str, password: str) -> bool:
+        """Check the password against the stored hash, or the stored plaintext of an older release."""
+        scheme = self._scheme_for(stored)
+        if scheme is None:
+            valid = hmac.compare_digest(stored.encode(), password.encode())
+        else:
+            valid = self._run(scheme.verify, stored, password)
+
+        with self._lock:
+            if valid:
+                self.verified += 1
+            else:
+                self.rejected += 1
+        return valid
+
+    def needs_rehash(self, stored: str) -> bool:
+        """Check whether the stored password should be hashed again with the current scheme and cost."""
+        scheme = self._scheme_for(stored)
+        return scheme is not self.scheme or self.scheme.needs_rehash(stored)
+
+    def verify_and_update(self, stored: str, password: str) -> tuple:
+        """Check the password, and hash it again if the stored hash is out of date.
+
+        Returns
+        -------
+        tuple:
+            Whether the password is valid, and the new hash to store or None
+            if the stored one is current.
+        """
+        if not self.verify(stored, password):
+            return False, None
+        if not self.needs_rehash(stored):
+            return True, None
+
+        new_hash = self.hash(password)
+        with self._lock:
+            self.rehashed += 1
+        return True, new_hash
+
+    def stats(self) -> dict:
+        """Get the hashing counters."""
+        with self._lock:
+            return {
+                'scheme': self.scheme.name,
+                'hashed': self.hashed,
+                'verified': self.verified,
+                'rejected': self.rejected,
+                'rehashed': self.rehashed,
+                'busy': self.busy,
+            }
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""This module has the instrumented connection pool that is used by the database engines.
+
+Every InstrumentedQueuePool keeps its own PoolMetrics, so the primary and
+each replica are reported apart under the name of their bind.
+"""
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics():
+    """Counters for the connection checkouts of one pool.
+
+    Attributes
+    ----------
+    checkouts: int
+        The number of connections checked out of the pool.
+    waits: int
+        The number of checkouts that found every pooled and overflow
+        connection in use and had to wait for one to be returned.
+    timeouts: int
+        The number of checkouts that gave up after the pool timeout.
+    """
+
+    def __init__(self) -> None:
+        """Create the counters."""
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def watch(self, pool) -> None:
+        """Report the live size and saturation of the given pool."""
+        self._pool = pool
+
+    def record_checkout(self, latency: float, waited: bool, timed_out: bool) -> None:
+        """Record how long one checkout took."""
+        with self._lock:
+            self.checkouts += 1
+            self.waits += waited
+            self.timeouts += timed_out
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+
+    def stats(self) -> dict:
+        """Get the checkout counters and the current state of the pool."""
+        with self._lock:
+            stats = {
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'checkout_latency_avg_ms': self._total_latency / self.checkouts * 1000 if self.checkouts else 0.0,
+                'checkout_latency_max_ms': self._max_latency * 1000,
+            }
+
+        pool = self._pool
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)  # pylint: disable=W0212
+            stats.update({
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow(),
+                'saturation': pool.checkedout() / capacity if capacity else 0.0,
+            })
+
+        return stats
+
+
+class EnginePoolMetrics():
+    """The pool metrics of the watched engines, by bind."""
+
+    def __init__(self) -> None:
+        """Watch no engine."""
+        self._engines = {}
+
+    def watch(self, engine, bind: str = 'primary') -> None:
+        """Report the metrics of the engine's pool under the bind name.
+
+        The engine is kept rather than its pool, since disposing the engine
+        replaces the pool.
+        """
+        self._engines[bind] = engine
+
+    def stats(self) -> dict:
+        """Get the metrics of every watched engine whose pool is instrumented."""
+        return {bind: engine.pool.metrics.stats() for bind, engine in self._engines.items()
+                if isinstance(engine.pool, InstrumentedQueuePool)}
+
+
+pool_metrics = EnginePoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """A QueuePool that records the latency of every checkout in its metrics.
+
+    Attributes
+    ----------
+    metrics: PoolMetrics
+        The counters of this pool, which are carried over when the engine is
+        disposed and the pool recreated.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        """Create the pool and its metrics."""
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+        self.metrics.watch(self)
+
+    def recreate(self):
+        """Create a new pool with the same settings, which keeps counting in the same metrics."""
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        self.metrics.watch(pool)
+        return pool
+
+    def connect(self):
+        """Check a connection out of the pool."""
+        waited = self.checkedout() >= self.size() + max(self._max_overflow, 0)
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.metrics.record_checkout(time.perf_counter() - start, waited, timed_out)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""This module has single statement write helpers that are shared by the blueprints."""
+import re
+
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import db
+
+# Postgres reports unique violations as 'Key (email)=(x@y.com) already exists.'
+_UNIQUE_VIOLATION_DETAIL = re.compile(r'Key \((\w+)\)=')
+
+
+def insert_returning(model, values: dict, returning: tuple) -> dict:
+    """Insert a row unless it violates a unique constraint.
+
+    Runs one INSERT ... ON CONFLICT DO NOTHING RETURNING statement and commits
+    it, so there is no window between checking for a duplicate and inserting
+    in which a concurrent request can create the same row.
+
+    Returns
+    -------
+    dict:
+        The returned columns of the new row, or None if the row conflicted
+        with an existing one.
+    """
+    query = insert(model.__table__).values(**values).on_conflict_do_nothing().returning(*returning)
+    row = db.session.execute(query).mappings().first()
+    db.session.commit()
+
+    return dict(row) if row else None
+
+
+def update_returning(model, row_id: int, values: dict, returning: tuple) -> dict:
+    """Update the columns in values for the row with the given id.
+
+    Runs one UPDATE ... WHERE id = :id RETURNING statement and commits it.
+    Duplicates are detected by the unique constraints on the table instead
+    of SELECTs before the update.
+
+    Raises
+    ------
+    sqlalchemy.exc.IntegrityError
+        If the new values violate a constraint. The session is rolled back
+        and conflicting_column tells which column clashed.
+
+    Returns
+    -------
+    dict:
+        The returned columns of the updated row, or None if there is no row
+        with the given id.
+    """
+    query = update(model.__table__).where(model.id == row_id).values(**values).returning(*returning)
+    try:
+        row = db.session.execute(query).mappings().first()
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise
+
+    return dict(row) if row else None
+
+
+def conflicting_column(error: IntegrityError) -> str:
+    """Get the name of the column whose unique constraint was violated, if known."""
+    diag = getattr(error.orig, 'diag', None)
+    detail = getattr(diag, 'message_detail', None) or str(error.orig)
+    match = _UNIQUE_VIOLATION_DETAIL.search(detail)
+
+    return match.group(1) if match else None
+
+
+def delete_returning(model, row_id: int, returning: tuple) -> dict:
+    """Delete the row with the given id with one DELETE ... RETURNING statement.
+
+    Returns
+    -------
+    dict:
+        The returned columns of the deleted row, or None if there is no row
+        with the given id.
+    """
+    query = delete(model.__table__).where(model.id == row_id).returning(*returning)
+    row = db.session.execute(query).mappings().first()
+    db.session.commit()
+
+    return dict(row) if row else None
+
+
+def delete_many_returning(model, row_ids: list, returning: tuple) -> list:
+    """Delete all the rows with the given ids with one DELETE ... RETURNING statement.
+
+    Returns
+    -------
+    list:
+        The returned columns of the rows that were deleted.
+    """
+    query = delete(model.__table__).where(model.id.in_(row_ids)).returning(*returning)
+    rows = [dict(row) for row in db.session.execute(query).mappings()]
+    db.session.commit()
+
+    return rows
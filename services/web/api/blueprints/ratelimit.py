@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""This module has the rate limiters that protect the login route.
+
+Both backends count attempts with a sliding window counter: the attempts of
+the current fixed window are added to those of the previous window, weighted
+by how much of the previous window still overlaps the sliding one. This
+needs two counters per key instead of a timestamp per attempt, and smooths
+out the burst a plain fixed window allows at its edges.
+
+A RateLimiter is backed either by an in-process MemoryLimiter or, when
+RATELIMIT_BACKEND is set to redis, by a RedisLimiter that is shared by every
+worker and container.
+"""
+import time
+
+DEFAULT_LOGIN_LIMITS = {'ip': '20/60', 'email': '10/300'}
+
+
+def parse_limit(limit: str) -> tuple:
+    """Get the number of attempts and the window in seconds from a limit such as 10/300."""
+    try:
+        attempts, window = limit.split('/')
+        return int(attempts), float(window)
+    except ValueError as e:
+        raise ValueError(f'The rate limit {limit} has to be given as attempts/seconds, such as 10/300.') from e
+
+
+class MemoryLimiter():
+    """A sliding window limiter that keeps its counters in the process.
+
+    It takes no lock. Every attempt that is let through appends to the list
+    of its key in the current window, and list.append, dict.setdefault and
+    dict.pop are atomic in CPython, so concurrent requests can at worst let
+    a few attempts past the limit while the counters are read. Windows
+    older than the previous one are dropped when a new window starts.
+    """
+
+    def __init__(self, clock=time.time) -> None:
+        """Create a limiter with no attempts."""
+        self.clock = clock
+        self._windows_by_rule = {}
+
+    def _windows(self, name: str, window: float, now: float) -> tuple:
+        """Get the windows of the rule and the index of the current one, dropping the old windows."""
+        index = int(now // window)
+        windows = self._windows_by_rule.setdefault((name, window), {})
+        if index not in windows:
+            windows.setdefault(index, {})
+            for old in [old for old in list(windows) if old < index - 1]:
+                windows.pop(old, None)
+        return windows, index
+
+    def allow(self, name: str, key: str, limit: int, window: float, record: bool = True) -> bool:
+        """Check whether an attempt for the key is within the limit, counting it unless record is False."""
+        now = self.clock()
+        windows, index = self._windows(name, window, now)
+        attempts = windows[index].setdefault(key, [])
+        previous = len(windows.get(index - 1, {}).get(key, ()))
+        overlap = 1 - (now % window) / window
+        if previous * overlap + len(attempts) >= limit:
+            return False
+
+        if record:
+            attempts.append(None)
+        return True
+
+    def record(self, name: str, key: str, window: float) -> None:
+        """Count an attempt for the key without checking it."""
+        windows, index = self._windows(name, window, self.clock())
+        windows[index].setdefault(key, []).append(None)
+
+
+class RedisLimiter():
+    """A sliding window limiter that keeps its counters in Redis.
+
+    Any client that speaks the Redis protocol can be used, such as a
+    redis.Redis instance or a fakeredis.FakeRedis in tests. When Redis cannot
+    be reached the attempt is let through and counted as an error, so the
+    login route keeps working without it.
+
+    Attributes
+    ----------
+    client: redis.Redis
+        The Redis client.
+    namespace: str
+        The prefix of every key written by this limiter.
+    errors: int
+        The number of commands that failed.
+    """
+
+    def __init__(self, client, namespace: str, clock=time.time) -> None:
+        """Create a limiter that uses the given client."""
+        self.client = client
+        self.namespace = namespace
+        self.clock = clock
+        self.errors = 0
+
+    def _key(self, name: str, key: str, index: int) -> str:
+        """Get the Redis key of the counter of the key in the given window."""
+        return f'{self.namespace}:{name}:{key}:{index}'
+
+    def allow(self, name: str, key: str, limit: int, window: float, record: bool = True) -> bool:
+        """Check whether an attempt for the key is within the limit, counting it unless record is False."""
+        now = self.clock()
+        index = int(now // window)
+
+        try:
+            previous, current = self.client.mget(self._key(name, key, index - 1), self._key(name, key, index))
+            overlap = 1 - (now % window) / window
+            if int(previous or 0) * overlap + int(current or 0) >= limit:
+                return False
+        except Exception:  # pylint: disable=W0703
+            self.errors += 1
+            return True
+
+        if record:
+            self.record(name, key, window, now)
+        return True
+
+    def record(self, name: str, key: str, window: float, now: float = None) -> None:
+        """Count an attempt for the key without checking it."""
+        current_key = self._key(name, key, int((self.clock() if now is None else now) // window))
+        try:
+            pipeline = self.client.pipeline()
+            pipeline.incr(current_key)
+            pipeline.expire(current_key, int(window * 2) + 1)
+            pipeline.execute()
+        except Exception:  # pylint: disable=W0703
+            self.errors += 1
+
+
+class RateLimiter():
+    """A rate limiting extension that is configured from the Flask app config.
+
+    Every rule has a name, such as ip or email, and a limit of attempts per
+    window. The attempts of the failure_rules are only counted when they are
+    reported with fail, so a rule such as email only limits failed logins
+    and cannot be used up by the admin's own successful ones. The limiter
+    works before init_app is called, in memory with the default limits, so
+    helpers can use it outside an application.
+
+    Attributes
+    ----------
+    allowed: int
+        The number of attempts let through.
+    limited: dict
+        The number of attempts refused by each rule.
+    """
+
+    def __init__(self, namespace: str, limits: dict, failure_rules=(), app=None) -> None:
+        """Create the limiter for the given namespace and limits, such as {'ip': '20/60'}."""
+        self.namespace = namespace
+        self.limits = {name: parse_limit(limit) for name, limit in limits.items()}
+        self.failure_rules = frozenset(failure_rules)
+        self.backend = MemoryLimiter()
+        self.allowed = 0
+        self.limited = dict.fromkeys(self.limits, 0)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        """Configure the limiter from the RATELIMIT_* settings.
+
+        RATELIMIT_BACKEND is either memory, the default, or redis. The redis
+        backend connects to RATELIMIT_REDIS_URL. The limit of a rule is read
+        from RATELIMIT_<NAMESPACE>_<RULE>, such as RATELIMIT_LOGIN_IP=20/60.
+        """
+        for name in self.limits:
+            limit = app.config.get(f'RATELIMIT_{self.namespace}_{name}'.upper())
+            if limit:
+                self.limits[name] = parse_limit(limit)
+
+        backend = app.config.get('RATELIMIT_BACKEND', 'memory')
+        if backend == 'memory':
+            self.backend = MemoryLimiter()
+        elif backend == 'redis':
+            import redis  # pylint: disable=C0415
+            client = redis.Redis.from_url(app.config['RATELIMIT_REDIS_URL'])
+            self.backend = RedisLimiter(client, f'ratelimit:{self.namespace}')
+        else:
+            raise ValueError(f'The rate limit backend {backend} is not supported. Use memory or redis.')
+
+    def check(self, **keys) -> tuple:
+        """Count an attempt against the rule of every given key, such as ip='10.0.0.1'.
+
+        The rules are checked in the order they are given, and the attempt is
+        not counted against the later ones once a rule refuses it. It is not
+        counted against the failure_rules either.
+
+        Returns
+        -------
+        tuple:
+            None if the attempt is allowed, or the name of the rule that
+            refused it and the seconds to wait before trying again.
+        """
+        for name, key in keys.items():
+            if key is None:
+                continue
+            limit, window = self.limits[name]
+            if not self.backend.allow(name, key, limit, window, record=name not in self.failure_rules):
+                self.limited[name] += 1
+                return name, int(window)
+
+        self.allowed += 1
+        return None
+
+    def fail(self, **keys) -> None:
+        """Count a failed attempt against the failure rule of every given key, such as email='lyle@notreal.com'."""
+        for name, key in keys.items():
+            if key is not None and name in self.failure_rules:
+                self.backend.record(name, key, self.limits[name][1])
+
+    def stats(self) -> dict:
+        """Get the allowed and limited counters, and the errors of the redis backend."""
+        stats = {'allowed': self.allowed, 'limited': dict(self.limited)}
+        if isinstance(self.backend, RedisLimiter):
+            stats['errors'] = self.backend.errors
+        return stats
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""This module routes the reads of the read-only helpers to the database replicas.
+
+The replicas are SQLAlchemy binds named replica_0, replica_1 and so on,
+built from the comma separated REPLICA_DATABASE_URIS. A helper that only
+reads is decorated with db.replica_reads, which lets the SELECTs it runs go
+to a replica. Everything else goes to the primary:
+
+- every INSERT, UPDATE and DELETE, and everything flushed by the ORM;
+- every read of a session that has written, so a request reads its own
+  writes, and every read outside the decorated helpers, such as the checks
+  the write helpers make;
+- every read of a client that wrote less than REPLICA_STICKY_SECONDS ago,
+  so its next requests read their own writes too. A write marks both the
+  admin and the client address, since routes such as GET /users take no
+  token, and a read is kept on the primary if either is marked. The marks
+  are kept in a Cache, so they are shared by every worker when CACHE_BACKEND
+  is redis;
+- every read while each replica is more than REPLICA_MAX_LAG seconds behind
+  the primary or cannot be reached. The lag is checked every
+  REPLICA_LAG_CHECK_INTERVAL seconds.
+
+Any database SQLAlchemy supports can stand in for the replicas, such as
+SQLite files in tests. Their lag is taken to be 0 unless they are Postgres.
+A row read from a replica may be stale, so the helpers cache it for
+db.cache_ttl() seconds only.
+"""
+import contextlib
+import functools
+import inspect
+import itertools
+import math
+import threading
+import time
+
+from flask import has_request_context, request
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import event, orm, text
+
+from .cache import Cache
+
+POSTGRES_LAG_QUERY = text(
+    'SELECT COALESCE(CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END, 0)'
+)
+
+
+def replica_binds(replica_uris: str) -> dict:
+    """Get the SQLALCHEMY_BINDS of the replicas from a comma separated list of URIs."""
+    uris = [uri.strip() for uri in (replica_uris or '').split(',') if uri.strip()]
+    return {f'replica_{i}': uri for i, uri in enumerate(uris)}
+
+
+def default_sticky_keys() -> tuple:
+    """Get the keys of the client whose writes have to be read back, its address and its admin id if it has a token."""
+    if not has_request_context():
+        return ()
+
+    from flask_jwt_extended import get_jwt_identity  # pylint: disable=C0415
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        identity = None
+    keys = (f'address:{request.remote_addr}',)
+    return keys if identity is None else keys + (f'admin:{identity}',)
+
+
+class ReplicaRouter():
+    """Pick the replica for the next read, skipping those that lag or are down.
+
+    Attributes
+    ----------
+    bind_keys: tuple
+        The bind keys of the replicas.
+    lags: dict
+        The last measured lag of every replica in seconds, inf if it could
+        not be reached.
+    replica_reads: int
+        The number of reads sent to a replica.
+    primary_reads: int
+        The number of reads of replica_reads sessions that were kept on the
+        primary, because the client had written or no replica was usable.
+    """
+
+    def __init__(self, bind_keys=(), max_lag: float = 5.0, check_interval: float = 5.0, measure_lag=None) -> None:
+        """Create the router for the replicas with the given bind keys."""
+        self.bind_keys = tuple(bind_keys)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.measure_lag = measure_lag or self.query_lag
+        self.lags = dict.fromkeys(self.bind_keys, 0.0)
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self._healthy = self.bind_keys
+        self._turn = itertools.count()
+        self._next_check = 0.0
+        self._check_lock = threading.Lock()
+
+    @staticmethod
+    def query_lag(engine) -> float:
+        """Get how many seconds the replica is behind the primary."""
+        if engine.dialect.name != 'postgresql':
+            return 0.0
+        with engine.connect() as conn:
+            return float(conn.execute(POSTGRES_LAG_QUERY).scalar())
+
+    def check(self, get_engine) -> None:
+        """Measure the lag of every replica and keep those within max_lag."""
+        for key in self.bind_keys:
+            try:
+                self.lags[key] = self.measure_lag(get_engine(key))
+            except Exception:  # pylint: disable=W0703
+                self.lags[key] = math.inf
+        self._healthy = tuple(key for key in self.bind_keys if self.lags[key] <= self.max_lag)
+
+    def pick(self, get_engine):
+        """Get the bind key of the next usable replica, or None to read from the primary."""
+        if not self.bind_keys:
+            return None
+
+        if time.monotonic() >= self._next_check and self._check_lock.acquire(blocking=False):
+            try:
+                self._next_check = time.monotonic() + self.check_interval
+                self.check(get_engine)
+            finally:
+                self._check_lock.release()
+
+        healthy = self._healthy
+        if not healthy:
+            return None
+        return healthy[next(self._turn) % len(healthy)]
+
+    def stats(self) -> dict:
+        """Get the lag of every replica and the read counters."""
+        return {
+            'lags': dict(self.lags),
+            'replica_reads': self.replica_reads,
+            'primary_reads': self.primary_reads,
+        }
+
+
+class RoutingSession(SignallingSession):
+    """A session that sends the SELECTs of replica_reads sessions to a replica."""
+
+    def __init__(self, db, **options) -> None:
+        """Create the session."""
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None):  # pylint: disable=W0221
+        """Get the replica for a read that may use one, or the primary."""
+        info = self.info
+        if self._flushing or (clause is not None and getattr(clause, 'is_dml', False)):
+            info['wrote'] = True
+        elif info.get('replica') and not info.get('wrote') and getattr(clause, 'is_select', False):
+            db = self.db
+            if 'sticky' not in info:
+                info['sticky'] = any(db.sticky.get(key) is not None for key in db.sticky_keys())
+
+            bind_key = None
+            if not info['sticky']:
+                bind_key = db.router.pick(lambda bind: db.get_engine(self.app, bind=bind))
+            if bind_key is not None:
+                db.router.replica_reads += 1
+                info['replica_read'] = True
+                return db.get_engine(self.app, bind=bind_key)
+            db.router.primary_reads += 1
+
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """The SQLAlchemy extension with the replicas as binds and a RoutingSession.
+
+    Attributes
+    ----------
+    router: ReplicaRouter
+        Picks the replica for every read.
+    sticky: Cache
+        The clients that wrote recently and read from the primary.
+    sticky_keys: function
+        Get the keys of the client of the current request.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        """Create the extension."""
+        self.router = ReplicaRouter()
+        self.sticky = Cache('sticky')
+        self.sticky_seconds = 5.0
+        self.sticky_keys = default_sticky_keys
+        super().__init__(*args, **kwargs)
+
+    def init_app(self, app) -> None:
+        """Configure the replicas from the REPLICA_* settings.
+
+        The replicas are the SQLALCHEMY_BINDS named replica_<n>.
+        REPLICA_MAX_LAG and REPLICA_LAG_CHECK_INTERVAL control when a replica
+        is skipped, and REPLICA_STICKY_SECONDS how long a client that wrote
+        reads from the primary.
+        """
+        super().init_app(app)
+        bind_keys = sorted(key for key in app.config.get('SQLALCHEMY_BINDS') or {} if key.startswith('replica_'))
+        self.router = ReplicaRouter(bind_keys, max_lag=float(app.config.get('REPLICA_MAX_LAG', 5.0)),
+                                    check_interval=float(app.config.get('REPLICA_LAG_CHECK_INTERVAL', 5.0)))
+        self.sticky_seconds = float(app.config.get('REPLICA_STICKY_SECONDS', 5.0))
+        self.sticky.init_app(app)
+
+    def create_session(self, options):
+        """Create the factory of RoutingSessions, which marks the clients that write as sticky."""
+        factory = orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+        @event.listens_for(factory, 'after_commit')
+        def mark_sticky(session):
+            """Keep the client on the primary for a while after it wrote."""
+            if session.info.get('wrote') and self.router.bind_keys:
+                for key in self.sticky_keys():
+                    self.sticky.set(key, True, ttl=self.sticky_seconds)
+
+        return factory
+
+    def replica_reads(self, function):
+        """Decorate a helper that only reads, so the SELECTs it runs may go to a replica.
+
+        A generator returned by the helper, such as the NDJSON stream of
+        stream_rows, runs its queries as it is iterated, so it may read from a
+        replica too.
+        """
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with self._replica_reads():
+                result = function(*args, **kwargs)
+            if inspect.isgenerator(result):
+                return self._replica_generator(result)
+            return result
+
+        return wrapper
+
+    def _replica_generator(self, generator):
+        """Iterate the generator, letting its SELECTs go to a replica."""
+        while True:
+            with self._replica_reads():
+                try:
+                    chunk = next(generator)
+                except StopIteration:
+                    return
+            yield chunk
+
+    @contextlib.contextmanager
+    def _replica_reads(self):
+        """Let the SELECTs of the session go to a replica until the block exits."""
+        info = self.session.info
+        previous = info.get('replica', False)
+        info['replica'] = True
+        try:
+            yield
+        finally:
+            info['replica'] = previous
+
+    def cache_ttl(self):
+        """Get the ttl to cache what the session read for, so a row read from a lagging replica expires soon.
+
+        It is None, the cache's own ttl, unless the session read from a
+        replica, in which case it is REPLICA_MAX_LAG.
+        """
+        return self.router.max_lag if self.session.info.get('replica_read') else None
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""This module has the declarative schemas that validate the request payloads.
+
+A schema is a list of fields, and every field lists the checks its value has
+to pass together with the exception, from blueprints.exceptions, that a
+failing check raises. Schemas are compiled once, when this module is
+imported, into one function per field with its settings bound, so
+validating a payload is a single pass over its fields with no regex
+compilation or lookups of the schema.
+"""
+import re
+
+from .constants import (
+    EMAIL_MAX_LENGTH,
+    NAME_MAX_LENGTH,
+    NAME_MIN_LENGTH,
+    PASSWORD_MAX_LENGTH,
+    PASSWORD_MIN_LENGTH,
+)
+from .exceptions import (
+    AdminNameTooLong,
+    AdminNameTooShort,
+    AdminPasswordNotAlphaNumeric,
+    AdminPasswordTooLong,
+    AdminPaswordTooShort,
+    EmailAddressTooLong,
+    EmptyAdminData,
+    EmptyUserData,
+    InvalidEmailAddressFormat,
+    MissingEmailData,
+    MissingEmailKey,
+    MissingNameData,
+    MissingNameKey,
+    MissingPasswordData,
+    MissingPasswordKey,
+    NonDictionaryAdminData,
+    NonDictionaryUserData,
+    NonStringData,
+)
+
+EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+
+
+class Field():
+    """A field of a schema and the checks its value has to pass.
+
+    Every check is given as a tuple of its setting, the exception class to
+    raise and the message. The checks run in the order of the arguments.
+
+    Attributes
+    ----------
+    name: str
+        The key of the field in the payload.
+    missing_key: tuple
+        The exception and message for a payload without the key. The field
+        is optional when this is None.
+    missing_data: tuple
+        The exception and message for an empty value.
+    string: tuple
+        The exception and message for a value that is not a string.
+    max_length, min_length: tuple
+        The longest and shortest allowed length, the exception and the message.
+    pattern: tuple
+        A compiled regular expression the whole value has to match, the
+        exception and the message.
+    alphanumeric: tuple
+        Whether the value has to be alphanumeric, True, or must not be,
+        False, the exception and the message.
+    """
+
+    def __init__(self, name: str, missing_key: tuple = None, missing_data: tuple = None, string: tuple = None,
+                 max_length: tuple = None, min_length: tuple = None, pattern: tuple = None,
+                 alphanumeric: tuple = None) -> None:
+        """Create the field."""
+        self.name = name
+        self.missing_key = missing_key
+        self.missing_data = missing_data
+        self.string = string
+        self.max_length = max_length
+        self.min_length = min_length
+        self.pattern = pattern
+        self.alphanumeric = alphanumeric
+
+    def compile(self):
+        """Get a function that raises the exception of the first check the value fails.
+
+        The settings are bound to the function once, so a check that is not
+        set costs a comparison with None rather than a call.
+        """
+        missing_data, string, max_length, min_length, pattern, alphanumeric = (
+            self.missing_data, self.string, self.max_length, self.min_length, self.pattern, self.alphanumeric)
+        longest = max_length[0] if max_length else None
+        shortest = min_length[0] if min_length else None
+        fullmatch = pattern[0].fullmatch if pattern else None
+        expected = alphanumeric[0] if alphanumeric else None
+
+        def check(value) -> None:  # pylint: disable=R0912
+            if missing_data and not value:
+                raise missing_data[0](missing_data[1])
+            if string and not isinstance(value, str):
+                raise string[0](string[1])
+            if longest is not None and len(value) > longest:
+                raise max_length[1](max_length[2])
+            if shortest is not None and len(value) < shortest:
+                raise min_length[1](min_length[2])
+            if fullmatch is not None and fullmatch(value) is None:
+                raise pattern[1](pattern[2])
+            if expected is not None and value.isalnum() is not expected:
+                raise alphanumeric[1](alphanumeric[2])
+
+        return check
+
+
+class Schema():
+    """A compiled schema that validates a payload in one pass over its fields."""
+
+    def __init__(self, fields: list, empty: tuple, not_a_dict: tuple, allow_unknown: bool = True) -> None:
+        """Compile the schema.
+
+        Parameters
+        ----------
+        fields: list
+            The fields of the payload, validated in this order.
+        empty: tuple
+            The exception and message for an empty payload.
+        not_a_dict: tuple
+            The exception and message for a payload that is not a dict.
+        allow_unknown: bool
+            Whether keys that are not fields are allowed. A KeyError is raised
+            for them otherwise.
+        """
+        self.names = tuple(field.name for field in fields)
+        self.empty = empty
+        self.not_a_dict = not_a_dict
+        self.allow_unknown = allow_unknown
+        self._fields = tuple((field.name, field.missing_key, field.compile()) for field in fields)
+
+    def validate(self, data) -> dict:
+        """Validate the payload, raising the exception of the first check that fails."""
+        if not data:
+            raise self.empty[0](self.empty[1])
+
+        if not isinstance(data, dict):
+            raise self.not_a_dict[0](self.not_a_dict[1])
+
+        if not self.allow_unknown:
+            for key in data:
+                if key not in self.names:
+                    raise KeyError(f'Invalid key {key}. The valid keys are {list(self.names)}.')
+
+        for name, missing_key, check in self._fields:
+            if name in data:
+                check(data[name])
+            elif missing_key:
+                raise missing_key[0](missing_key[1])
+
+        return data
+
+
+def email_field(owner: str, max_length: int) -> Field:
+    """Create the email field of the user or admin payloads."""
+    return Field(
+        'email',
+        missing_key=(MissingEmailKey, f'The email is missing from the {owner} data'),
+        missing_data=(MissingEmailData, 'The email data is missing'),
+        string=(ValueError, 'The email_address must be a string'),
+        max_length=(max_length, EmailAddressTooLong,
+                    f'The email address should be less than {EMAIL_MAX_LENGTH} characters!'),
+        pattern=(EMAIL_PATTERN, InvalidEmailAddressFormat, 'The email address is invalid'),
+    )
+
+
+ADMIN_NAME = Field(
+    'name',
+    missing_key=(MissingNameKey, 'The name is missing from the admin data'),
+    missing_data=(MissingNameData, 'The name data is missing'),
+    string=(ValueError, 'The admin_name has to be string'),
+    max_length=(NAME_MAX_LENGTH - 1, AdminNameTooLong, f'The admin_name has to be less than {NAME_MAX_LENGTH}'),
+    min_length=(NAME_MIN_LENGTH + 1, AdminNameTooShort, f'The admin_name has to be more than {NAME_MIN_LENGTH}'),
+    alphanumeric=(True, ValueError, 'The admin_name has to be alphanumeric.'),
+)
+
+ADMIN_PASSWORD = Field(
+    'password',
+    missing_key=(MissingPasswordKey, 'The password is missing from the admin data'),
+    missing_data=(MissingPasswordData, 'The password data is missing'),
+    string=(NonStringData, 'The admin_password has to be string'),
+    max_length=(PASSWORD_MAX_LENGTH - 1, AdminPasswordTooLong,
+                f'The admin_password has to be less than {PASSWORD_MAX_LENGTH}'),
+    min_length=(PASSWORD_MIN_LENGTH + 1, AdminPaswordTooShort,
+                f'The admin_password has to be more than {PASSWORD_MIN_LENGTH}'),
+    alphanumeric=(False, AdminPasswordNotAlphaNumeric, 'The admin_password has to be alphanumeric.'),
+)
+
+ADMIN_EMAIL = email_field('admin', EMAIL_MAX_LENGTH - 1)
+
+EMPTY_ADMIN_DATA = (EmptyAdminData, 'The admin data cannot be empty.')
+NON_DICTIONARY_ADMIN_DATA = (NonDictionaryAdminData, 'admin_data must be a dict')
+
+USER_SCHEMA = Schema(
+    [email_field('user', EMAIL_MAX_LENGTH)],
+    empty=(EmptyUserData, 'The user data cannot be empty.'),
+    not_a_dict=(NonDictionaryUserData, 'user_data must be a dict'),
+)
+
+ADMIN_SCHEMA = Schema([ADMIN_EMAIL, ADMIN_NAME, ADMIN_PASSWORD], EMPTY_ADMIN_DATA, NON_DICTIONARY_ADMIN_DATA)
+
+LOGIN_SCHEMA = Schema([ADMIN_EMAIL, ADMIN_PASSWORD], EMPTY_ADMIN_DATA, NON_DICTIONARY_ADMIN_DATA)
+
+ADMIN_UPDATE_SCHEMA = Schema(
+    [
+        Field(field.name, None, field.missing_data, field.string, field.max_length, field.min_length,
+              field.pattern, field.alphanumeric)
+        for field in (ADMIN_NAME, ADMIN_EMAIL, ADMIN_PASSWORD)
+    ],
+    EMPTY_ADMIN_DATA,
+    NON_DICTIONARY_ADMIN_DATA,
+    allow_unknown=False,
+)
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""This module has the key ring and the verified claims cache used for the JWTs.
+
+Every token is signed with the active key of the KeyRing and carries its key
+id in the kid header, so verification picks the key by kid. Keys that are
+being rotated out stay in the ring for verification only. With an RS, ES or
+EdDSA algorithm a service that only has the public keys, such as the async
+app at the edge, can verify tokens without being able to sign them.
+
+Verifying a signature on every request is wasted work when the same token is
+sent again and again, so the claims of a verified token are kept in a
+bounded LRU until the token expires. The cache is keyed by the whole
+encoded token, signature included, so a tampered token is never a hit.
+Whether a token was revoked is checked after the claims are decoded, so it
+is not affected by the cache.
+"""
+import os
+import time
+
+import jwt as pyjwt
+from flask_jwt_extended import JWTManager
+
+from .cache import LRUCache
+
+DEFAULT_CLAIMS_CACHE_SIZE = 10000
+ASYMMETRIC_PREFIXES = ('RS', 'PS', 'ES', 'Ed')
+
+
+def parse_secret_keys(secret_keys: str) -> dict:
+    """Get the secrets from a comma separated list of kid=secret pairs."""
+    keys = {}
+    for pair in (secret_keys or '').split(','):
+        if not pair.strip():
+            continue
+        kid, separator, secret = pair.partition('=')
+        if not separator or not secret:
+            raise ValueError(f'The key {kid.strip()} has to be given as kid=secret.')
+        keys[kid.strip()] = secret
+    return keys
+
+
+class KeyRing():
+    """The keys used to sign and verify the JWTs, by key id.
+
+    Attributes
+    ----------
+    algorithm: str
+        The signing algorithm, such as HS256 or RS256.
+    active_kid: str
+        The id of the key new tokens are signed with.
+    signing_keys: dict
+        The private keys, or secrets, by key id.
+    verification_keys: dict
+        The public keys, or secrets, by key id.
+    """
+
+    def __init__(self, algorithm: str, active_kid: str, signing_keys: dict, verification_keys: dict) -> None:
+        """Create the key ring."""
+        self.algorithm = algorithm
+        self.active_kid = active_kid
+        self.signing_keys = signing_keys
+        self.verification_keys = verification_keys
+
+    @classmethod
+    def from_config(cls, config) -> 'KeyRing':
+        """Create the key ring from the JWT_* settings.
+
+        With an HS algorithm, JWT_SECRET_KEY is the active key, with the id
+        JWT_KEY_ID, and JWT_PREVIOUS_SECRET_KEYS lists the kid=secret pairs
+        that are still accepted. With an asymmetric algorithm the keys are
+        read from JWT_KEYS_DIR, where <kid>.pem is a private key and
+        <kid>.pub a public key.
+        """
+        algorithm = config.get('JWT_ALGORITHM', 'HS256')
+        active_kid = config.get('JWT_KEY_ID', 'default')
+
+        if not algorithm.startswith(ASYMMETRIC_PREFIXES):
+            verification_keys = parse_secret_keys(config.get('JWT_PREVIOUS_SECRET_KEYS', ''))
+            verification_keys[active_kid] = config['JWT_SECRET_KEY']
+            return cls(algorithm, active_kid, {active_kid: config['JWT_SECRET_KEY']}, verification_keys)
+
+        keys_dir = config.get('JWT_KEYS_DIR')
+        if not keys_dir:
+            raise ValueError(f'JWT_KEYS_DIR has to be set to use the {algorithm} algorithm.')
+
+        signing_keys, verification_keys = {}, {}
+        for name in sorted(os.listdir(keys_dir)):
+            kid, extension = os.path.splitext(name)
+            keys = {'.pem': signing_keys, '.pub': verification_keys}.get(extension)
+            if keys is not None:
+                with open(os.path.join(keys_dir, name), encoding='utf-8') as key_file:
+                    keys[kid] = key_file.read()
+        return cls(algorithm, active_kid, signing_keys, verification_keys)
+
+    def signing_key(self) -> str:
+        """Get the active key to sign new tokens with."""
+        try:
+            return self.signing_keys[self.active_kid]
+        except KeyError as e:
+            raise RuntimeError(f'There is no signing key with the id {self.active_kid}. '
+                               'This service can only verify tokens.') from e
+
+    def verification_key(self, kid: str = None) -> str:
+        """Get the key to verify a token with the given kid header, or the active key's id if it has none."""
+        try:
+            return self.verification_keys[kid or self.active_kid]
+        except KeyError as e:
+            raise pyjwt.InvalidTokenError(f'The token was signed with the unknown key {kid}.') from e
+
+
+class ClaimsCache():
+    """A bounded LRU of the claims of verified tokens, kept until they expire.
+
+    Attributes
+    ----------
+    leeway: float
+        The seconds an entry is dropped before its token expires, so a token
+        is never served from the cache after it would fail verification.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CLAIMS_CACHE_SIZE, leeway: float = 1.0) -> None:
+        """Create an empty cache, which is disabled when max_size is 0."""
+        self.leeway = leeway
+        self.cache = LRUCache(max_size=max_size, ttl=0) if max_size else None
+
+    def get(self, token: str):
+        """Get a copy of the claims of the token, or None if it was not verified recently."""
+        if self.cache is None:
+            return None
+        claims = self.cache.get(token)
+        return dict(claims) if claims is not None else None
+
+    def set(self, token: str, claims: dict) -> None:
+        """Keep the claims of the verified token until its exp claim, if it has one."""
+        if self.cache is None or 'exp' not in claims:
+            return
+        ttl = claims['exp'] - time.time() - self.leeway
+        if ttl > 0:
+            self.cache.set(token, dict(claims), ttl=ttl)
+
+    def clear(self) -> None:
+        """Forget every token, such as after the keys changed."""
+        if self.cache is not None:
+            self.cache.clear()
+
+    def stats(self) -> dict:
+        """Get the size and the hit and miss counters of the cache."""
+        return self.cache.stats() if self.cache is not None else {'size': 0, 'hits': 0, 'misses': 0}
+
+
+class TokenVerifier():
+    """Verify tokens with a key ring and cache their claims, without flask-jwt-extended."""
+
+    def __init__(self, key_ring: KeyRing, claims_cache: ClaimsCache) -> None:
+        """Create the verifier."""
+        self.key_ring = key_ring
+        self.claims_cache = claims_cache
+
+    @classmethod
+    def from_config(cls, config) -> 'TokenVerifier':
+        """Create the verifier from the JWT_* settings."""
+        return cls(KeyRing.from_config(config),
+                   ClaimsCache(int(config.get('JWT_CLAIMS_CACHE_SIZE', DEFAULT_CLAIMS_CACHE_SIZE))))
+
+    def decode(self, token: str) -> dict:
+        """Get the claims of the token, verifying it unless it was verified recently."""
+        claims = self.claims_cache.get(token)
+        if claims is not None:
+            return claims
+
+        kid = pyjwt.get_unverified_header(token).get('kid')
+        claims = pyjwt.decode(token, self.key_ring.verification_key(kid), algorithms=[self.key_ring.algorithm])
+        self.claims_cache.set(token, claims)
+        return claims
+
+
+class CachingJWTManager(JWTManager):
+    """A JWTManager that signs with the key ring and serves recently verified claims from a cache.
+
+    Only the plain decoding done by @jwt_required() is cached. Decoding that
+    checks a CSRF value or allows expired tokens always goes to
+    flask-jwt-extended.
+    """
+
+    def __init__(self, app=None) -> None:
+        """Create the manager."""
+        self.key_ring = None
+        self.claims_cache = ClaimsCache(max_size=0)
+        super().__init__(app)
+        self.encode_key_loader(lambda identity: self.key_ring.signing_key())
+        self.decode_key_loader(lambda headers, payload: self.key_ring.verification_key(headers.get('kid')))
+        self.additional_headers_loader(lambda identity: {'kid': self.key_ring.active_kid})
+
+    def init_app(self, app) -> None:
+        """Load the key ring and size the claims cache from the JWT_* settings."""
+        super().init_app(app)
+        self.key_ring = KeyRing.from_config(app.config)
+        self.claims_cache = ClaimsCache(int(app.config.get('JWT_CLAIMS_CACHE_SIZE', DEFAULT_CLAIMS_CACHE_SIZE)))
+
+    def _decode_jwt_from_config(self, encoded_token: str, csrf_value=None, allow_expired: bool = False) -> dict:
+        """Decode the token, or get its claims from the cache."""
+        if csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        claims = self.claims_cache.get(encoded_token)
+        if claims is None:
+            claims = super()._decode_jwt_from_config(encoded_token)
+            self.claims_cache.set(encoded_token, claims)
+        return claims
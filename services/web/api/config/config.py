@@ -3,6 +3,36 @@
 import os
 from datetime import timedelta
 
+from sqlalchemy.pool import NullPool
+
+from ..blueprints.pool import InstrumentedQueuePool
+from ..blueprints.replicas import replica_binds
+
+
+def create_engine_options() -> dict:
+    """Create the SQLAlchemy engine options from the DB_POOL_* environment variables.
+
+    DB_POOL_MODE is either internal, the default, where every worker keeps its
+    own pool of DB_POOL_SIZE connections plus DB_POOL_MAX_OVERFLOW, or
+    external, where connections are not pooled by the app because a
+    transaction pooler such as PgBouncer sits in front of the database. Size
+    internal pools so that workers * tasks * (size + overflow) stays below the
+    database connection limit.
+    """
+    pre_ping = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+
+    if os.getenv('DB_POOL_MODE', 'internal') == 'external':
+        return {'poolclass': NullPool, 'pool_pre_ping': pre_ping}
+
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', '10')),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': pre_ping,
+    }
+
 
 class BaseConfig():
     """Base configuration."""
@@ -21,11 +51,54 @@ class BaseConfig():
     db_conn_string = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
     SQLALCHEMY_DATABASE_URI = db_conn_string
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-
-    JWT_SECRET_KEY = 'super-secret-key'
+    SQLALCHEMY_ENGINE_OPTIONS = create_engine_options()
+
+    # The read-only helpers read from the replicas in REPLICA_DATABASE_URIS, a comma separated list of database
+    # URIs, when they are set. See blueprints.replicas.
+    SQLALCHEMY_BINDS = replica_binds(os.getenv('REPLICA_DATABASE_URIS', ''))
+    REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', '5'))
+    REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', '5'))
+    REPLICA_STICKY_SECONDS = float(os.getenv('REPLICA_STICKY_SECONDS', '5'))
+
+    # Tokens are signed with JWT_SECRET_KEY, which falls back to SECRET_KEY, unless JWT_ALGORITHM is an RS, ES
+    # or EdDSA algorithm, whose keys are read from JWT_KEYS_DIR. See blueprints.tokens.
+    JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', SECRET_KEY)
+    JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'HS256')
+    JWT_KEY_ID = os.getenv('JWT_KEY_ID', 'default')
+    JWT_PREVIOUS_SECRET_KEYS = os.getenv('JWT_PREVIOUS_SECRET_KEYS', '')
+    JWT_KEYS_DIR = os.getenv('JWT_KEYS_DIR')
+    JWT_CLAIMS_CACHE_SIZE = int(os.getenv('JWT_CLAIMS_CACHE_SIZE', '10000'))
+
+    TOKEN_BLOCKLIST_REFRESH = float(os.getenv('TOKEN_BLOCKLIST_REFRESH', '5'))
+    TOKEN_BLOOM_CAPACITY = int(os.getenv('TOKEN_BLOOM_CAPACITY', '100000'))
+    TOKEN_BLOOM_ERROR_RATE = float(os.getenv('TOKEN_BLOOM_ERROR_RATE', '0.001'))
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=int(os.environ['JWT_ACCESS_TOKEN_EXPIRES']))
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.environ['JWT_REFRESH_TOKEN_EXPIRES']))
 
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_MAX_SIZE = int(os.getenv('CACHE_MAX_SIZE', '10000'))
+    CACHE_TTL = int(os.getenv('CACHE_TTL', '300'))
+    CACHE_LOCAL_TTL = int(os.getenv('CACHE_LOCAL_TTL', '5'))
+
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '1.0'))
+    LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', '')
+
+    PASSWORD_HASH_SCHEME = os.getenv('PASSWORD_HASH_SCHEME', 'scrypt')
+    PASSWORD_SCRYPT_LOG_N = int(os.getenv('PASSWORD_SCRYPT_LOG_N', '14'))
+    PASSWORD_ARGON2_TIME_COST = int(os.getenv('PASSWORD_ARGON2_TIME_COST', '3'))
+    PASSWORD_ARGON2_MEMORY_COST = int(os.getenv('PASSWORD_ARGON2_MEMORY_COST', '65536'))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '0'))
+    PASSWORD_HASH_QUEUE_SIZE = int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', '64'))
+
+    PROXY_COUNT = int(os.getenv('PROXY_COUNT', '0'))
+
+    RATELIMIT_BACKEND = os.getenv('RATELIMIT_BACKEND', 'memory')
+    RATELIMIT_REDIS_URL = os.getenv('RATELIMIT_REDIS_URL', CACHE_REDIS_URL)
+    RATELIMIT_LOGIN_IP = os.getenv('RATELIMIT_LOGIN_IP', '20/60')
+    RATELIMIT_LOGIN_EMAIL = os.getenv('RATELIMIT_LOGIN_EMAIL', '10/300')
+
 
 class TestingConfig(BaseConfig):
     """Configuration used during testing."""
@@ -34,16 +107,6 @@ class TestingConfig(BaseConfig):
     DEBUG = True
     TESTING = True
 
-    POSTGRES_HOST = os.environ['POSTGRES_HOST']
-    POSTGRES_DB = os.environ['POSTGRES_DB']
-    POSTGRES_PORT = os.environ['POSTGRES_PORT']
-    POSTGRES_USER = os.environ['POSTGRES_USER']
-    POSTGRES_PASSWORD = os.environ['POSTGRES_PASSWORD']
-
-    db_conn_string = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-    SQLALCHEMY_DATABASE_URI = db_conn_string
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
-
 
 class DevelopmentConfig(BaseConfig):
     """Configuration used during development."""
@@ -52,16 +115,6 @@ class DevelopmentConfig(BaseConfig):
     DEBUG = True
     TESTING = False
 
-    POSTGRES_HOST = os.environ['POSTGRES_HOST']
-    POSTGRES_DB = os.environ['POSTGRES_DB']
-    POSTGRES_PORT = os.environ['POSTGRES_PORT']
-    POSTGRES_USER = os.environ['POSTGRES_USER']
-    POSTGRES_PASSWORD = os.environ['POSTGRES_PASSWORD']
-
-    db_conn_string = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-    SQLALCHEMY_DATABASE_URI = db_conn_string
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
-
 
 class StagingConfig(BaseConfig):
     """Configuration used during staging."""
@@ -70,15 +123,8 @@ class StagingConfig(BaseConfig):
     DEBUG = False
     TESTING = False
 
-    POSTGRES_HOST = os.environ['POSTGRES_HOST']
-    POSTGRES_DB = os.environ['POSTGRES_DB']
-    POSTGRES_PORT = os.environ['POSTGRES_PORT']
-    POSTGRES_USER = os.environ['POSTGRES_USER']
-    POSTGRES_PASSWORD = os.environ['POSTGRES_PASSWORD']
-
-    db_conn_string = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-    SQLALCHEMY_DATABASE_URI = db_conn_string
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # The staging and production containers run behind an ALB, which is the one proxy that sets X-Forwarded-For.
+    PROXY_COUNT = int(os.getenv('PROXY_COUNT', '1'))
 
 
 class ProductionConfig(BaseConfig):
@@ -88,12 +134,5 @@ class ProductionConfig(BaseConfig):
     DEBUG = False
     TESTING = False
 
-    POSTGRES_HOST = os.environ['POSTGRES_HOST']
-    POSTGRES_DB = os.environ['POSTGRES_DB']
-    POSTGRES_PORT = os.environ['POSTGRES_PORT']
-    POSTGRES_USER = os.environ['POSTGRES_USER']
-    POSTGRES_PASSWORD = os.environ['POSTGRES_PASSWORD']
-
-    db_conn_string = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-    SQLALCHEMY_DATABASE_URI = db_conn_string
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # The staging and production containers run behind an ALB, which is the one proxy that sets X-Forwarded-For.
+    PROXY_COUNT = int(os.getenv('PROXY_COUNT', '1'))
@@ -1,93 +1,379 @@
 # -*- coding: utf-8 -*-
 """This module contain the confuguration for the application."""
-import json
 import logging
+import logging.handlers
 import os
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.utils import formataddr
-from smtplib import SMTP_SSL, SMTPException
+import queue
+import threading
+import time
 
-import boto3
 from dotenv import load_dotenv
 
+from ..blueprints.metrics import register_metrics
+from .spool import DiskSpool
+
 load_dotenv()
 
 
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """Put log records on a bounded queue for a QueueListener to format and send.
+
+    The stock QueueHandler formats every record on the calling thread. This
+    handler only merges the message with its arguments, so the arguments
+    cannot change before the listener gets to the record, and leaves the
+    JSON formatting and the tracebacks to the handlers of the listener.
+    When the queue is full the record is dropped and counted instead of
+    blocking the request.
+    """
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        """Initialize the handler with the queue of the listener."""
+        logging.handlers.QueueHandler.__init__(self, log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        """Merge the message of the record with its arguments."""
+        # The root logger's handlers are the last to see a record, so it is
+        # changed in place instead of being copied.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        """Put the record on the queue without waiting."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self) -> dict:
+        """Get the queue counters of the handler."""
+        return {'queued': self.queue.qsize(), 'dropped': self.dropped}
+
+
 class KinesisFirehoseDeliveryStreamHandler(logging.StreamHandler):
-    """This class sends our logs to Amazon Kinesis."""
+    """This class sends our logs to Amazon Kinesis.
 
-    def __init__(self):
-        """Initialize the firehose stream.."""
+    emit only formats the record and puts it on a bounded queue, so request
+    threads never wait on the Firehose API. A background thread sends the
+    queued records with put_record_batch. A batch is sent when it reaches
+    Firehose's limits of 500 records or 4 MiB, or after flush_interval
+    seconds. Records that Firehose rejects, as reported by FailedPutCount, are
+    retried with a backoff. When the queue is full new records are dropped
+    and counted instead of blocking the request.
+
+    With a spool_dir, records are spilled to a DiskSpool instead of being
+    dropped: when the queue is full, when they are still rejected after the
+    retries, and while the API is failing. A drainer thread replays the spool
+    every drain_interval seconds and marks the API as healthy again once a
+    replayed batch is accepted, so an outage costs disk space instead of
+    memory or records.
+
+    Threads do not survive a fork, so a forked worker, such as a preloaded
+    gunicorn worker, starts its own threads with an empty queue and spools to
+    a subdirectory named after its pid. The drainers also replay the spools
+    left behind by workers that have exited.
+    """
+
+    MAX_BATCH_RECORDS = 500
+    MAX_BATCH_BYTES = 4 * 1024 * 1024
+    MAX_RECORD_BYTES = 1000 * 1024
+
+    def __init__(self, client=None, delivery_stream_name: str = None, queue_size: int = 10000,
+                 flush_interval: float = 1.0, max_retries: int = 3, retry_backoff: float = 0.1,
+                 spool_dir: str = None, drain_interval: float = 5.0):
+        """Initialize the firehose stream and start the sender thread."""
         # By default, logging.StreamHandler uses sys.stderr if stream parameter is not specified
         logging.StreamHandler.__init__(self)
 
-        self.__firehose = None
-        self.__stream_buffer = []
-        self.__aws_key = os.environ['AWS_KEY']
-        self.__aws_secret = os.environ['AWS_SECRET']
-        self.__aws_region = os.environ['AWS_REGION']
+        self.__firehose = client
+        self.__delivery_stream_name = delivery_stream_name or os.environ['FIREHOSE_DELIVERY_STREAM']
+        self.__flush_interval = flush_interval
+        self.__max_retries = max_retries
+        self.__retry_backoff = retry_backoff
+        self.__drain_interval = drain_interval
+        self.__queue_size = queue_size
+        self.__spool_dir = spool_dir or os.environ.get('FIREHOSE_SPOOL_DIR')
+        self.__spool = DiskSpool(self.__spool_dir) if self.__spool_dir else None
 
-        try:
-            self.__firehose = boto3.client(
-                'firehose',
-                aws_access_key_id=self.__aws_key,
-                aws_secret_access_key=self.__aws_secret,
-                region_name=self.__aws_region
-            )
-        except Exception:
-            print('Firehose client initialization failed.')
+        if self.__firehose is None:
+            try:
+                import boto3  # pylint: disable=C0415
+                self.__firehose = boto3.client(
+                    'firehose',
+                    aws_access_key_id=os.environ['AWS_KEY'],
+                    aws_secret_access_key=os.environ['AWS_SECRET'],
+                    region_name=os.environ['AWS_REGION']
+                )
+            except Exception:
+                print('Firehose client initialization failed.')
+
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retried = 0
+        self.spilled = 0
+        self.__closed = threading.Event()
+        self.__start()
+        os.register_at_fork(after_in_child=self.__after_fork)
 
-        self.__delivery_stream_name = os.environ['FIREHOSE_DELIVERY_STREAM']
+        register_metrics('firehose', self.stats)
+
+    def __start(self):
+        """Create the queue and start the sender and drainer threads."""
+        self.__queue = queue.Queue(maxsize=self.__queue_size)
+        self.__carry = None
+        self.__flush_requested = threading.Event()
+        self.__sender = threading.Thread(target=self.__run, name='firehose-sender', daemon=True)
+        self.__sender.start()
+        self.__healthy = threading.Event()
+        self.__healthy.set()
+        self.__drainer = None
+        if self.__spool is not None:
+            self.__drainer = threading.Thread(target=self.__drain, name='firehose-drainer', daemon=True)
+            self.__drainer.start()
+
+    def __after_fork(self):
+        """Start the threads of a forked worker, with its own spool."""
+        if self.__closed.is_set():
+            return
+        if self.__spool is not None:
+            self.__spool = DiskSpool(os.path.join(self.__spool_dir, str(os.getpid())))
+        self.__start()
 
     def emit(self, record):
-        """Send the formatted log to AWS Firehose."""
+        """Queue the formatted log to be sent to AWS Firehose."""
         try:
             msg = self.format(record)
 
-            if self.__firehose:
-                self.__stream_buffer.append({
-                    'Data': msg.encode(encoding="UTF-8", errors="strict")
-                })
-            else:
+            if not self.__firehose:
                 stream = self.stream
                 stream.write(msg)
                 stream.write(self.terminator)
+                return
 
-            self.flush()
+            data = msg.encode(encoding="UTF-8", errors="strict")
+            if len(data) > self.MAX_RECORD_BYTES:
+                self.dropped += 1
+                return
+
+            self.__queue.put_nowait(data)
+        except queue.Full:
+            if self.__spool is not None:
+                self.__spool.append([data])
+                self.spilled += 1
+            else:
+                self.dropped += 1
         except Exception:
             self.handleError(record)
 
-    def flush(self):
-        """Flush the log buffer."""
-        self.acquire()
+    def stats(self) -> dict:
+        """Get the delivery counters of the handler."""
+        return {
+            'queued': self.__queue.qsize(),
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'retried': self.retried,
+            'spilled': self.spilled,
+            'spool_segments': self.__spool.pending() if self.__spool is not None else 0,
+        }
 
-        try:
-            if self.__firehose and self.__stream_buffer:
-                self.__firehose.put_record_batch(
+    def __next_batch(self) -> list:
+        """Wait for the next batch of records to send."""
+        batch = []
+        batch_bytes = 0
+        if self.__carry is not None:
+            batch.append(self.__carry)
+            batch_bytes = len(self.__carry)
+            self.__carry = None
+        deadline = time.monotonic() + self.__flush_interval
+
+        while len(batch) < self.MAX_BATCH_RECORDS:
+            timeout = deadline - time.monotonic()
+            if batch and (timeout <= 0 or self.__flush_requested.is_set() or self.__closed.is_set()):
+                break
+            try:
+                data = self.__queue.get(timeout=max(timeout, 0.01) if batch else self.__flush_interval)
+            except queue.Empty:
+                if batch or self.__closed.is_set():
+                    break
+                self.__flush_requested.clear()
+                deadline = time.monotonic() + self.__flush_interval
+                continue
+            if batch_bytes + len(data) > self.MAX_BATCH_BYTES:
+                # The record starts the next batch.
+                self.__carry = data
+                break
+            batch.append(data)
+            batch_bytes += len(data)
+
+        return batch
+
+    def __run(self):
+        """Send batches until the handler is closed and the queue is drained."""
+        while not (self.__closed.is_set() and self.__queue.empty() and self.__carry is None):
+            batch = self.__next_batch()
+            if batch:
+                self.__send(batch)
+
+    def __send(self, batch: list):
+        """Send one batch, spilling it to the spool while the API is failing."""
+        if self.__spool is not None and not self.__healthy.is_set():
+            undelivered = batch
+        else:
+            undelivered = self.__put(batch)
+
+        if undelivered and self.__spool is not None:
+            self.__spool.append(undelivered)
+            self.spilled += len(undelivered)
+            self.__healthy.clear()
+        else:
+            self.failed += len(undelivered)
+
+        for _ in batch:
+            self.__queue.task_done()
+
+    def __put(self, batch: list) -> list:
+        """Send one batch, retrying the records that Firehose rejects.
+
+        Returns
+        -------
+        list:
+            The records that were still rejected after the retries.
+        """
+        records = [{'Data': data} for data in batch]
+
+        for attempt in range(self.__max_retries + 1):
+            if attempt:
+                self.retried += len(records)
+                time.sleep(self.__retry_backoff * 2 ** (attempt - 1))
+            try:
+                response = self.__firehose.put_record_batch(
                     DeliveryStreamName=self.__delivery_stream_name,
-                    Records=self.__stream_buffer
+                    Records=records
                 )
+            except Exception as e:
+                print(f"An error occurred when sending {len(records)} records to Firehose: {e}")
+                continue
 
-                self.__stream_buffer.clear()
-        except Exception as e:
-            print("An error occurred during flush operation.")
-            print(f"Exception: {e}")
-            print(f"Stream buffer: {self.__stream_buffer}")
-        finally:
-            if self.stream and hasattr(self.stream, "flush"):
-                self.stream.flush()
+            if not response.get('FailedPutCount'):
+                self.sent += len(records)
+                records = []
+                break
 
-            self.release()
+            results = response['RequestResponses']
+            failed = [record for record, result in zip(records, results) if result.get('ErrorCode')]
+            self.sent += len(records) - len(failed)
+            records = failed
+
+        return [record['Data'] for record in records]
+
+    def __split(self, records: list):
+        """Split spooled records into batches within Firehose's limits."""
+        batch = []
+        batch_bytes = 0
+        for data in records:
+            if len(batch) == self.MAX_BATCH_RECORDS or batch_bytes + len(data) > self.MAX_BATCH_BYTES:
+                yield batch
+                batch = []
+                batch_bytes = 0
+            batch.append(data)
+            batch_bytes += len(data)
+        if batch:
+            yield batch
+
+    def __replay(self, spool: DiskSpool, name: str, records: list) -> bool:
+        """Send the undelivered records of a spool segment, returning whether all were accepted."""
+        if not records:
+            spool.acknowledge(name, 0)
+        for batch in self.__split(records):
+            if self.__put(batch):
+                # The whole batch is replayed on the next attempt, so a record
+                # may be delivered twice but is never lost.
+                return False
+            spool.acknowledge(name, len(batch))
+            self.__healthy.set()
+        return True
+
+    def __replay_spool(self, spool: DiskSpool) -> bool:
+        """Replay a spool, oldest segment first, returning whether it was emptied."""
+        segment = spool.oldest()
+        while segment is not None and not self.__closed.is_set() and self.__replay(spool, *segment):
+            segment = spool.oldest()
+        return segment is None
+
+    def __orphaned_spools(self):
+        """Claim the spools left behind by forked workers that have exited."""
+        for name in os.listdir(self.__spool_dir):
+            path = os.path.join(self.__spool_dir, name)
+            owner = name.split('.')[0]
+            if not owner.isdigit() or int(owner) == os.getpid() or not os.path.isdir(path):
+                continue
+            try:
+                os.kill(int(owner), 0)
+                continue
+            except ProcessLookupError:
+                pass
+            except PermissionError:
+                continue
+            claimed = os.path.join(self.__spool_dir, f'{os.getpid()}.{name}')
+            try:
+                # Renaming is atomic, so only one drainer replays the spool.
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            yield claimed
+
+    def __drain(self):
+        """Replay the spool and the orphaned spools until the handler is closed."""
+        while not self.__closed.wait(self.__drain_interval):
+            self.__replay_spool(self.__spool)
+            for path in self.__orphaned_spools():
+                spool = DiskSpool(path)
+                if self.__replay_spool(spool) and not spool.pending():
+                    spool.close()
+                    os.rmdir(path)
+
+    def flush(self):
+        """Wait until every queued record has been sent or has failed."""
+        if not self.__sender.is_alive():
+            return
+        self.__flush_requested.set()
+        self.__queue.join()
+        if self.stream and hasattr(self.stream, "flush"):
+            self.stream.flush()
+
+    def close(self):
+        """Send the queued records and stop the sender thread."""
+        self.__closed.set()
+        self.__sender.join()
+        if self.__spool is not None:
+            self.__drainer.join()
+            self.__spool.close()
+        logging.StreamHandler.close(self)
 
 
 class CustomEmailLogger(logging.Handler):
-    """Custom email logger."""
+    """Custom email logger.
+
+    The handler level defaults to CRITICAL, so logging discards every other
+    record before it is formatted. emit only puts the record's name and
+    message on a bounded queue and a background worker sends the emails over
+    one SMTP connection that is kept open between messages. The first of a
+    run of identical messages is sent straight away; the copies that follow
+    within coalesce_window seconds are counted and sent as one digest email
+    when the window closes.
+    """
 
-    def __init__(self) -> None:
-        """Initialize the logger."""
-        logging.Handler.__init__(self)
-        self.mailport = 465
+    def __init__(self, level: int = logging.CRITICAL, smtp_factory=None, coalesce_window: float = 60.0,
+                 queue_size: int = 1000) -> None:
+        """Initialize the logger and start the mail worker."""
+        logging.Handler.__init__(self, level)
+        if smtp_factory is None:
+            from smtplib import SMTP_SSL  # pylint: disable=C0415
+            smtp_factory = SMTP_SSL
+        self.mailport = int(os.environ.get('MAIL_PORT', 465))
         self.mailhost = os.environ['MAIL_HOST']
         self.fromaddr = 'lyceokoth@gmail.com'
         self.toaddrs = 'lyceokoth@gmail.com'
@@ -95,50 +381,147 @@ class CustomEmailLogger(logging.Handler):
         self.password = os.environ['MAIL_PASSWORD']
         self.sender_name = 'Lyle from Amazon'
 
-    def emit(self, record):
-        """
-        Emit a record.
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.failed = 0
+        self.__smtp_factory = smtp_factory
+        self.__coalesce_window = coalesce_window
+        self.__queue_size = queue_size
+        self.__closed = threading.Event()
+        self.__start()
+        os.register_at_fork(after_in_child=self.__after_fork)
 
-        Format the record and send it to the specified addressees.
-        """
+        register_metrics('mail', self.stats)
+
+    def __start(self):
+        """Create the queue and start the mail worker."""
+        self.__windows = {}
+        self.__server = None
+        self.__queue = queue.Queue(maxsize=self.__queue_size)
+        self.__worker = threading.Thread(target=self.__run, name='mail-sender', daemon=True)
+        self.__worker.start()
+
+    def __after_fork(self):
+        """Start the mail worker of a forked worker, with its own SMTP connection."""
+        if not self.__closed.is_set():
+            self.__start()
+
+    def emit(self, record):
+        """Queue the record to be emailed to the specified addressees."""
         try:
-            log_record = json.loads(self.format(record))
-
-            # Try to send the message.
-            if log_record['levelname'] in ['CRITICAL']:
-                with SMTP_SSL(self.mailhost, self.mailport) as server:
-                    SUBJECT = log_record['levelname']
-                    BODY_HTML = f"""
-                    <html>
-                        <head>
-                        </head>
-                        <body>
-                            <h1>
-                                {log_record['name']}
-                            </h1>
-                            <p>
-                                {log_record['message']}
-                            </p>
-                        </body>
-                    </html>"""
-                    msg = MIMEMultipart('alternative')
-                    msg['Subject'] = SUBJECT
-                    msg['From'] = formataddr((self.sender_name, self.fromaddr))
-                    msg['To'] = self.toaddrs
-
-                    part2 = MIMEText(BODY_HTML, 'html')
-
-                    msg.attach(part2)
-                    server.login(self.username, self.password)
-                    server.sendmail(self.fromaddr, self.toaddrs, msg.as_string())
-                    server.close()
-                    print("Email sent!")
-
-        except SMTPException as e:
-            print("Error: ", e)
-        except Exception as e:
-            print(f"Exception: {e}")
+            self.__queue.put_nowait((record.levelname, record.name, record.getMessage()))
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def stats(self) -> dict:
+        """Get the delivery counters of the handler."""
+        return {
+            'queued': self.__queue.qsize(),
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
+
+    def __run(self):
+        """Send the queued alerts until the handler is closed."""
+        while not (self.__closed.is_set() and self.__queue.empty()):
+            timeout = self.__close_windows()
+            try:
+                alert = self.__queue.get(timeout=timeout)
+            except queue.Empty:
+                continue
+
+            window = self.__windows.get(alert)
+            if window is not None:
+                window[1] += 1
+                self.coalesced += 1
+            else:
+                self.__windows[alert] = [time.monotonic() + self.__coalesce_window, 0]
+                self.__send(*alert)
+            self.__queue.task_done()
+
+        for alert, (_, count) in self.__windows.items():
+            if count:
+                self.__send(*alert, count=count)
+        if self.__server is not None:
+            try:
+                self.__server.quit()
+            except OSError:
+                pass
+
+    def __close_windows(self) -> float:
+        """Send a digest for every expired window with repeats, returning the time until the next expires."""
+        now = time.monotonic()
+        for alert, (expires, count) in list(self.__windows.items()):
+            if expires <= now:
+                del self.__windows[alert]
+                if count:
+                    self.__send(*alert, count=count)
+        if self.__closed.is_set():
+            return 0.01
+        return min([expires - now for expires, _ in self.__windows.values()] + [1.0])
+
+    def __message(self, levelname: str, name: str, message: str, count: int) -> str:
+        """Build the email for an alert, or for the digest of its repeats."""
+        from email.mime.multipart import MIMEMultipart  # pylint: disable=C0415
+        from email.mime.text import MIMEText  # pylint: disable=C0415
+        from email.utils import formataddr  # pylint: disable=C0415
+
+        SUBJECT = levelname
+        if count:
+            SUBJECT = f'{levelname} (repeated {count} times in {self.__coalesce_window:g} seconds)'
+        BODY_HTML = f"""
+        <html>
+            <head>
+            </head>
+            <body>
+                <h1>
+                    {name}
+                </h1>
+                <p>
+                    {message}
+                </p>
+            </body>
+        </html>"""
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = SUBJECT
+        msg['From'] = formataddr((self.sender_name, self.fromaddr))
+        msg['To'] = self.toaddrs
+
+        part2 = MIMEText(BODY_HTML, 'html')
+
+        msg.attach(part2)
+        return msg.as_string()
+
+    def __send(self, levelname: str, name: str, message: str, count: int = 0):
+        """Send one email, reconnecting once if the kept open connection was closed."""
+        msg = self.__message(levelname, name, message, count)
+        for attempt in range(2):
+            try:
+                if self.__server is None:
+                    self.__server = self.__smtp_factory(self.mailhost, self.mailport)
+                    self.__server.login(self.username, self.password)
+                self.__server.sendmail(self.fromaddr, self.toaddrs, msg)
+                self.sent += 1
+                return
+            except OSError as e:
+                # SMTPException is an OSError too.
+                self.__server = None
+                if attempt:
+                    self.failed += 1
+                    print("Error: ", e)
+
+    def flush(self):
+        """Wait until every queued alert has been handled."""
+        if self.__worker.is_alive():
+            self.__queue.join()
 
     def close(self):
-        """Terminate the handler."""
+        """Send the pending digests, close the connection and stop the worker."""
+        self.__closed.set()
+        self.__worker.join()
         logging.Handler.close(self)
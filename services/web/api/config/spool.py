@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""This module has the disk spool that keeps log records while they cannot be delivered."""
+import mmap
+import os
+import struct
+import threading
+
+_LENGTH = struct.Struct('>I')
+
+
+class DiskSpool():
+    """An append-only spool of records split into rotated segment files.
+
+    Every record is written as a 4 byte length followed by its bytes. Records
+    are appended to the newest segment, which is rotated once it reaches
+    segment_bytes. Closed segments are read back through a memory map, oldest
+    first, and removed once every record in them has been delivered. When the
+    spool reaches max_bytes the oldest segment is discarded and its records
+    are counted as dropped, so an outage cannot fill the disk.
+
+    Attributes
+    ----------
+    directory: str
+        The directory that holds the segment files.
+    spooled: int
+        The number of records appended to the spool.
+    dropped: int
+        The number of records discarded because the spool was full.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 16 * 1024 * 1024,
+                 max_bytes: int = 1024 * 1024 * 1024) -> None:
+        """Open the spool in the given directory, keeping any segments left by a previous run."""
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.spooled = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._offsets = {}
+        self._lengths = {}
+
+        os.makedirs(directory, exist_ok=True)
+        self._segments = sorted(name for name in os.listdir(directory) if name.endswith('.seg'))
+        next_sequence = int(self._segments[-1][:-4]) + 1 if self._segments else 0
+        self._current = None
+        self._current_name = None
+        self._current_bytes = 0
+        self._next_sequence = next_sequence
+
+    def _path(self, name: str) -> str:
+        """Get the path of the segment with the given name."""
+        return os.path.join(self.directory, name)
+
+    def _rotate(self) -> None:
+        """Close the current segment and start a new one."""
+        if self._current is not None:
+            self._current.close()
+        self._current_name = f'{self._next_sequence:020d}.seg'
+        self._next_sequence += 1
+        self._current = open(self._path(self._current_name), 'ab')  # pylint: disable=R1732
+        self._current_bytes = 0
+        self._segments.append(self._current_name)
+
+    def _size(self) -> int:
+        """Get the number of bytes held by every segment."""
+        return sum(os.path.getsize(self._path(name)) for name in self._segments)
+
+    def append(self, records: list) -> None:
+        """Append the records to the newest segment."""
+        with self._lock:
+            if self._current is None or self._current_bytes >= self.segment_bytes:
+                self._rotate()
+                while len(self._segments) > 1 and self._size() > self.max_bytes:
+                    self.dropped += len(self._read(self._segments[0]))
+                    self._discard(self._segments[0])
+
+            frames = b''.join(_LENGTH.pack(len(record)) + record for record in records)
+            self._current.write(frames)
+            self._current.flush()
+            self._current_bytes += len(frames)
+            self.spooled += len(records)
+
+    def _read(self, name: str) -> list:
+        """Read every record of a segment through a memory map."""
+        path = self._path(name)
+        if os.path.getsize(path) == 0:
+            return []
+
+        records = []
+        with open(path, 'rb') as segment, mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset = 0
+            while offset + _LENGTH.size <= len(data):
+                (length,) = _LENGTH.unpack_from(data, offset)
+                offset += _LENGTH.size
+                if offset + length > len(data):
+                    # A record cut short by a crash while it was being written.
+                    break
+                records.append(data[offset:offset + length])
+                offset += length
+        return records
+
+    def _discard(self, name: str) -> None:
+        """Remove a segment file."""
+        self._segments.remove(name)
+        self._offsets.pop(name, None)
+        self._lengths.pop(name, None)
+        os.remove(self._path(name))
+
+    def oldest(self):
+        """Get the oldest segment and the records in it that have not been delivered.
+
+        The current segment is rotated first, so it is never read while it is
+        being written. The segment is read under the lock, so an append that
+        goes over max_bytes cannot discard it halfway.
+
+        Returns
+        -------
+        tuple:
+            The segment name and its undelivered records, or None if the spool
+            is empty.
+        """
+        with self._lock:
+            if not self._segments:
+                return None
+            if self._segments[0] == self._current_name:
+                if self._current_bytes == 0:
+                    return None
+                self._rotate()
+            name = self._segments[0]
+            records = self._read(name)
+            self._lengths[name] = len(records)
+            return name, records[self._offsets.get(name, 0):]
+
+    def acknowledge(self, name: str, count: int) -> None:
+        """Mark the next count records of the segment as delivered, removing it once all are."""
+        with self._lock:
+            if name not in self._segments:
+                return
+            self._offsets[name] = self._offsets.get(name, 0) + count
+            if self._offsets[name] >= self._lengths[name]:
+                self._discard(name)
+
+    def pending(self) -> int:
+        """Get the number of segments waiting to be delivered."""
+        with self._lock:
+            empty_current = self._current_name in self._segments and self._current_bytes == 0
+            return len(self._segments) - empty_current
+
+    def close(self) -> None:
+        """Close the current segment."""
+        with self._lock:
+            if self._current is not None:
+                self._current.close()
+                self._current = None
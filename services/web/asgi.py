@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""Provide the ASGI application that serves the read routes asynchronously."""
+from api.async_app import create_async_app
+from dotenv import load_dotenv
+
+load_dotenv()
+
+app = create_async_app()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""The gunicorn settings used to serve the application in production.
+
+The app is imported and created once in the master, before the workers are
+forked, so the workers share its memory pages instead of each importing
+everything again. The pooled database connections must not be shared across
+the fork, so every worker drops the connections it inherited.
+
+Every setting can be changed with an environment variable:
+
+GUNICORN_BIND
+    The address to listen on, 0.0.0.0:5000 by default.
+GUNICORN_WORKER_CLASS
+    sync, gthread or gevent. By default a container with up to two CPUs
+    uses gthread, so threads hide the time spent waiting on Postgres
+    without the memory of more processes, and a larger one uses sync.
+    gevent needs the gevent and psycogreen packages, which are not installed
+    by default.
+GUNICORN_WORKERS
+    The number of workers. By default 2 * CPUs + 1 sync workers, or
+    CPUs + 1 gthread and gevent workers.
+GUNICORN_THREADS
+    The threads of each gthread worker, 4 by default.
+GUNICORN_MAX_REQUESTS and GUNICORN_MAX_REQUESTS_JITTER
+    Restart a worker after 1000 requests, give or take 100, so slow memory
+    growth is reclaimed without restarting every worker at once.
+GUNICORN_LOG_LEVEL
+    info by default. Access logs are off unless GUNICORN_ACCESS_LOG is set.
+"""
+import os
+
+
+def cpu_count() -> int:
+    """Get the number of CPUs this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+cpus = cpu_count()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread' if cpus <= 2 else 'sync')
+workers = int(os.getenv('GUNICORN_WORKERS', cpus * 2 + 1 if worker_class == 'sync' else cpus + 1))
+threads = int(os.getenv('GUNICORN_THREADS', '4')) if worker_class == 'gthread' else 1
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+
+preload_app = True
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+accesslog = os.getenv('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+
+
+def post_fork(server, worker):  # pylint: disable=W0613
+    """Drop the database connections the worker inherited from the master."""
+    if worker_class == 'gevent':
+        from psycogreen.gevent import patch_psycopg  # pylint: disable=C0415
+        patch_psycopg()
+
+    from api.blueprints.extensions import db  # pylint: disable=C0415
+
+    with server.app.wsgi().app_context():
+        # close=False leaves the sockets to the master instead of closing
+        # them from the worker. The pool metrics follow the engines to
+        # their new pools.
+        db.engine.dispose(close=False)
+        for bind_key in db.router.bind_keys:
+            db.get_engine(bind=bind_key).dispose(close=False)
+
+
+def worker_exit(server, worker):  # pylint: disable=W0613
+    """Let the password hashing threads finish their calls before the worker exits."""
+    from api.blueprints.extensions import passwords  # pylint: disable=C0415
+
+    passwords.close()
@@ -1,13 +1,18 @@
 # -*- coding: utf-8 -*-
 """Provide commands for starting the application, creating the database and seeding the database."""
+import sys
+
+import click
 from api import create_app, db
+from api.blueprints.auth.revocation import token_store
 from api.blueprints.default.models import User
+from api.blueprints.extensions import app_logger
+from api.helpers import are_environment_variables_set, profile_imports
 from dotenv import load_dotenv
 from flask.cli import FlaskGroup
 
 load_dotenv()
 
-app = create_app()
 cli = FlaskGroup(create_app=create_app)
 
 
@@ -19,6 +24,42 @@ def create_db():
     db.session.commit()
 
 
+@cli.command('preflight', with_appcontext=False)
+def preflight():
+    """Check that the environment variables are set and that the database exists."""
+    if not are_environment_variables_set():
+        app_logger.critical('Unable to set Environment variables. Application existing...')
+        sys.exit(1)
+    app_logger.info('The preflight checks passed.')
+
+
+@cli.command('importtime', with_appcontext=False)
+@click.option('--module', default='api', help='The module to import.')
+@click.option('--top', default=20, help='The number of slowest imports to show.')
+@click.option('--budget', default=0.0, help='Fail if the import takes longer than this many milliseconds.')
+def importtime(module, top, budget):
+    """Show the slowest imports of a module, like python -X importtime."""
+    imports = profile_imports(module)
+    total = next(entry['cumulative_ms'] for entry in imports if entry['module'] == module)
+
+    click.echo(f'{"cumulative ms":>14} {"self ms":>9}  module')
+    for entry in imports[:top]:
+        indent = '  ' * entry['depth']
+        click.echo(f'{entry["cumulative_ms"]:14.1f} {entry["self_ms"]:9.1f}  {indent}{entry["module"]}')
+    click.echo(f'Importing {module} took {total:.1f} ms.')
+
+    if budget and total > budget:
+        click.echo(f'The import time is over the budget of {budget:.1f} ms.', err=True)
+        sys.exit(1)
+
+
+@cli.command('purge_tokens')
+def purge_tokens():
+    """Remove the expired tokens from the tokens table."""
+    purged = token_store.purge_expired()
+    app_logger.info('Purged %s expired tokens.', purged)
+
+
 @cli.command('seed_db')
 def seed_db():
     """Seed the database."""
@@ -33,3 +74,6 @@ def seed_db():
 
 if __name__ == '__main__':
     cli()
+else:
+    # The WSGI servers load manage:app, while the commands create their own app.
+    app = create_app()
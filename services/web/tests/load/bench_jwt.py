@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""This module measures the time spent verifying the access token of a request.
+
+It decodes the same access token the way @jwt_required() does, through
+CachingJWTManager, first with the claims cache disabled, so the signature is
+verified every time, and then with it enabled. When the cryptography package
+is installed the same is done for RS256 and EdDSA tokens, whose signatures
+are slower to verify than HS256.
+
+Run it from services/web with ``python -m tests.load.bench_jwt``.
+"""
+import tempfile
+import time
+from pathlib import Path
+
+from api.blueprints.tokens import CachingJWTManager
+from flask import Flask
+from flask_jwt_extended import create_access_token, decode_token
+
+REQUESTS = 20000
+
+
+def write_keys(directory: str, algorithm: str) -> None:
+    """Write a private and a public key for the algorithm to the directory."""
+    # pylint: disable=C0415
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+    if algorithm == 'RS256':
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        private_format = serialization.PrivateFormat.TraditionalOpenSSL
+    else:
+        private_key = ed25519.Ed25519PrivateKey.generate()
+        private_format = serialization.PrivateFormat.PKCS8
+
+    Path(directory, 'bench.pem').write_bytes(private_key.private_bytes(
+        serialization.Encoding.PEM, private_format, serialization.NoEncryption()))
+    Path(directory, 'bench.pub').write_bytes(private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo))
+
+
+def measure(algorithm: str, cache_size: int, keys_dir: str) -> float:
+    """Decode an access token REQUESTS times, returning the microseconds spent per request."""
+    app = Flask(__name__)
+    app.config.update(JWT_SECRET_KEY='bench-secret', JWT_ALGORITHM=algorithm, JWT_KEY_ID='bench',
+                      JWT_KEYS_DIR=keys_dir, JWT_CLAIMS_CACHE_SIZE=cache_size)
+    CachingJWTManager(app)
+
+    with app.app_context():
+        token = create_access_token(identity=1)
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            decode_token(token)
+        return (time.perf_counter() - start) / REQUESTS * 1e6
+
+
+def main() -> None:
+    """Print the time per request with and without the claims cache for every algorithm."""
+    print(f'{"algorithm":<10}{"verify µs":>12}{"cached µs":>12}')
+    for algorithm in ('HS256', 'RS256', 'EdDSA'):
+        with tempfile.TemporaryDirectory() as keys_dir:
+            if algorithm != 'HS256':
+                try:
+                    write_keys(keys_dir, algorithm)
+                except ImportError:
+                    print(f'{algorithm:<10}  skipped, the cryptography package is not installed')
+                    continue
+            verify, cached = measure(algorithm, 0, keys_dir), measure(algorithm, 10000, keys_dir)
+            print(f'{algorithm:<10}{verify:>12.1f}{cached:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
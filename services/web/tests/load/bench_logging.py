@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""This module measures the time that logging takes on the request thread.
+
+It logs the three messages a typical view logs per request, first with the
+JSON formatting StreamHandler on the logger itself, as create_logger used to
+configure it, and then through the LogQueueHandler and QueueListener pipeline.
+Both are measured with an in-memory stream and with a stream whose writes
+take WRITE_LATENCY seconds, like stdout piped to a busy log collector.
+
+Run it from services/web with ``python -m tests.load.bench_logging``.
+"""
+import io
+import logging
+import logging.handlers
+import queue
+import time
+
+from api.config.logging_config import LogQueueHandler
+from pythonjsonlogger.jsonlogger import JsonFormatter
+
+REQUESTS = 20000
+WRITE_LATENCY = 0.0001
+
+
+class SlowStream(io.StringIO):
+    """An in-memory stream whose writes wait like a blocking pipe."""
+
+    def write(self, s):
+        """Write the string after WRITE_LATENCY seconds."""
+        time.sleep(WRITE_LATENCY)
+        return super().write(s)
+
+
+def create_stream_handler(stream) -> logging.Handler:
+    """Create the JSON formatting StreamHandler used by create_logger."""
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter('%(asctime)s %(name)s %(levelname)s %(message)s',
+                                       datefmt='%Y-%m-%dT%H:%M:%S%z'))
+    return handler
+
+
+def log_requests(logger: logging.Logger) -> float:
+    """Log the messages of REQUESTS requests, returning the microseconds spent per request."""
+    data = {'email': 'lyle@notreal.com', 'name': 'Lyle'}
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        logger.info('Updating the user with id %s.', i)
+        logger.info('Updating the user with id %s with data: %s.', i, data)
+        logger.info('Successfully updated the user with id %s.', i)
+    return (time.perf_counter() - start) / REQUESTS * 1e6
+
+
+def bench_inline(stream) -> float:
+    """Log with the handler called on the request thread."""
+    logger = logging.Logger('bench.inline')
+    logger.addHandler(create_stream_handler(stream))
+    return log_requests(logger)
+
+
+def bench_queue(stream) -> float:
+    """Log through a queue that a listener thread drains."""
+    logger = logging.Logger('bench.queue')
+    queue_handler = LogQueueHandler(queue.Queue(maxsize=REQUESTS * 3))
+    logger.addHandler(queue_handler)
+    listener = logging.handlers.QueueListener(queue_handler.queue, create_stream_handler(stream))
+    listener.start()
+    elapsed = log_requests(logger)
+    listener.stop()
+    return elapsed
+
+
+if __name__ == '__main__':
+    for label, stream_class in (('in-memory stream', io.StringIO), ('slow stream', SlowStream)):
+        inline = bench_inline(stream_class())
+        queued = bench_queue(stream_class())
+        print(f'{label}:')
+        print(f'  inline StreamHandler:       {inline:8.1f} us per request')
+        print(f'  QueueHandler and listener:  {queued:8.1f} us per request ({inline / queued:.1f}x)')
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""This module measures the login throughput for each password hashing cost.
+
+For every scrypt cost, CONCURRENT_LOGINS threads verify a password through
+the PasswordHasher pool, the way concurrent requests to /auth/login do, and
+the logins per second and the mean time per login are printed. Pick the
+highest cost whose throughput still covers the expected login rate per
+worker.
+
+Run it from services/web with ``python -m tests.load.bench_passwords``.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api.blueprints.passwords import PasswordHasher, ScryptScheme
+
+COSTS = (10, 12, 13, 14, 15, 16)
+CONCURRENT_LOGINS = 8
+SECONDS_PER_COST = 2.0
+
+
+def measure(log_n: int) -> tuple:
+    """Verify passwords for SECONDS_PER_COST seconds, returning the logins per second and ms per login."""
+    hasher = PasswordHasher(scheme=ScryptScheme(log_n=log_n), queue_size=CONCURRENT_LOGINS)
+    stored = hasher.hash('pass#word')
+
+    def login(_) -> float:
+        start = time.perf_counter()
+        hasher.verify(stored, 'pass#word')
+        return time.perf_counter() - start
+
+    latencies = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CONCURRENT_LOGINS) as requests:
+        while time.perf_counter() - start < SECONDS_PER_COST:
+            latencies.extend(requests.map(login, range(CONCURRENT_LOGINS)))
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, sum(latencies) / len(latencies) * 1000
+
+
+def main() -> None:
+    """Print the login throughput and latency for each cost."""
+    print(f'{os.cpu_count()} CPUs, {CONCURRENT_LOGINS} concurrent logins')
+    print(f'{"scrypt N":>10}{"memory MiB":>12}{"logins/s":>12}{"ms/login":>12}')
+    for log_n in COSTS:
+        throughput, latency = measure(log_n)
+        print(f'{2 ** log_n:>10}{128 * 8 * 2 ** log_n / 2 ** 20:>12.0f}{throughput:>12.1f}{latency:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""This module measures the cost of checking a token for revocation.
+
+It fills the BloomFilter the TokenStore uses with REVOKED revoked jtis and
+times the lookup of a jti that was not revoked, which is the answer for
+almost every request, against a Python set of the same jtis. The memory of
+both is printed too, since every worker keeps its own copy.
+
+Run it from services/web with ``python -m tests.load.bench_revocation``.
+"""
+import sys
+import timeit
+import uuid
+
+from api.blueprints.bloom import BloomFilter
+
+REVOKED = 100000
+LOOKUPS = 1000000
+
+
+def main() -> None:
+    """Print the lookup time and memory of the Bloom filter and of a set."""
+    revoked = [str(uuid.uuid4()) for _ in range(REVOKED)]
+    bloom = BloomFilter(capacity=REVOKED, error_rate=0.001)
+    for jti in revoked:
+        bloom.add(jti)
+    blocklist = set(revoked)
+    jti = str(uuid.uuid4())
+
+    bloom_bytes = sys.getsizeof(bloom._bits)  # pylint: disable=W0212
+    set_bytes = sys.getsizeof(blocklist) + sum(sys.getsizeof(item) for item in revoked)
+    print(f'{REVOKED} revoked tokens')
+    print(f'{"blocklist":<8}{"lookup µs":>12}{"memory KiB":>12}')
+    for name, container, size in (('bloom', bloom, bloom_bytes), ('set', blocklist, set_bytes)):
+        seconds = timeit.timeit(lambda container=container: jti in container, number=LOOKUPS)
+        print(f'{name:<8}{seconds / LOOKUPS * 1e6:>12.2f}{size / 1024:>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
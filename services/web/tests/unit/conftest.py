@@ -3,13 +3,23 @@
 import pytest
 from api import create_app as create_app_
 from api import db
+from api.blueprints.extensions import login_limiter
+from api.blueprints.ratelimit import MemoryLimiter
 from api.config.config import DevelopmentConfig, ProductionConfig, StagingConfig, TestingConfig
 
 
+@pytest.fixture(scope='session')
+def app():
+    """Create the app instance with the test config once for the whole session."""
+    test_app = create_app_()
+    test_app.config.from_object(TestingConfig)
+    return test_app
+
+
 @pytest.fixture
-def create_app():
+def create_app(app):
     """Create the app instance."""
-    return create_app_()
+    return app
 
 
 @pytest.fixture
@@ -19,40 +29,53 @@ def create_db():
 
 
 @pytest.fixture
-def client():
+def client(app):
     """Create the test client."""
-    create_app_().config.from_object(TestingConfig)
-    test_client = create_app_().test_client()
-    with create_app_().app_context():
+    with app.app_context():
         db.drop_all()
         db.create_all()
+    # Every test logs in from the same address, so the login limits start afresh.
+    login_limiter.backend = MemoryLimiter()
+
+    return app.test_client()
+
+
+@pytest.fixture
+def log_in(client):
+    """Register admins and log them in, getting their tokens."""
+    def log_in_(name: str) -> dict:
+        admin = {'email': f'{name}@notreal.com', 'name': name, 'password': 'pass#word'}
+        client.post('/auth/register', json=admin)
+        return client.post('/auth/login', json={'email': admin['email'], 'password': admin['password']}).json
 
-    return test_client
+    return log_in_
 
 
 @pytest.fixture
-def create_test_app():
+def create_test_app(app):
     """Create the test client with the test config."""
-    create_app_().config.from_object(TestingConfig)
-    return create_app_()
+    return app
 
 
 @pytest.fixture
 def create_development_app():
     """Create the test client with the development config."""
-    create_app_().config.from_object(DevelopmentConfig)
-    return create_app_()
+    development_app = create_app_()
+    development_app.config.from_object(DevelopmentConfig)
+    return development_app
 
 
 @pytest.fixture
 def create_staging_app():
     """Create the test client with the staging config."""
-    create_app_().config.from_object(StagingConfig)
-    return create_app_()
+    staging_app = create_app_()
+    staging_app.config.from_object(StagingConfig)
+    return staging_app
 
 
 @pytest.fixture
 def create_production_app():
     """Create the test client with the production config."""
-    create_app_().config.from_object(ProductionConfig)
-    return create_app_()
+    production_app = create_app_()
+    production_app.config.from_object(ProductionConfig)
+    return production_app
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""This module tests the admin routes."""
+import json
+
+import pytest
+from api.blueprints.auth.helpers import handle_update_admin
+
+
+def register(client, name: str, email: str = None):
+    """Register an admin with the given name."""
+    admin = {'email': email or f'{name}@notreal.com', 'name': name, 'password': 'pass#word'}
+    return client.post('/auth/register', json=admin)
+
+
+def test_register_with_a_taken_email_or_name(client):
+    """Tests that registering an admin reports which unique column is taken.
+
+    GIVEN an admin
+    WHEN we register admins with the same email, and with the same name
+    THEN we should get a 400 response naming the email, then the name
+    """
+    resp = register(client, 'taken')
+    assert resp.status_code == 201
+    assert set(resp.json) == {'id', 'email', 'name'}
+
+    resp = register(client, 'other', email='taken@notreal.com')
+    assert resp.status_code == 400
+    assert resp.json == {'error': 'The email adress taken@notreal.com is already in use.'}
+
+    resp = register(client, 'taken', email='other@notreal.com')
+    assert resp.status_code == 400
+    assert resp.json == {'error': 'The name taken is already in use.'}
+
+
+def test_update_admin_to_a_taken_name(client, log_in):
+    """Tests that updating an admin to a name in use is refused and leaves the session usable.
+
+    GIVEN two admins
+    WHEN the second one changes their name to the first one's
+    THEN we should get a 400 response naming the name, and the next update should work
+    """
+    register(client, 'firstadmin')
+    headers = {'Authorization': f'Bearer {log_in("secondadmin")["access token"]}'}
+
+    resp = client.put('/auth/me', json={'name': 'firstadmin'}, headers=headers)
+    assert resp.status_code == 400
+    assert resp.json == {'error': 'The name firstadmin is already in use.'}
+
+    resp = client.put('/auth/me', json={'name': 'renamed'}, headers=headers)
+    assert resp.status_code == 200
+    assert resp.json['name'] == 'renamed'
+
+
+def test_update_missing_admin_gets_404(app, client):  # pylint: disable=W0613
+    """Tests that updating an admin that does not exist gets a 404 response.
+
+    GIVEN no admins
+    WHEN we update the admin with id 1
+    THEN we should get a 404 response
+    """
+    with app.test_request_context():
+        _, status = handle_update_admin(1, {'name': 'nobody'})
+    assert status == 404
+
+
+def test_admins_fields_projection(client):
+    """Tests that only the requested fields, and always the id, are returned.
+
+    GIVEN two admins
+    WHEN we list them with no fields, with the name, and with the email and name
+    THEN every admin should have all the public fields, then the id and name, then all of them
+    """
+    register(client, 'projected')
+    register(client, 'another')
+
+    admins = client.get('/auth/admins').json['admins']
+    assert [set(admin) for admin in admins] == [{'id', 'email', 'name'}] * 2
+
+    admins = client.get('/auth/admins?fields=name').json['admins']
+    assert admins == [{'id': admins[0]['id'], 'name': 'projected'}, {'id': admins[1]['id'], 'name': 'another'}]
+
+    admins = client.get('/auth/admins?fields=email, name').json['admins']
+    assert [set(admin) for admin in admins] == [{'id', 'email', 'name'}] * 2
+
+
+@pytest.mark.parametrize('fields', ['password', 'name,password', 'name,unknown', 'id;name'])
+def test_admins_unknown_fields_are_refused(client, fields):
+    """Tests that fields outside the projection, the password above all, are refused.
+
+    GIVEN an admin
+    WHEN we list the admins with the password or an unknown field
+    THEN we should get a 400 response
+    """
+    register(client, 'refused')
+
+    resp = client.get(f'/auth/admins?fields={fields}')
+    assert resp.status_code == 400
+    assert 'admins' not in resp.json
+
+
+def test_admins_never_return_the_password(client):
+    """Tests that the password hash is never returned by the admin routes.
+
+    GIVEN an admin
+    WHEN we list the admins in pages and as a stream
+    THEN no response should contain the password or its hash
+    """
+    register(client, 'secret')
+
+    for path in ('/auth/admins', '/auth/admins?fields=id,email,name', '/auth/admins?stream=true'):
+        body = client.get(path).get_data(as_text=True)
+        assert 'password' not in body
+        assert '$scrypt$' not in body
+        assert 'pass#word' not in body
+
+    streamed = [json.loads(line) for line in client.get('/auth/admins?stream=true').get_data(as_text=True).splitlines()]
+    assert [set(admin) for admin in streamed] == [{'id', 'email', 'name'}]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""This module tests the Swagger docs."""
+import os
+import subprocess
+import sys
+
+import api
+
+
+def test_apispec_is_served_with_an_etag(client):
+    """Tests that the spec is served with an ETag and that a matching request gets a 304.
+
+    GIVEN a flask app with the docs enabled
+    WHEN the '/apispec.json' route is requested twice, the second time with the ETag
+    THEN the first response should have the spec and the second should be Not Modified
+    """
+    resp = client.get('/apispec.json')
+    assert resp.status_code == 200
+    assert '/users' in resp.json['paths']
+    assert resp.headers['ETag']
+
+    resp = client.get('/apispec.json', headers={'If-None-Match': resp.headers['ETag']})
+    assert resp.status_code == 304
+    assert not resp.data
+
+
+def test_flasgger_is_not_imported_when_the_docs_are_disabled():
+    """Tests that disabling the docs keeps flasgger off the import path.
+
+    GIVEN API_DOCS_ENABLED set to false
+    WHEN we create the app in a fresh interpreter
+    THEN flasgger should not be imported
+    """
+    code = 'import sys; from api import create_app; create_app(); print("flasgger" in sys.modules)'
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(api.__file__)),
+                            env={**os.environ, 'API_DOCS_ENABLED': 'false'})
+    assert result.stdout.strip().splitlines()[-1] == 'False'
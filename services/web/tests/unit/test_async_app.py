@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""This module tests the async app that serves the read routes."""
+import asyncio
+
+from api.async_app import create_async_app, create_async_engine_options
+from api.blueprints.pool import InstrumentedQueuePool
+from sqlalchemy.pool import NullPool
+
+
+def get(path: str, token: str = None) -> tuple:
+    """Send a GET request to a fresh async app, getting the status code and the JSON body."""
+    async def send():
+        app = create_async_app()
+        async with app.test_app() as test_app:
+            headers = {'Authorization': f'Bearer {token}'} if token else {}
+            resp = await test_app.test_client().get(path, headers=headers)
+            return resp.status_code, await resp.get_json()
+
+    return asyncio.run(send())
+
+
+def test_async_engine_options():
+    """Tests that the async engine keeps only a NullPool, without asyncpg's statement caches.
+
+    GIVEN the engine options of the external and the internal pool modes
+    WHEN we get the async engine options
+    THEN the external mode should keep the NullPool and turn the caches off, and the internal one drop its pool class
+    """
+    assert create_async_engine_options({'poolclass': NullPool, 'pool_pre_ping': True}) == {
+        'poolclass': NullPool,
+        'pool_pre_ping': True,
+        'connect_args': {'statement_cache_size': 0, 'prepared_statement_cache_size': 0},
+    }
+    assert create_async_engine_options({'poolclass': InstrumentedQueuePool, 'pool_size': 3}) == {'pool_size': 3}
+
+
+def test_async_user_requires_a_token(client):  # pylint: disable=W0613
+    """Tests that the user route refuses requests without a valid token.
+
+    GIVEN the async app
+    WHEN we get a user without a token or with an invalid one
+    THEN we should get a 401 response
+    """
+    status, body = get('/user?id=1')
+    assert status == 401
+    assert body == {'msg': 'Missing Authorization Header'}
+
+    assert get('/user?id=1', token='not.a.token')[0] == 401
+
+
+def test_async_user_refuses_refresh_tokens(log_in):
+    """Tests that only access tokens are accepted.
+
+    GIVEN an admin who logged in
+    WHEN we get a user with the refresh token
+    THEN we should get a 401 response
+    """
+    tokens = log_in('asyncrefresh')
+
+    status, body = get('/user?id=1', token=tokens['refresh token'])
+    assert status == 401
+    assert body == {'msg': 'Only access tokens are allowed'}
+
+
+def test_async_get_user(client, log_in):
+    """Tests that a user created through the Flask app is read by the async app.
+
+    GIVEN an admin who created a user
+    WHEN we get the user and a missing user from the async app
+    THEN we should get the user, and a 404 response for the missing one
+    """
+    token = log_in('asyncuser')['access token']
+    user = client.post('/user', json={'email': 'async@notreal.com'},
+                       headers={'Authorization': f'Bearer {token}'}).json
+
+    assert get(f'/user?id={user["id"]}', token=token) == (200, user)
+    assert get(f'/user?id={user["id"] + 1}', token=token)[0] == 404
+    assert get('/user?id=abc', token=token)[0] == 400
+
+
+def test_async_get_users(client, log_in):
+    """Tests that the async app pages through the users.
+
+    GIVEN three users
+    WHEN we get them two at a time
+    THEN we should get two pages, and a 400 response for an invalid cursor
+    """
+    token = log_in('asyncusers')['access token']
+    for name in ('one', 'two', 'three'):
+        client.post('/user', json={'email': f'{name}@notreal.com'}, headers={'Authorization': f'Bearer {token}'})
+
+    status, first = get('/users?limit=2')
+    assert status == 200
+    assert [user['email'] for user in first['users']] == ['one@notreal.com', 'two@notreal.com']
+
+    status, second = get(f'/users?limit=2&after={first["next_cursor"]}')
+    assert status == 200
+    assert [user['email'] for user in second['users']] == ['three@notreal.com']
+    assert second['next_cursor'] is None
+
+    assert get('/users?after=invalid')[0] == 400
+
+
+def test_async_app_refuses_revoked_tokens(client, log_in):
+    """Tests that a token revoked through the Flask app is refused by the async app.
+
+    GIVEN an admin who logged in and created a user
+    WHEN the admin logs out
+    THEN the async app should refuse the access token with a 401 response
+    """
+    token = log_in('asynclogout')['access token']
+    headers = {'Authorization': f'Bearer {token}'}
+    user = client.post('/user', json={'email': 'revoked@notreal.com'}, headers=headers).json
+    assert get(f'/user?id={user["id"]}', token=token)[0] == 200
+
+    assert client.post('/auth/logout', headers=headers).status_code == 200
+    assert client.get(f'/user?id={user["id"]}', headers=headers).status_code == 401
+
+    status, body = get(f'/user?id={user["id"]}', token=token)
+    assert status == 401
+    assert body == {'msg': 'Token has been revoked'}
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""This module tests the caches used by the blueprints."""
+import time
+
+import fakeredis
+from api.blueprints.cache import Cache, LRUCache, RedisCache
+from flask import Flask
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Tests that the least recently used entry is evicted when the cache is full.
+
+    GIVEN a cache with room for two entries
+    WHEN we read the first entry and then add a third
+    THEN the second entry should be evicted
+    """
+    cache = LRUCache(max_size=2, ttl=60)
+    cache.set(1, 'one')
+    cache.set(2, 'two')
+    assert cache.get(1) == 'one'
+    cache.set(3, 'three')
+    assert cache.get(2) is None
+    assert cache.get(1) == 'one'
+    assert cache.get(3) == 'three'
+
+
+def test_lru_cache_expires_entries():
+    """Tests that an entry is not served after its ttl.
+
+    GIVEN a cache with a very short ttl
+    WHEN we read an entry after the ttl has passed
+    THEN we should get a miss
+    """
+    cache = LRUCache(max_size=2, ttl=0.01)
+    cache.set(1, 'one')
+    time.sleep(0.02)
+    assert cache.get(1) is None
+    assert cache.stats() == {'size': 0, 'hits': 0, 'misses': 1}
+
+
+def test_redis_cache_round_trip():
+    """Tests that the redis backend stores values as JSON under its namespace.
+
+    GIVEN a redis cache backed by a fake Redis server
+    WHEN we set, get and delete an entry
+    THEN the hit and miss counters should reflect the lookups
+    """
+    client = fakeredis.FakeRedis()
+    cache = RedisCache(client, 'user', ttl=60)
+    cache.set(1, {'id': 1, 'email': 'lyle@notreal.com'})
+    assert client.exists('user:1')
+    assert cache.get(1) == {'id': 1, 'email': 'lyle@notreal.com'}
+    cache.delete(1)
+    assert cache.get(1) is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'errors': 0}
+
+
+def test_redis_cache_unreachable_server_is_a_miss():
+    """Tests that the redis backend treats an unreachable server as a miss.
+
+    GIVEN a redis cache whose server is down
+    WHEN we set and get an entry
+    THEN we should get a miss and the errors should be counted
+    """
+    server = fakeredis.FakeServer()
+    server.connected = False
+    cache = RedisCache(fakeredis.FakeRedis(server=server), 'user', ttl=60)
+    cache.set(1, {'id': 1})
+    assert cache.get(1) is None
+    assert cache.stats() == {'hits': 0, 'misses': 1, 'errors': 2}
+
+
+def test_memory_cache_expires_within_the_local_ttl():
+    """Tests that the in-process cache keeps entries for CACHE_LOCAL_TTL seconds at most.
+
+    GIVEN two workers' memory caches, where one sees a delete the other does not
+    WHEN the local ttl is shorter than CACHE_TTL
+    THEN the other worker's stale entry should expire after the local ttl
+    """
+    app = Flask(__name__)
+    app.config.update(CACHE_BACKEND='memory', CACHE_TTL=300, CACHE_LOCAL_TTL=0.05)
+    first, second = Cache('user', app), Cache('user', app)
+    for cache in (first, second):
+        cache.set(1, {'id': 1, 'email': 'old@notreal.com'})
+
+    first.delete(1)
+    assert first.get(1) is None
+    assert second.get(1) == {'id': 1, 'email': 'old@notreal.com'}
+    time.sleep(0.06)
+    assert second.get(1) is None
+
+    app.config.update(CACHE_BACKEND='redis', CACHE_REDIS_URL='redis://localhost:6379/0')
+    assert Cache('user', app).backend.ttl == 300
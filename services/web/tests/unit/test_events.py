@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""This module tests the structured logging facade."""
+import logging
+
+import pytest
+from api.blueprints.events import EventLogger, parse_sample_rates
+
+
+class RecordingHandler(logging.Handler):
+    """A handler that keeps every record it handles."""
+
+    def __init__(self):
+        """Create the handler."""
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        """Keep the record."""
+        self.records.append(record)
+
+
+class Payload():
+    """A log argument that counts how many times it was formatted."""
+
+    def __init__(self):
+        """Create the payload."""
+        self.formatted = 0
+
+    def __str__(self):
+        """Count the formatting."""
+        self.formatted += 1
+        return 'payload'
+
+
+def make_events(level=logging.INFO):
+    """Create an event logger over a logger with a recording handler."""
+    logger = logging.Logger('test_events', level)
+    handler = RecordingHandler()
+    logger.addHandler(handler)
+    return EventLogger(logger), handler
+
+
+def test_parse_sample_rates():
+    """Tests that the sample rates are parsed from event=rate pairs.
+
+    GIVEN a comma separated list of sample rates
+    WHEN we parse it
+    THEN we should get the rate of every event
+    """
+    assert parse_sample_rates('user.get=0.01, users.list=0.1,') == {'user.get': 0.01, 'users.list': 0.1}
+    assert parse_sample_rates('') == {}
+    with pytest.raises(ValueError):
+        parse_sample_rates('user.get=often')
+
+
+def test_event_fields_are_added_to_the_record():
+    """Tests that the event name and fields are added to the record instead of the message.
+
+    GIVEN an event logger
+    WHEN we log an event with fields
+    THEN the record should carry the event name and the fields
+    """
+    events, handler = make_events()
+    events.info('user.get', 'The admin %s retrieved a user.', 'Lyle', user_id=1)
+    record = handler.records[0]
+    assert record.getMessage() == 'The admin Lyle retrieved a user.'
+    assert record.event == 'user.get'
+    assert record.user_id == 1
+
+
+def test_disabled_events_are_not_formatted():
+    """Tests that nothing is formatted for events below the logger level.
+
+    GIVEN an event logger at the WARNING level
+    WHEN we log an INFO event
+    THEN its arguments should not be formatted
+    """
+    events, handler = make_events(logging.WARNING)
+    payload = Payload()
+    events.info('user.update', 'Updated with %s.', payload)
+    assert not handler.records
+    assert payload.formatted == 0
+
+
+def test_sampling_never_drops_warnings():
+    """Tests that sampled out events are counted and that warnings are always logged.
+
+    GIVEN an event logger that samples user.get at a rate of zero
+    WHEN we log user.get events at the INFO and WARNING levels
+    THEN only the warning should be logged
+    """
+    events, handler = make_events()
+    events.sample_rates = {'user.get': 0.0}
+    for _ in range(10):
+        events.info('user.get', 'Retrieved a user.')
+    events.rejected('user.get', ValueError('The user id was not provided.'))
+    assert [record.levelno for record in handler.records] == [logging.WARNING]
+    assert handler.records[0].error_type == 'ValueError'
+    assert events.stats() == {'logged': 1, 'sampled_out': 10}
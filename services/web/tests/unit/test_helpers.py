@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""This module tests the helpers of the api package."""
+from api import db
+from api.blueprints.auth.models import Token
+from api.helpers import create_db_tables, profile_imports
+from sqlalchemy import inspect
+
+
+def test_profile_imports():
+    """Tests that the import times of a module are reported slowest first.
+
+    GIVEN a module that imports other modules
+    WHEN we profile its import
+    THEN the module itself should be the slowest entry, at the top of the tree
+    """
+    imports = profile_imports('json')
+    assert imports[0]['module'] == 'json'
+    assert imports[0]['depth'] == 0
+    assert all(entry['cumulative_ms'] >= entry['self_ms'] for entry in imports)
+    assert 'json.decoder' in {entry['module'] for entry in imports}
+
+
+def test_create_db_tables_only_creates_missing_tables(app, client, monkeypatch):  # pylint: disable=W0613
+    """Tests that the tables are only created when one of them is missing.
+
+    GIVEN a database with every table, then one without the tokens table
+    WHEN we create the database tables
+    THEN create_all should only run the second time, and create the tokens table
+    """
+    create_all = db.create_all
+    calls = []
+    monkeypatch.setattr(db, 'create_all', lambda: calls.append(create_all()))
+
+    create_db_tables(app, db)
+    assert not calls
+
+    with app.app_context():
+        Token.__table__.drop(db.engine)
+    create_db_tables(app, db)
+    assert len(calls) == 1
+    with app.app_context():
+        assert inspect(db.engine).has_table(Token.__tablename__)
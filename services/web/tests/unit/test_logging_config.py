@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""This module tests the custom log handlers."""
+import logging
+import threading
+import time
+
+from api.config.logging_config import CustomEmailLogger, KinesisFirehoseDeliveryStreamHandler
+from api.config.spool import DiskSpool
+
+
+class StubFirehoseClient():
+    """A stand in for the boto3 firehose client that records every batch."""
+
+    def __init__(self, rejections=None):
+        """Create the client that rejects the given records on the first attempt."""
+        self.batches = []
+        self.rejections = set(rejections or [])
+
+    def put_record_batch(self, DeliveryStreamName, Records):  # pylint: disable=C0103
+        """Record the batch and report the rejected records as failed."""
+        self.batches.append([record['Data'] for record in Records])
+        results = []
+        for record in Records:
+            if record['Data'] in self.rejections:
+                self.rejections.discard(record['Data'])
+                results.append({'ErrorCode': 'ServiceUnavailableException'})
+            else:
+                results.append({'RecordId': '1'})
+        failed = sum(1 for result in results if 'ErrorCode' in result)
+        return {'FailedPutCount': failed, 'RequestResponses': results}
+
+
+def make_record(msg):
+    """Create a log record with the given message."""
+    return logging.LogRecord('test', logging.INFO, __file__, 1, msg, None, None)
+
+
+def test_firehose_handler_batches_records():
+    """Tests that queued records are sent in batches of at most 500.
+
+    GIVEN a firehose handler with a stub client
+    WHEN we emit 1200 records and flush
+    THEN they should be sent in order, in batches of at most 500, without any loss
+    """
+    client = StubFirehoseClient()
+    handler = KinesisFirehoseDeliveryStreamHandler(client=client, delivery_stream_name='test', flush_interval=5)
+    for i in range(1200):
+        handler.emit(make_record(f'message {i}'))
+    handler.flush()
+    handler.close()
+
+    assert max(len(batch) for batch in client.batches) <= 500
+    assert [data for batch in client.batches for data in batch] == [f'message {i}'.encode() for i in range(1200)]
+    assert handler.stats()['sent'] == 1200
+
+
+def test_firehose_handler_retries_failed_records():
+    """Tests that only the records reported in FailedPutCount are sent again.
+
+    GIVEN a stub client that rejects one record once
+    WHEN we emit three records and flush
+    THEN only the rejected record should be sent again
+    """
+    client = StubFirehoseClient(rejections=[b'message 1'])
+    handler = KinesisFirehoseDeliveryStreamHandler(client=client, delivery_stream_name='test', retry_backoff=0)
+    for i in range(3):
+        handler.emit(make_record(f'message {i}'))
+    handler.flush()
+    handler.close()
+
+    assert [data for batch in client.batches for data in batch].count(b'message 1') == 2
+    assert [data for batch in client.batches for data in batch].count(b'message 0') == 1
+    assert handler.stats()['sent'] == 3
+    assert handler.stats()['failed'] == 0
+    assert handler.stats()['retried'] == 1
+
+
+def test_firehose_handler_drops_when_full():
+    """Tests that records are dropped and counted when the queue is full.
+
+    GIVEN a firehose handler with room for two queued records
+    WHEN we emit records faster than the client accepts them
+    THEN the extra records should be counted as dropped
+    """
+    client = StubFirehoseClient()
+    handler = KinesisFirehoseDeliveryStreamHandler(client=client, delivery_stream_name='test', queue_size=2,
+                                                   flush_interval=5)
+    for i in range(600):
+        handler.emit(make_record(f'message {i}'))
+    handler.close()
+
+    stats = handler.stats()
+    assert stats['dropped'] > 0
+    assert stats['sent'] + stats['dropped'] == 600
+
+
+class UnreachableFirehoseClient(StubFirehoseClient):
+    """A stub client that raises while the API is down."""
+
+    def __init__(self):
+        """Create the client with the API down."""
+        super().__init__()
+        self.down = True
+
+    def put_record_batch(self, DeliveryStreamName, Records):  # pylint: disable=C0103
+        """Fail while the API is down, otherwise record the batch."""
+        if self.down:
+            raise ConnectionError('Could not connect to the endpoint URL')
+        return super().put_record_batch(DeliveryStreamName, Records)
+
+
+def test_disk_spool_round_trip(tmp_path):
+    """Tests that the spool returns records oldest first until they are acknowledged.
+
+    GIVEN a spool with small segments
+    WHEN we append records, acknowledge part of a segment and reopen the spool
+    THEN only the unacknowledged records should be returned
+    """
+    spool = DiskSpool(str(tmp_path), segment_bytes=16)
+    spool.append([b'first', b'second'])
+    spool.append([b'third'])
+    name, records = spool.oldest()
+    assert records == [b'first', b'second']
+    spool.acknowledge(name, 1)
+    assert spool.oldest() == (name, [b'second'])
+    spool.acknowledge(name, 1)
+    spool.close()
+
+    spool = DiskSpool(str(tmp_path), segment_bytes=16)
+    assert spool.oldest()[1] == [b'third']
+    assert spool.pending() == 1
+
+
+def test_disk_spool_drops_oldest_segment_when_full(tmp_path):
+    """Tests that the spool discards its oldest segment once it reaches max_bytes.
+
+    GIVEN a spool with room for about two segments
+    WHEN we append more records than that
+    THEN the oldest records should be dropped and counted
+    """
+    spool = DiskSpool(str(tmp_path), segment_bytes=10, max_bytes=20)
+    for i in range(4):
+        spool.append([f'record {i}'.encode()])
+    assert spool.dropped == 2
+    assert spool.oldest()[1] == [b'record 2']
+
+
+def test_disk_spool_append_waits_for_the_oldest_segment_to_be_read(tmp_path):
+    """Tests that an append over max_bytes does not discard the segment being read.
+
+    GIVEN a full spool whose oldest segment is being read
+    WHEN a record is appended that makes the spool discard that segment
+    THEN the read should get the segment's records, and the segment be dropped after it
+    """
+    spool = DiskSpool(str(tmp_path), segment_bytes=10, max_bytes=20)
+    spool.append([b'record 0'])
+    spool.append([b'record 1'])
+    read = spool._read  # pylint: disable=W0212
+    appender = threading.Thread(target=spool.append, args=([b'record 2'],))
+
+    def read_while_appending(name):
+        if not appender.is_alive() and not spool.dropped:
+            appender.start()
+            appender.join(timeout=0.2)
+        return read(name)
+
+    spool._read = read_while_appending  # pylint: disable=W0212
+    name, records = spool.oldest()
+    appender.join()
+
+    assert records == [b'record 0']
+    assert spool.dropped == 1
+    spool.acknowledge(name, 1)
+    assert spool.oldest()[1] == [b'record 1']
+
+
+def test_firehose_handler_spools_while_unreachable(tmp_path):
+    """Tests that records are spooled during an outage and replayed after it.
+
+    GIVEN a firehose handler with a spool and an unreachable API
+    WHEN we emit records and the API recovers
+    THEN every record should be delivered in order from the spool
+    """
+    client = UnreachableFirehoseClient()
+    handler = KinesisFirehoseDeliveryStreamHandler(client=client, delivery_stream_name='test', max_retries=0,
+                                                   spool_dir=str(tmp_path), drain_interval=0.05)
+    for i in range(10):
+        handler.emit(make_record(f'message {i}'))
+    handler.flush()
+    assert handler.stats()['spilled'] == 10
+    assert handler.stats()['sent'] == 0
+
+    client.down = False
+    deadline = time.monotonic() + 5
+    while handler.stats()['spool_segments'] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    handler.close()
+
+    assert [data for batch in client.batches for data in batch] == [f'message {i}'.encode() for i in range(10)]
+    assert handler.stats()['sent'] == 10
+    assert handler.stats()['failed'] == 0
+
+
+class StubSMTP():
+    """A stand in for SMTP_SSL that records every connection and email."""
+
+    connections = []
+
+    def __init__(self, host, port):
+        """Open the connection."""
+        self.host = host
+        self.port = port
+        self.logins = 0
+        self.emails = []
+        StubSMTP.connections.append(self)
+
+    def login(self, username, password):
+        """Log in to the server."""
+        self.logins += 1
+
+    def sendmail(self, fromaddr, toaddrs, msg):
+        """Record the email."""
+        self.emails.append(msg)
+
+    def quit(self):
+        """Close the connection."""
+
+
+def make_email_logger(monkeypatch, **kwargs):
+    """Create an email logger that sends through StubSMTP."""
+    monkeypatch.setenv('MAIL_HOST', 'localhost')
+    monkeypatch.setenv('MAIL_USERNAME', 'lyle')
+    monkeypatch.setenv('MAIL_PASSWORD', 'password')
+    StubSMTP.connections = []
+    return CustomEmailLogger(smtp_factory=StubSMTP, **kwargs)
+
+
+def test_email_logger_ignores_records_below_critical(monkeypatch):
+    """Tests that only CRITICAL records reach the email logger.
+
+    GIVEN a logger with the email handler
+    WHEN we log an error and a critical message
+    THEN only the critical message should be emailed
+    """
+    handler = make_email_logger(monkeypatch)
+    logger = logging.getLogger('test_email_logger')
+    logger.addHandler(handler)
+    logger.error('Something failed.')
+    logger.critical('Everything failed.')
+    logger.removeHandler(handler)
+    handler.close()
+
+    emails = [email for connection in StubSMTP.connections for email in connection.emails]
+    assert len(emails) == 1
+    assert 'Everything failed.' in emails[0]
+
+
+def test_email_logger_coalesces_repeated_alerts(monkeypatch):
+    """Tests that repeated alerts are sent as one digest over one connection.
+
+    GIVEN an email handler with a short coalescing window
+    WHEN we emit the same critical message 50 times
+    THEN one alert and one digest should be sent over a single connection
+    """
+    handler = make_email_logger(monkeypatch, coalesce_window=0.2)
+    record = logging.LogRecord('test', logging.CRITICAL, __file__, 1, 'The database is down.', None, None)
+    for _ in range(50):
+        handler.emit(record)
+    handler.flush()
+    time.sleep(0.3)
+    handler.close()
+
+    assert len(StubSMTP.connections) == 1
+    assert StubSMTP.connections[0].logins == 1
+    emails = StubSMTP.connections[0].emails
+    assert len(emails) == 2
+    assert 'repeated 49 times' in emails[1]
+    assert handler.stats()['coalesced'] == 49
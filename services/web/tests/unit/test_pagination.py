@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""This module tests the keyset pagination helpers and the /users route."""
+import pytest
+from api.blueprints.exceptions import InvalidCursor, InvalidPageLimit
+from api.blueprints.pagination import decode_cursor, encode_cursor, parse_page_limit
+
+
+def test_cursor_round_trip():
+    """Tests that a cursor decodes to the id it was created from.
+
+    GIVEN a row id
+    WHEN we encode it into a cursor and decode the cursor
+    THEN we should get the same id back
+    """
+    assert decode_cursor(encode_cursor(42)) == 42
+
+
+@pytest.mark.parametrize('cursor', ['zzz', 'e30', '', None])
+def test_invalid_cursor(cursor):
+    """Tests that a cursor that was not created by encode_cursor is rejected.
+
+    GIVEN a malformed cursor
+    WHEN we decode it
+    THEN InvalidCursor should be raised
+    """
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize('limit', ['0', '-1', 'ten', '100000'])
+def test_invalid_page_limit(limit):
+    """Tests that a limit outside the allowed range is rejected.
+
+    GIVEN an invalid limit query parameter
+    WHEN we parse it
+    THEN InvalidPageLimit should be raised
+    """
+    with pytest.raises(InvalidPageLimit):
+        parse_page_limit(limit)
+
+
+def test_users_bad_limit(client):
+    """Tests that the /users route rejects an invalid limit.
+
+    GIVEN we have the /users route
+    WHEN we send a GET request with limit=0
+    THEN we should get a 400 error code in the response
+    """
+    resp = client.get('/users?limit=0')
+    assert resp.status_code == 400
+
+
+def test_users_empty_page(client):
+    """Tests that the /users route returns an empty last page for an empty table.
+
+    GIVEN we have the /users route and no users
+    WHEN we send a GET request
+    THEN we should get an empty list of users and no next cursor
+    """
+    resp = client.get('/users')
+    assert resp.status_code == 200
+    assert resp.get_json() == {'users': [], 'next_cursor': None}
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""This module tests the password hashing."""
+import threading
+
+import pytest
+from api import db
+from api.blueprints.auth.models import Admin
+from api.blueprints.exceptions import PasswordHasherBusy
+from api.blueprints.passwords import PasswordHasher, ScryptScheme
+
+ADMIN = {'email': 'lyle@notreal.com', 'name': 'lyle', 'password': 'pass#word'}
+
+
+def test_scrypt_hash_round_trip():
+    """Tests that a hashed password verifies and a wrong one does not.
+
+    GIVEN a hasher that uses scrypt
+    WHEN we hash a password
+    THEN the stored value should carry its parameters and only the same password should verify
+    """
+    hasher = PasswordHasher(scheme=ScryptScheme(log_n=4), workers=1)
+    stored = hasher.hash('pass#word')
+    assert stored.startswith('$scrypt$v=1$ln=4,r=8,p=1$')
+    assert hasher.verify(stored, 'pass#word')
+    assert not hasher.verify(stored, 'pass#wordx')
+    assert not hasher.needs_rehash(stored)
+
+
+def test_verify_and_update_upgrades_old_hashes():
+    """Tests that plaintext passwords and passwords hashed with a lower cost are hashed again.
+
+    GIVEN a plaintext password and one hashed with a lower cost
+    WHEN we verify them with a hasher that uses a higher cost
+    THEN both should verify and come back with a hash that uses the higher cost
+    """
+    old = PasswordHasher(scheme=ScryptScheme(log_n=4), workers=1).hash('pass#word')
+    hasher = PasswordHasher(scheme=ScryptScheme(log_n=5), workers=1)
+
+    for stored in ('pass#word', old):
+        valid, new_hash = hasher.verify_and_update(stored, 'pass#word')
+        assert valid
+        assert new_hash.startswith('$scrypt$v=1$ln=5,')
+        assert hasher.verify_and_update(new_hash, 'pass#word') == (True, None)
+
+    assert hasher.verify_and_update('pass#word', 'password') == (False, None)
+    assert hasher.stats()['rehashed'] == 2
+
+
+def test_hasher_refuses_work_when_full():
+    """Tests that the hasher refuses a password when its queue is full.
+
+    GIVEN a hasher with one worker and no queue that is busy
+    WHEN we hash another password
+    THEN PasswordHasherBusy should be raised
+    """
+    hasher = PasswordHasher(scheme=ScryptScheme(log_n=4), workers=1, queue_size=0)
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    thread = threading.Thread(target=hasher._run, args=(block,))  # pylint: disable=W0212
+    thread.start()
+    started.wait()
+    with pytest.raises(PasswordHasherBusy):
+        hasher.hash('pass#word')
+    release.set()
+    thread.join()
+    assert hasher.stats()['busy'] == 1
+
+
+def test_close_stops_the_hashing_threads():
+    """Tests that closing the hasher stops its threads, and that it starts new ones when used again.
+
+    GIVEN a hasher that hashed a password
+    WHEN we close it
+    THEN its threads should stop, and it should still hash passwords
+    """
+    hasher = PasswordHasher(scheme=ScryptScheme(log_n=4), workers=1)
+    stored = hasher.hash('pass#word')
+    executor = hasher._executor  # pylint: disable=W0212
+
+    hasher.close()
+    assert all(not thread.is_alive() for thread in executor._threads)  # pylint: disable=W0212
+    assert hasher.verify(stored, 'pass#word')
+
+
+def test_login_upgrades_plaintext_password(client, app):
+    """Tests that an admin stored in plaintext by an older release can log in and gets a hash.
+
+    GIVEN an admin whose password is stored in plaintext
+    WHEN the admin logs in
+    THEN the login should succeed and the stored password should be hashed
+    """
+    with app.app_context():
+        db.session.add(Admin(**ADMIN))
+        db.session.commit()
+
+    resp = client.post('/auth/login', json={'email': ADMIN['email'], 'password': ADMIN['password']})
+    assert resp.status_code == 200
+
+    with app.app_context():
+        assert Admin.query.filter_by(email=ADMIN['email']).first().password.startswith('$scrypt$')
+
+    resp = client.post('/auth/login', json={'email': ADMIN['email'], 'password': 'wrong#pass'})
+    assert resp.status_code == 400
+
+
+def test_register_stores_hash(client, app):
+    """Tests that a registered admin's password is stored hashed.
+
+    GIVEN the /auth/register route
+    WHEN we register an admin and log in
+    THEN the password should not be stored in plaintext and the login should succeed
+    """
+    resp = client.post('/auth/register', json=ADMIN)
+    assert resp.status_code == 201
+
+    with app.app_context():
+        assert Admin.query.filter_by(email=ADMIN['email']).first().password != ADMIN['password']
+
+    resp = client.post('/auth/login', json={'email': ADMIN['email'], 'password': ADMIN['password']})
+    assert resp.status_code == 200
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""This module tests the connection pool settings and metrics."""
+import pytest
+from api.blueprints.pool import EnginePoolMetrics, InstrumentedQueuePool
+from api.config.config import create_engine_options
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool
+
+
+@pytest.fixture
+def create_pooled_engine(tmp_path):
+    """Create SQLite engines with an instrumented pool of the given size."""
+    engines = []
+
+    def create(name: str, pool_size: int = 1, max_overflow: int = 0):
+        engine = create_engine(f'sqlite:///{tmp_path / name}.db', poolclass=InstrumentedQueuePool,
+                               pool_size=pool_size, max_overflow=max_overflow, pool_timeout=0.05)
+        engines.append(engine)
+        return engine
+
+    yield create
+    for engine in engines:
+        engine.dispose()
+
+
+def test_internal_pool_options(monkeypatch):
+    """Tests that the internal pool mode sizes an instrumented pool from the DB_POOL_* variables.
+
+    GIVEN DB_POOL_MODE=internal and a pool size, overflow and timeout
+    WHEN we create the engine options
+    THEN they should use an InstrumentedQueuePool with those settings
+    """
+    monkeypatch.setenv('DB_POOL_MODE', 'internal')
+    monkeypatch.setenv('DB_POOL_SIZE', '3')
+    monkeypatch.setenv('DB_POOL_MAX_OVERFLOW', '2')
+    monkeypatch.setenv('DB_POOL_TIMEOUT', '7')
+    monkeypatch.setenv('DB_POOL_PRE_PING', 'false')
+
+    assert create_engine_options() == {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': 3,
+        'max_overflow': 2,
+        'pool_timeout': 7,
+        'pool_recycle': 1800,
+        'pool_pre_ping': False,
+    }
+
+
+def test_external_pool_options(monkeypatch):
+    """Tests that the external pool mode leaves pooling to PgBouncer.
+
+    GIVEN DB_POOL_MODE=external
+    WHEN we create the engine options
+    THEN they should use a NullPool and no pool sizes
+    """
+    monkeypatch.setenv('DB_POOL_MODE', 'external')
+    monkeypatch.delenv('DB_POOL_PRE_PING', raising=False)
+
+    assert create_engine_options() == {'poolclass': NullPool, 'pool_pre_ping': True}
+
+
+def test_pool_metrics_count_waits_and_timeouts(create_pooled_engine):
+    """Tests that a checkout from a full pool is counted as a wait and a timeout.
+
+    GIVEN a pool of one connection and no overflow
+    WHEN one connection is checked out and a second checkout times out
+    THEN the metrics should count two checkouts, one wait and one timeout, and a saturated pool
+    """
+    engine = create_pooled_engine('full')
+    with engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        stats = engine.pool.metrics.stats()
+
+    assert stats['checkouts'] == 2
+    assert stats['waits'] == 1
+    assert stats['timeouts'] == 1
+    assert stats['checked_out'] == 1
+    assert stats['saturation'] == 1.0
+
+
+def test_pool_metrics_report_overflow(create_pooled_engine):
+    """Tests that overflow connections are reported.
+
+    GIVEN a pool of one connection and one overflow connection
+    WHEN two connections are checked out
+    THEN the pool should report one overflow connection and no wait
+    """
+    engine = create_pooled_engine('overflow', max_overflow=1)
+    with engine.connect(), engine.connect():
+        stats = engine.pool.metrics.stats()
+
+    assert stats['overflow'] == 1
+    assert stats['checked_out'] == 2
+    assert stats['waits'] == 0
+
+
+def test_pool_metrics_are_reported_by_bind(create_pooled_engine):
+    """Tests that the primary and a replica are reported apart, also after a dispose.
+
+    GIVEN a primary and a replica engine watched under their binds
+    WHEN connections are checked out of the replica and it is disposed
+    THEN only the replica's counters should grow, and they should survive the dispose
+    """
+    metrics = EnginePoolMetrics()
+    primary, replica = create_pooled_engine('primary'), create_pooled_engine('replica')
+    metrics.watch(primary)
+    metrics.watch(replica, 'replica_0')
+    metrics.watch(create_engine('sqlite://', poolclass=NullPool), 'unpooled')
+
+    for _ in range(3):
+        with replica.connect():
+            pass
+    replica.dispose()
+    with replica.connect():
+        pass
+
+    stats = metrics.stats()
+    assert set(stats) == {'primary', 'replica_0'}
+    assert stats['primary']['checkouts'] == 0
+    assert stats['replica_0']['checkouts'] == 4
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""This module tests the single statement write helpers."""
+import pytest
+from api import db
+from api.blueprints.auth.models import Admin
+from api.blueprints.queries import conflicting_column, insert_returning, update_returning
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+
+class Diagnostics():
+    """The diag attribute of a psycopg2 error."""
+
+    def __init__(self, message_detail: str) -> None:
+        """Keep the detail of the error."""
+        self.message_detail = message_detail
+
+
+class DriverError(Exception):
+    """A driver error with diagnostics, like the ones psycopg2 raises."""
+
+    def __init__(self, message: str, message_detail: str = None) -> None:
+        """Create the error with the given detail."""
+        super().__init__(message)
+        self.diag = Diagnostics(message_detail)
+
+
+def test_conflicting_column_parses_the_detail():
+    """Tests that the column is read from the detail of a unique violation.
+
+    GIVEN integrity errors with a unique violation detail, an unexpected detail and no detail
+    WHEN we get the conflicting column
+    THEN it should be the column of the detail, or None if the detail is unexpected
+    """
+    def error(message, message_detail=None):
+        return IntegrityError('UPDATE admins', {}, DriverError(message, message_detail))
+
+    assert conflicting_column(error('duplicate key', 'Key (name)=(lyle) already exists.')) == 'name'
+    assert conflicting_column(error('duplicate key\nDETAIL:  Key (email)=(a@b.com) already exists.')) == 'email'
+    assert conflicting_column(error('null value in column "email"', 'Failing row contains (1, null).')) is None
+    assert conflicting_column(IntegrityError('INSERT', {}, Exception('check constraint'))) is None
+
+
+def test_conflicting_column_of_a_postgres_error(app, client):  # pylint: disable=W0613
+    """Tests that the column is read from the error Postgres raises.
+
+    GIVEN two admins
+    WHEN we update the second one's name and then its email to the first one's
+    THEN the conflicting columns should be name and email, and the session should still work
+    """
+    with app.app_context():
+        first = insert_returning(Admin, {'email': 'first@notreal.com', 'name': 'first', 'password': 'x'}, (Admin.id,))
+        second = insert_returning(Admin, {'email': 'second@notreal.com', 'name': 'second', 'password': 'x'},
+                                  (Admin.id,))
+        assert insert_returning(Admin, {'email': 'first@notreal.com', 'name': 'third', 'password': 'x'},
+                                (Admin.id,)) is None
+
+        for column, value in (('name', 'first'), ('email', 'first@notreal.com')):
+            with pytest.raises(IntegrityError) as error:
+                update_returning(Admin, second['id'], {column: value}, (Admin.id,))
+            assert conflicting_column(error.value) == column
+
+        assert db.session.execute(select(Admin.name).where(Admin.id == first['id'])).scalar() == 'first'
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""This module tests the login rate limiters."""
+import fakeredis
+from api.blueprints.extensions import login_limiter
+from api.blueprints.ratelimit import MemoryLimiter, RateLimiter, RedisLimiter
+
+
+class Clock():
+    """A clock that only moves when it is told to."""
+
+    def __init__(self, now: float = 1000.0) -> None:
+        """Start the clock at the given time."""
+        self.now = now
+
+    def __call__(self) -> float:
+        """Get the time."""
+        return self.now
+
+
+def test_memory_limiter_slides_the_window():
+    """Tests that attempts from the previous window still count while it overlaps.
+
+    GIVEN a limit of 2 attempts per 10 seconds
+    WHEN we make 3 attempts, then 2 more halfway through the next window
+    THEN the third attempt should be refused and only one of the later two allowed
+    """
+    clock = Clock(1000.0)
+    limiter = MemoryLimiter(clock=clock)
+    assert limiter.allow('ip', '10.0.0.1', 2, 10)
+    assert limiter.allow('ip', '10.0.0.1', 2, 10)
+    assert not limiter.allow('ip', '10.0.0.1', 2, 10)
+    assert limiter.allow('ip', '10.0.0.2', 2, 10)
+
+    clock.now = 1015.0
+    assert limiter.allow('ip', '10.0.0.1', 2, 10)
+    assert not limiter.allow('ip', '10.0.0.1', 2, 10)
+
+
+def test_redis_limiter_shares_counters():
+    """Tests that two limiters on the same Redis share their counters.
+
+    GIVEN two redis limiters, as in two workers, with a limit of 2 attempts
+    WHEN each makes an attempt and the first tries again
+    THEN the third attempt should be refused
+    """
+    client = fakeredis.FakeRedis()
+    clock = Clock()
+    first = RedisLimiter(client, 'ratelimit:login', clock=clock)
+    second = RedisLimiter(client, 'ratelimit:login', clock=clock)
+    assert first.allow('email', 'lyle@notreal.com', 2, 10)
+    assert second.allow('email', 'lyle@notreal.com', 2, 10)
+    assert not first.allow('email', 'lyle@notreal.com', 2, 10)
+
+
+def test_rate_limiter_reports_the_rule():
+    """Tests that a refused attempt reports its rule and does not count against the next.
+
+    GIVEN a limiter of 1 attempt per ip and 5 per email
+    WHEN the same ip tries twice
+    THEN the second attempt should be refused by the ip rule and counted
+    """
+    limiter = RateLimiter('login', {'ip': '1/60', 'email': '5/300'})
+    assert limiter.check(ip='10.0.0.1', email='lyle@notreal.com') is None
+    assert limiter.check(ip='10.0.0.1', email='lyle@notreal.com') == ('ip', 60)
+    assert limiter.stats() == {'allowed': 1, 'limited': {'ip': 1, 'email': 0}}
+
+
+def test_login_is_throttled_before_the_database(client, monkeypatch):
+    """Tests that the login route answers 429 once the email has made too many attempts.
+
+    GIVEN a fresh login limiter
+    WHEN we make more login attempts for an email than its limit allows
+    THEN the extra attempt should get a 429 without querying the database
+    """
+    login_limiter.backend = MemoryLimiter()
+    limit, _ = login_limiter.limits['email']
+    payload = {'email': 'throttled@notreal.com', 'password': 'pass#word'}
+    for _ in range(limit):
+        assert client.post('/auth/login', json=payload).status_code == 400
+
+    def log_in_admin(admin_data):
+        raise AssertionError('The throttled attempt reached log_in_admin.')
+
+    monkeypatch.setattr('api.blueprints.auth.helpers.log_in_admin', log_in_admin)
+    resp = client.post('/auth/login', json=payload)
+    assert resp.status_code == 429
+    assert resp.headers['Retry-After'] == '300'
+    login_limiter.backend = MemoryLimiter()
+
+
+def test_deployed_configs_trust_the_load_balancer():
+    """Tests that the apps behind the ALB take the client address from X-Forwarded-For.
+
+    GIVEN the staging and production configs
+    WHEN PROXY_COUNT is not set
+    THEN they should trust the one proxy in front of them
+    """
+    from api.config.config import ProductionConfig, StagingConfig  # pylint: disable=C0415
+
+    assert ProductionConfig.PROXY_COUNT == 1
+    assert StagingConfig.PROXY_COUNT == 1
+
+
+def test_failure_rules_only_count_failed_attempts():
+    """Tests that a failure rule only counts the attempts reported as failed.
+
+    GIVEN limiters on memory and on redis with a failure rule of 2 attempts per email
+    WHEN we check 3 attempts, then report 2 failures
+    THEN the checks should not be counted, and the attempt after the failures should be refused
+    """
+    for backend in (MemoryLimiter(), RedisLimiter(fakeredis.FakeRedis(), 'ratelimit:login')):
+        limiter = RateLimiter('login', {'email': '2/300'}, failure_rules=('email',))
+        limiter.backend = backend
+        for _ in range(3):
+            assert limiter.check(email='lyle@notreal.com') is None
+
+        limiter.fail(email='lyle@notreal.com')
+        limiter.fail(email='lyle@notreal.com')
+        assert limiter.check(email='lyle@notreal.com') == ('email', 300)
+
+
+def test_successful_logins_do_not_lock_the_admin_out(log_in):
+    """Tests that successful logins do not count against the email limit.
+
+    GIVEN an admin
+    WHEN they log in more times than the email limit allows failed attempts
+    THEN every login should succeed
+    """
+    limit, _ = login_limiter.limits['email']
+    log_in('often')
+    for _ in range(limit):
+        assert 'access token' in log_in('often')
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""This module tests the routing of the read-only helpers to the replicas."""
+import math
+
+import pytest
+from api import db
+from api.blueprints.default.models import User
+from api.blueprints.replicas import ReplicaRouter, RoutingSQLAlchemy, replica_binds
+from flask import Flask
+from sqlalchemy import column, create_engine, insert, select, table, text
+
+markers = table('markers', column('name'))
+
+
+@pytest.fixture
+def replicated(tmp_path):
+    """Create an app whose primary and replica are SQLite files that hold different markers."""
+    uris = {name: f'sqlite:///{tmp_path / name}.db' for name in ('primary', 'replica')}
+    for name, uri in uris.items():
+        with create_engine(uri).begin() as conn:
+            conn.execute(text('CREATE TABLE markers (name TEXT)'))
+            conn.execute(insert(markers).values(name=name))
+
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=uris['primary'],
+        SQLALCHEMY_BINDS=replica_binds(uris['replica']),
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        REPLICA_STICKY_SECONDS=60,
+    )
+    db = RoutingSQLAlchemy(app)
+    db.sticky_keys = lambda: ('client',)
+
+    @db.replica_reads
+    def read_marker():
+        return db.session.execute(select(markers.c.name)).scalar()
+
+    with app.app_context():
+        yield db, read_marker
+
+
+def test_replica_binds_are_named_in_order():
+    """Tests that the replica URIs become numbered binds.
+
+    GIVEN a comma separated list of two URIs
+    WHEN we get their binds
+    THEN they should be named replica_0 and replica_1
+    """
+    assert replica_binds('sqlite://, sqlite:///b.db,') == {'replica_0': 'sqlite://', 'replica_1': 'sqlite:///b.db'}
+    assert not replica_binds('')
+
+
+def test_read_only_helpers_read_from_the_replica(replicated):
+    """Tests that only the decorated helpers read from the replica.
+
+    GIVEN a primary and a replica
+    WHEN a decorated helper and an undecorated query read the markers
+    THEN the helper should read the replica's and the query the primary's
+    """
+    db, read_marker = replicated
+
+    assert read_marker() == 'replica'
+    assert db.session.execute(select(markers.c.name)).scalar() == 'primary'
+    assert db.router.stats()['replica_reads'] == 1
+    assert db.cache_ttl() == db.router.max_lag
+
+
+def test_writes_make_the_client_read_from_the_primary(replicated):
+    """Tests that a client reads its own writes.
+
+    GIVEN a primary and a replica
+    WHEN the client writes and commits
+    THEN the rest of the session, and the next sessions of the client, should read from the primary
+    """
+    db, read_marker = replicated
+
+    db.session.execute(insert(markers).values(name='written'))
+    assert read_marker() == 'primary'
+    db.session.commit()
+    db.session.remove()
+
+    assert read_marker() == 'primary'
+    db.session.remove()
+
+    db.sticky_keys = lambda: ('other client',)
+    assert read_marker() == 'replica'
+
+
+def test_lagging_replica_is_skipped(replicated):
+    """Tests that reads go to the primary while the replica lags.
+
+    GIVEN a replica that is further behind than REPLICA_MAX_LAG
+    WHEN a decorated helper reads the markers
+    THEN it should read the primary's
+    """
+    db, read_marker = replicated
+    db.router = ReplicaRouter(db.router.bind_keys, max_lag=1, measure_lag=lambda engine: 30.0)
+
+    assert read_marker() == 'primary'
+    assert db.router.stats()['lags'] == {'replica_0': 30.0}
+    assert db.router.stats()['primary_reads'] == 1
+
+
+def test_unreachable_replica_is_skipped():
+    """Tests that a replica whose lag cannot be measured is skipped.
+
+    GIVEN two replicas, one of which cannot be reached
+    WHEN we pick replicas
+    THEN only the reachable one should be picked
+    """
+    def measure_lag(engine):
+        if engine == 'down':
+            raise ConnectionError('The replica cannot be reached.')
+        return 0.0
+
+    router = ReplicaRouter(('replica_0', 'replica_1'), measure_lag=measure_lag)
+    engines = {'replica_0': 'down', 'replica_1': 'up'}
+
+    assert {router.pick(engines.get) for _ in range(4)} == {'replica_1'}
+    assert router.lags['replica_0'] == math.inf
+
+
+def test_created_user_is_read_back_through_the_users_list(app, client, log_in, tmp_path, monkeypatch):
+    """Tests that an admin who created a user reads it back from GET /users, which takes no token.
+
+    GIVEN the app with an empty replica
+    WHEN an admin creates a user and lists the users
+    THEN the list should be read from the primary and have the user, while other clients read the replica
+    """
+    replica_uri = f'sqlite:///{tmp_path / "replica"}.db'
+    User.__table__.create(create_engine(replica_uri))
+    monkeypatch.setitem(app.config, 'SQLALCHEMY_BINDS', replica_binds(replica_uri))
+    monkeypatch.setattr(db, 'router', ReplicaRouter(('replica_0',)))
+    db.sticky.clear()
+
+    try:
+        token = log_in('replicated')['access token']
+        resp = client.post('/user', json={'email': 'written@notreal.com'}, headers={'Authorization': f'Bearer {token}'})
+        assert resp.status_code == 201
+
+        assert [user['email'] for user in client.get('/users').json['users']] == ['written@notreal.com']
+
+        db.sticky.clear()
+        assert client.get('/users').json['users'] == []
+    finally:
+        db.sticky.clear()
+        app.extensions['sqlalchemy'].connectors.pop('replica_0', None)
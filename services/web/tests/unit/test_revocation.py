@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""This module tests the rotation and revocation of the admins' tokens."""
+import uuid
+
+import jwt as pyjwt
+from api import db
+from api.blueprints.auth.models import Token
+from api.blueprints.auth.revocation import TokenStore, token_store
+from api.blueprints.bloom import BloomFilter
+from sqlalchemy import func, select, update
+
+
+def log_in(client, name: str) -> dict:
+    """Register an admin with the given name and log them in."""
+    admin = {'email': f'{name}@notreal.com', 'name': name, 'password': 'pass#word'}
+    client.post('/auth/register', json=admin)
+    return client.post('/auth/login', json={'email': admin['email'], 'password': admin['password']}).json
+
+
+def bearer(token: str) -> dict:
+    """Get the Authorization header for the token."""
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Tests that every added string is found and few others are.
+
+    GIVEN a Bloom filter sized for 1000 strings with a 1% error rate
+    WHEN we add 1000 strings and look up 1000 others
+    THEN every added string should be found and about 1% of the others
+    """
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    added = [str(uuid.uuid4()) for _ in range(1000)]
+    for jti in added:
+        bloom.add(jti)
+
+    assert all(jti in bloom for jti in added)
+    assert sum(str(uuid.uuid4()) in bloom for _ in range(1000)) < 30
+    assert not bloom.full()
+
+
+def test_refresh_token_is_rotated_and_reuse_revokes_the_family(client):
+    """Tests that a refresh token can only be used once.
+
+    GIVEN an admin who logged in
+    WHEN the refresh token is used twice
+    THEN the first use should return new tokens, and the second should revoke them
+    """
+    tokens = log_in(client, 'rotate')
+
+    resp = client.get('/auth/refresh', headers=bearer(tokens['refresh token']))
+    assert resp.status_code == 200
+    rotated = resp.json
+    assert client.get('/auth/me', headers=bearer(rotated['access_token'])).status_code == 200
+
+    assert client.get('/auth/refresh', headers=bearer(tokens['refresh token'])).status_code == 401
+    assert client.get('/auth/me', headers=bearer(rotated['access_token'])).status_code == 401
+    assert client.get('/auth/refresh', headers=bearer(rotated['refresh_token'])).status_code == 401
+
+
+def test_logout_revokes_the_tokens(client):
+    """Tests that logging out revokes the access and refresh tokens.
+
+    GIVEN an admin who logged in
+    WHEN the admin logs out
+    THEN neither token should be accepted
+    """
+    tokens = log_in(client, 'logout')
+
+    assert client.post('/auth/logout', headers=bearer(tokens['access token'])).status_code == 200
+    assert client.get('/auth/me', headers=bearer(tokens['access token'])).status_code == 401
+    assert client.get('/auth/refresh', headers=bearer(tokens['refresh token'])).status_code == 401
+
+
+def test_deleted_admin_is_locked_out(client, app):
+    """Tests that deleting an admin revokes their tokens in every worker.
+
+    GIVEN an admin who logged in
+    WHEN the admin is deleted
+    THEN their tokens should be rejected, also by a store that only learns of it from the table
+    """
+    tokens = log_in(client, 'lockout')
+    assert client.delete('/auth/me', headers=bearer(tokens['access token'])).status_code == 200
+    assert client.get('/auth/refresh', headers=bearer(tokens['refresh token'])).status_code == 401
+
+    other_worker = TokenStore()
+    with app.app_context():
+        claims = pyjwt.decode(tokens['access token'], options={'verify_signature': False})
+        assert other_worker.is_revoked({}, claims)
+        assert not other_worker.is_revoked({}, {'jti': str(uuid.uuid4())})
+
+
+def expire(app, jti: str) -> None:
+    """Make the token with the given jti expired in the tokens table."""
+    with app.app_context():
+        db.session.execute(update(Token.__table__).where(Token.jti == jti).values(expires_at=func.now()))
+        db.session.commit()
+
+
+def jtis(tokens: dict) -> set:
+    """Get the jtis of the access and refresh tokens of a login."""
+    return {pyjwt.decode(tokens[key], options={'verify_signature': False})['jti']
+            for key in ('access token', 'refresh token')}
+
+
+def test_deleting_an_admin_keeps_only_the_revocations(client, app):
+    """Tests that deleting an admin cascades to their expired tokens and detaches the others.
+
+    GIVEN an admin who logged in twice, and whose first tokens expired
+    WHEN the admin is deleted
+    THEN the expired tokens should be deleted, and the others kept, revoked and without an admin
+    """
+    expired = log_in(client, 'cascade')
+    tokens = client.post('/auth/login', json={'email': 'cascade@notreal.com', 'password': 'pass#word'}).json
+    for jti in jtis(expired):
+        expire(app, jti)
+
+    assert client.delete('/auth/me', headers=bearer(tokens['access token'])).status_code == 200
+
+    with app.app_context():
+        rows = db.session.execute(select(Token.jti, Token.admin_id, Token.revoked_at)).all()
+    assert {jti for jti, _, _ in rows} == jtis(tokens)
+    assert all(admin_id is None and revoked_at is not None for _, admin_id, revoked_at in rows)
+
+
+def test_purge_removes_the_expired_tokens(client, app):
+    """Tests that purging the tokens table only removes the expired tokens.
+
+    GIVEN two admins who logged in, one of whose tokens expired
+    WHEN the expired tokens are purged
+    THEN only the other admin's tokens should be left
+    """
+    expired = log_in(client, 'expired')
+    tokens = log_in(client, 'current')
+    for jti in jtis(expired):
+        expire(app, jti)
+
+    with app.app_context():
+        assert token_store.purge_expired() == 2
+        assert set(db.session.execute(select(Token.jti)).scalars()) == jtis(tokens)
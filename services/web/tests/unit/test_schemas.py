@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""This module tests the payload schemas."""
+import pytest
+from api.blueprints.exceptions import (
+    AdminNameTooShort,
+    AdminPasswordNotAlphaNumeric,
+    EmailAddressTooLong,
+    EmptyUserData,
+    InvalidEmailAddressFormat,
+    MissingNameKey,
+    MissingPasswordData,
+    NonDictionaryUserData,
+)
+from api.blueprints.schemas import ADMIN_SCHEMA, ADMIN_UPDATE_SCHEMA, USER_SCHEMA
+
+ADMIN = {'email': 'lyle@notreal.com', 'name': 'lyle', 'password': 'pass#word'}
+
+
+def test_user_schema_accepts_valid_user():
+    """Tests that a valid user is returned as it is.
+
+    GIVEN the user schema
+    WHEN we validate a user with a valid email
+    THEN the user should be returned
+    """
+    user = {'email': 'lyle@notreal.com'}
+    assert USER_SCHEMA.validate(user) is user
+
+
+@pytest.mark.parametrize('user, error', [
+    ({}, EmptyUserData),
+    (['lyle@notreal.com'], NonDictionaryUserData),
+    ({'email': 'lyle@notreal'}, InvalidEmailAddressFormat),
+    ({'email': 'l' * 60 + '@notreal.com'}, EmailAddressTooLong),
+])
+def test_user_schema_raises_the_helper_exceptions(user, error):
+    """Tests that invalid users raise the exceptions of the blueprints.
+
+    GIVEN the user schema
+    WHEN we validate an invalid user
+    THEN the matching exception should be raised
+    """
+    with pytest.raises(error):
+        USER_SCHEMA.validate(user)
+
+
+@pytest.mark.parametrize('changes, error', [
+    ({'name': 'ly'}, AdminNameTooShort),
+    ({'password': ''}, MissingPasswordData),
+    ({'password': 'password'}, AdminPasswordNotAlphaNumeric),
+])
+def test_admin_schema_raises_the_helper_exceptions(changes, error):
+    """Tests that invalid admins raise the exceptions of the blueprints.
+
+    GIVEN the admin schema
+    WHEN we validate an admin with an invalid field
+    THEN the matching exception should be raised
+    """
+    with pytest.raises(error):
+        ADMIN_SCHEMA.validate({**ADMIN, **changes})
+
+
+def test_admin_schema_requires_every_field():
+    """Tests that the admin schema requires the name.
+
+    GIVEN the admin schema
+    WHEN we validate an admin without a name
+    THEN MissingNameKey should be raised
+    """
+    with pytest.raises(MissingNameKey):
+        ADMIN_SCHEMA.validate({'email': 'lyle@notreal.com', 'password': 'pass#word'})
+
+
+def test_admin_update_schema_fields_are_optional():
+    """Tests that the update schema validates only the given fields and rejects unknown ones.
+
+    GIVEN the admin update schema
+    WHEN we validate a partial update and an update with an unknown key
+    THEN the first should pass and the second should raise a KeyError
+    """
+    assert ADMIN_UPDATE_SCHEMA.validate({'name': 'lyle'}) == {'name': 'lyle'}
+    with pytest.raises(KeyError):
+        ADMIN_UPDATE_SCHEMA.validate({'name': 'lyle', 'role': 'owner'})
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""This module tests the JWT key ring and the verified claims cache."""
+import time
+
+import jwt as pyjwt
+import pytest
+from api.blueprints.extensions import jwt
+from api.blueprints.tokens import ClaimsCache, KeyRing, TokenVerifier
+
+ADMIN = {'email': 'tokens@notreal.com', 'name': 'tokens', 'password': 'pass#word'}
+
+
+def create_verifier(**config) -> TokenVerifier:
+    """Create a verifier for HS256 tokens from the given settings."""
+    return TokenVerifier(KeyRing.from_config({'JWT_SECRET_KEY': 'new-secret', 'JWT_KEY_ID': 'new', **config}),
+                         ClaimsCache(max_size=10))
+
+
+def test_key_ring_verifies_rotated_keys():
+    """Tests that tokens signed with a previous key still verify while it is in the ring.
+
+    GIVEN a key ring whose active key is new and that still has the old key
+    WHEN we verify tokens signed with the old key, the new key and an unknown key
+    THEN the first two should verify and the last should be rejected
+    """
+    verifier = create_verifier(JWT_PREVIOUS_SECRET_KEYS='old=old-secret')
+    exp = int(time.time()) + 60
+
+    old = pyjwt.encode({'sub': 1, 'exp': exp}, 'old-secret', headers={'kid': 'old'})
+    new = pyjwt.encode({'sub': 2, 'exp': exp}, 'new-secret', headers={'kid': 'new'})
+    unknown = pyjwt.encode({'sub': 3, 'exp': exp}, 'other-secret', headers={'kid': 'other'})
+
+    assert verifier.decode(old)['sub'] == 1
+    assert verifier.decode(new)['sub'] == 2
+    with pytest.raises(pyjwt.InvalidTokenError):
+        verifier.decode(unknown)
+
+
+def test_claims_are_cached_until_exp():
+    """Tests that verified claims are served from the cache and expired tokens are not cached.
+
+    GIVEN a verifier with a claims cache
+    WHEN we decode a token twice and a token that expires within the leeway twice
+    THEN only the second decode of the first token should be a hit
+    """
+    verifier = create_verifier()
+    token = pyjwt.encode({'sub': 1, 'exp': int(time.time()) + 60}, 'new-secret', headers={'kid': 'new'})
+    expiring = pyjwt.encode({'sub': 2, 'exp': time.time() + 0.5}, 'new-secret', headers={'kid': 'new'})
+
+    assert verifier.decode(token) == verifier.decode(token)
+    verifier.decode(expiring)
+    verifier.decode(expiring)
+    assert verifier.claims_cache.stats() == {'size': 1, 'hits': 1, 'misses': 3}
+
+
+def test_asymmetric_keys_verify_without_the_private_key(tmp_path):
+    """Tests that a service with only the public key can verify tokens.
+
+    GIVEN a keys directory with only the public Ed25519 key
+    WHEN we verify a token signed with the private key
+    THEN the claims should be returned, but the ring cannot sign
+    """
+    serialization = pytest.importorskip('cryptography.hazmat.primitives.serialization')
+    ed25519 = pytest.importorskip('cryptography.hazmat.primitives.asymmetric.ed25519')
+    private_key = ed25519.Ed25519PrivateKey.generate()
+    (tmp_path / 'edge.pub').write_bytes(private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo))
+
+    config = {'JWT_ALGORITHM': 'EdDSA', 'JWT_KEY_ID': 'edge', 'JWT_KEYS_DIR': str(tmp_path)}
+    verifier = TokenVerifier(KeyRing.from_config(config), ClaimsCache())
+    token = pyjwt.encode({'sub': 1, 'exp': int(time.time()) + 60}, private_key, algorithm='EdDSA',
+                         headers={'kid': 'edge'})
+
+    assert verifier.decode(token)['sub'] == 1
+    with pytest.raises(RuntimeError):
+        verifier.key_ring.signing_key()
+
+
+def test_jwt_required_routes_use_the_claims_cache(client):
+    """Tests that tokens issued by the app carry their kid and are verified once.
+
+    GIVEN a registered admin
+    WHEN the admin logs in and calls /auth/me twice
+    THEN the access token should have the kid of the active key and the second call should be a cache hit
+    """
+    client.post('/auth/register', json=ADMIN)
+    resp = client.post('/auth/login', json={'email': ADMIN['email'], 'password': ADMIN['password']})
+    token = resp.json['access token']
+    assert pyjwt.get_unverified_header(token)['kid'] == jwt.key_ring.active_kid
+
+    hits = jwt.claims_cache.stats()['hits']
+    for _ in range(2):
+        assert client.get('/auth/me', headers={'Authorization': f'Bearer {token}'}).status_code == 200
+    assert jwt.claims_cache.stats()['hits'] == hits + 1
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""This module tests the user routes."""
+import pytest
+from api.blueprints.constants import USER_BATCH_MAX_SIZE
+
+
+@pytest.fixture
+def headers(log_in) -> dict:
+    """Get the Authorization header of a logged in admin."""
+    return {'Authorization': f'Bearer {log_in("users")["access token"]}'}
+
+
+def create_user(client, headers: dict, email: str) -> dict:
+    """Create a user with the given email."""
+    resp = client.post('/user', json={'email': email}, headers=headers)
+    assert resp.status_code == 201
+    return resp.json
+
+
+def test_read_after_update_gets_the_new_user(client, headers):
+    """Tests that a cached user is not served after it is updated.
+
+    GIVEN a user that was read, and so cached
+    WHEN the user's email is updated
+    THEN reading the user should get the new email
+    """
+    user = create_user(client, headers, 'cached@notreal.com')
+    assert client.get(f'/user?id={user["id"]}', headers=headers).json == user
+
+    resp = client.put(f'/user?id={user["id"]}', json={'email': 'updated@notreal.com'}, headers=headers)
+    assert resp.status_code == 200
+
+    resp = client.get(f'/user?id={user["id"]}', headers=headers)
+    assert resp.json == {'id': user['id'], 'email': 'updated@notreal.com'}
+
+
+def test_read_after_delete_gets_404(client, headers):
+    """Tests that a cached user is not served after it is deleted.
+
+    GIVEN a user that was read, and so cached
+    WHEN the user is deleted
+    THEN reading or deleting the user again should get a 404 response
+    """
+    user = create_user(client, headers, 'deleted@notreal.com')
+    assert client.get(f'/user?id={user["id"]}', headers=headers).status_code == 200
+
+    assert client.delete(f'/user?id={user["id"]}', headers=headers).json == user
+
+    assert client.get(f'/user?id={user["id"]}', headers=headers).status_code == 404
+    assert client.delete(f'/user?id={user["id"]}', headers=headers).status_code == 404
+
+
+def test_create_user_with_a_taken_email(client, headers):
+    """Tests that creating a user with an email in use is refused.
+
+    GIVEN a user
+    WHEN we create another user with the same email
+    THEN we should get a 400 response saying the email is in use
+    """
+    create_user(client, headers, 'taken@notreal.com')
+
+    resp = client.post('/user', json={'email': 'taken@notreal.com'}, headers=headers)
+    assert resp.status_code == 400
+    assert resp.json == {'error': 'The email adress taken@notreal.com is already in use.'}
+
+
+def test_create_users_batch(client, headers):
+    """Tests that a valid batch of users is created at once.
+
+    GIVEN three new emails
+    WHEN we create them in a batch
+    THEN we should get a 201 response with every user created, in order
+    """
+    emails = ['one@notreal.com', 'two@notreal.com', 'three@notreal.com']
+    resp = client.post('/users/batch', json=[{'email': email} for email in emails], headers=headers)
+
+    assert resp.status_code == 201
+    assert resp.json['created'] == 3
+    assert [result['status'] for result in resp.json['results']] == ['created'] * 3
+    assert [result['user']['email'] for result in resp.json['results']] == emails
+
+
+def test_create_users_batch_reports_every_item(client, headers):
+    """Tests that invalid and duplicate items do not stop the rest of the batch.
+
+    GIVEN an existing user
+    WHEN we send a batch with a new email, an invalid one, the existing one and a repeated one
+    THEN only the new email should be created, and every other item reported
+    """
+    create_user(client, headers, 'existing@notreal.com')
+    batch = [{'email': 'new@notreal.com'}, {'email': 'not an email'}, {'email': 'existing@notreal.com'},
+             {'email': 'new@notreal.com'}, 'not a dict']
+    resp = client.post('/users/batch', json=batch, headers=headers)
+
+    assert resp.status_code == 201
+    assert resp.json['created'] == 1
+    results = resp.json['results']
+    assert [result['index'] for result in results] == [0, 1, 2, 3, 4]
+    assert [result['status'] for result in results] == ['created', 'invalid', 'exists', 'exists', 'invalid']
+    assert results[0]['user']['email'] == 'new@notreal.com'
+
+    resp = client.post('/users/batch', json=[{'email': 'existing@notreal.com'}], headers=headers)
+    assert resp.status_code == 200
+    assert resp.json['created'] == 0
+
+
+@pytest.mark.parametrize('batch', [
+    [],
+    {'email': 'one@notreal.com'},
+    [{'email': 'a@notreal.com'}] * (USER_BATCH_MAX_SIZE + 1),
+])
+def test_create_users_batch_refuses_bad_batches(client, headers, batch):
+    """Tests that empty, non list and oversize batches are refused.
+
+    GIVEN an empty batch, a dict and a batch over USER_BATCH_MAX_SIZE
+    WHEN we send it
+    THEN we should get a 400 response and no user should be created
+    """
+    resp = client.post('/users/batch', json=batch, headers=headers)
+
+    assert resp.status_code == 400
+    assert client.get('/users').json['users'] == []
+
+
+def test_update_missing_user_gets_404(client, headers):
+    """Tests that updating a user that does not exist gets a 404 response.
+
+    GIVEN no users
+    WHEN we update the user with id 1
+    THEN we should get a 404 response
+    """
+    resp = client.put('/user?id=1', json={'email': 'nobody@notreal.com'}, headers=headers)
+    assert resp.status_code == 404
+
+
+def test_update_user_to_a_taken_email(client, headers):
+    """Tests that updating a user to an email in use is refused and leaves the session usable.
+
+    GIVEN two users
+    WHEN we update the second one's email to the first one's
+    THEN we should get a 400 response, the user should keep its email, and the next update should work
+    """
+    create_user(client, headers, 'first@notreal.com')
+    second = create_user(client, headers, 'second@notreal.com')
+
+    resp = client.put(f'/user?id={second["id"]}', json={'email': 'first@notreal.com'}, headers=headers)
+    assert resp.status_code == 400
+    assert resp.json == {'error': 'The email adress first@notreal.com is already in use.'}
+
+    assert client.get(f'/user?id={second["id"]}', headers=headers).json == second
+    resp = client.put(f'/user?id={second["id"]}', json={'email': 'third@notreal.com'}, headers=headers)
+    assert resp.json == {'id': second['id'], 'email': 'third@notreal.com'}
+
+
+def test_delete_users_reports_missing_ids(client, headers):
+    """Tests that deleting several users deletes those that exist and reports the rest.
+
+    GIVEN three users
+    WHEN we delete two of them and an id that does not exist
+    THEN the two users should be deleted and the missing id reported
+    """
+    users = [create_user(client, headers, f'{name}@notreal.com') for name in ('one', 'two', 'three')]
+    missing = users[-1]['id'] + 1
+
+    resp = client.delete(f'/users?ids={users[0]["id"]}, {users[1]["id"]},{missing}', headers=headers)
+    assert resp.status_code == 200
+    assert sorted(resp.json['deleted'], key=lambda user: user['id']) == users[:2]
+    assert resp.json['not_found'] == [missing]
+
+    assert [user['id'] for user in client.get('/users').json['users']] == [users[2]['id']]
+    assert client.get(f'/user?id={users[0]["id"]}', headers=headers).status_code == 404
+
+
+@pytest.mark.parametrize('ids', ['', ',', 'one,two', '1;2', '1,,x', ','.join(['1'] * (USER_BATCH_MAX_SIZE + 1))])
+def test_delete_users_refuses_malformed_ids(client, headers, ids):
+    """Tests that malformed and oversize id lists are refused.
+
+    GIVEN a user
+    WHEN we delete users with an id list that is empty, not made of integers or too long
+    THEN we should get a 400 response and the user should not be deleted
+    """
+    user = create_user(client, headers, 'kept@notreal.com')
+
+    resp = client.delete(f'/users?ids={ids}', headers=headers)
+    assert resp.status_code == 400
+    assert client.get(f'/user?id={user["id"]}', headers=headers).status_code == 200